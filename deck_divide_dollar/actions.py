@@ -0,0 +1,96 @@
+"""Precomputed resolution of players' actions into the card they play."""
+import numpy as np
+
+
+class ActionTable(object):
+    """Card index to play for each action, given the card showing and the player's hand.
+
+    The card played depends only on the card showing, which card values are held,
+    the median card and the action:
+
+        playing first: 'small_spoil' plays the smallest card and 'large_max' the largest
+        playing second: 'small_spoil' plays the smallest card that spoils the round (else the
+            largest) and 'large_max' plays the largest card that still scores (else the smallest)
+        'median' always plays the median card
+
+    Hands are described by a bitmask with bit i set if card index i is held. The card is
+    found with vectorized argmax over the held cards; for decks of at most max_table_cards
+    unique cards, every answer is tabulated on first use so that resolving is a single
+    lookup. The table has (unique_cards + 1) * 2**unique_cards * unique_cards * len(actions)
+    entries, so larger decks always take the direct path.
+
+    Parameters:
+        card_values (list): unique card values ordered by card index
+        actions (list): names of the actions available to players
+        value_of_dollar (float): the threshold used for players' scoring card value vs. nothing
+
+    Attributes:
+        unique_cards (int): number of unique card values; card showing index for no card
+        card_type (array): card index to play, indexed by [card_showing, hand_mask, median,
+            action]; -1 where the median card is not held. Built on first access.
+
+    """
+
+    max_table_cards = 8
+
+    def __init__(self, card_values, actions, value_of_dollar=1.0):
+        """Initialize action resolution for every card showing, hand and action."""
+        self.card_values = list(card_values)
+        self.actions = actions
+        self.value_of_dollar = value_of_dollar
+        self.unique_cards = len(self.card_values)
+        assert self.unique_cards < 63, 'Hand bitmasks hold at most 62 unique cards.'
+        self._values = np.array(self.card_values, dtype=float)
+        self._showing_values = np.append(self._values, 0.0)
+        self._small_spoil = np.array([action == 'small_spoil' for action in self.actions])
+        self._median = np.array([action == 'median' for action in self.actions])
+        self._card_type = None
+
+    def __repr__(self):
+        return 'ActionTable(card_values=%s, actions=%s, value_of_dollar=%s)' % (
+            repr(self.card_values), repr(self.actions), repr(self.value_of_dollar))
+
+    @property
+    def card_type(self):
+        if self._card_type is None:
+            assert self.unique_cards <= self.max_table_cards, \
+                'Too many unique cards to tabulate; use resolve.'
+            card_showing, hand_mask, median, action_index = np.indices(
+                (self.unique_cards + 1, 2 ** self.unique_cards, self.unique_cards,
+                 len(self.actions)))
+            self._card_type = np.where(hand_mask >> median & 1,
+                                       self.resolve_direct(card_showing, hand_mask, median,
+                                                           action_index), -1)
+        return self._card_type
+
+    def resolve(self, card_showing, hand_mask, median, action_index):
+        """Return card index to play; arguments may be ints or arrays of equal shape."""
+        if self.unique_cards <= self.max_table_cards:
+            return self.card_type[card_showing, hand_mask, median, action_index]
+        return self.resolve_direct(card_showing, hand_mask, median, action_index)
+
+    def resolve_direct(self, card_showing, hand_mask, median, action_index):
+        """Return card index to play like resolve, computed from the bitmask without the table."""
+        card_showing, hand_mask, median, action_index = np.broadcast_arrays(
+            card_showing, hand_mask, median, action_index)
+        last = self.unique_cards - 1
+        held = (hand_mask[..., np.newaxis] >> np.arange(self.unique_cards) & 1).astype(bool)
+        smallest = np.argmax(held, axis=-1)
+        largest = last - np.argmax(held[..., ::-1], axis=-1)
+
+        first = card_showing == self.unique_cards  # player goes first
+        total = self._values + self._showing_values[card_showing][..., np.newaxis]
+        spoils = held & (total > self.value_of_dollar)
+        scores = held & (total <= self.value_of_dollar)
+        small_spoil = np.where(first | ~spoils.any(axis=-1),  # can't spoil, play largest card
+                               np.where(first, smallest, largest), np.argmax(spoils, axis=-1))
+        large_max = np.where(first | ~scores.any(axis=-1),  # can't maximize, play smallest card
+                             np.where(first, largest, smallest),
+                             last - np.argmax(scores[..., ::-1], axis=-1))
+        card = np.where(self._small_spoil[action_index], small_spoil, large_max)
+        return np.where(self._median[action_index], median, card)[()]
+
+
+def hand_mask(hands):
+    """Return bitmask of card indices held for each count vector hand in an array."""
+    return (np.asarray(hands) > 0).dot(1 << np.arange(np.shape(hands)[-1]))
@@ -0,0 +1,184 @@
+"""Batched engine: play many games of deck-based divide-the-dollar at once."""
+import numpy as np
+
+from .actions import ActionTable, hand_mask
+from .q_learning import TrajectoryBuffer
+
+
+class BatchDivideTheDollar(object):
+    """Two-player deck-based divide-the-dollar over a batch of games held as arrays.
+
+    Every game in the batch is advanced one round at a time with vectorized operations.
+    Cards are referred to by their card index (see Deck.card_index); a card showing index
+    of unique_cards means no card has been played yet this round.
+
+    Parameters:
+        deck (Deck): deck that every game in the batch is dealt from
+        hand_size (int): number of cards in a player's hand
+        num_rounds (int): number of rounds in a game
+        actions (list): names of the actions available to players
+        state_index (StateIndex): true state index of each game state
+        value_of_dollar (float): the threshold used for players' scoring card value vs. nothing
+
+    Attributes:
+        card_values (array): value of each unique card, ordered by card index
+        decks (array): shuffled card order of every game in the batch, (batch_size, deck_size)
+        hands (array): number of each unique card in each player's hand,
+            (batch_size, 2, unique_cards)
+        total_scores (array): each player's total score, (batch_size, 2)
+        card_showing (array): card index showing in the current round, (batch_size,)
+        num_deals (array): number of rounds so far in which the cards scored, (batch_size,)
+        cursor (int): position in decks of the next card to draw
+
+    """
+
+    num_players = 2
+
+    def __init__(self, deck, hand_size, num_rounds, actions, state_index, value_of_dollar=1.0):
+        """Initialize batched game engine."""
+        assert deck.deck_size >= self.num_players * (hand_size + num_rounds - 1), \
+            'Not enough cards in deck to play all rounds.'
+        self.deck = deck
+        self.hand_size = hand_size
+        self.num_rounds = num_rounds
+        self.actions = actions
+        self.num_actions = len(self.actions)
+        self.value_of_dollar = value_of_dollar
+        self.unique_cards = deck.unique_cards
+        self.card_values = np.array(deck.card_values, dtype=float)
+        self.state_index = state_index
+        self.action_table = ActionTable(deck.card_values, actions, value_of_dollar)
+
+        self.decks = None
+        self.hands = None
+        self.total_scores = None
+        self.card_showing = None
+        self.num_deals = None
+        self.cursor = None
+
+    def __repr__(self):
+        return 'BatchDivideTheDollar(deck=%s, hand_size=%i, num_rounds=%i)' % (
+            repr(self.deck), self.hand_size, self.num_rounds)
+
+    def play_batch(self, policies, batch_size, explore_rounds=2, trajectory=None):
+        """Play a batch of full games and return the first player's trajectories.
+
+        Player 0 is the Monte Carlo learner: it takes a random action for its first
+        explore_rounds turns (exploring starts) and follows its policy afterwards.
+
+        Parameters:
+            policies (list of arrays): each player's action for every true state index
+            batch_size (int): number of games to play
+            explore_rounds (int): number of rounds in which player 0 acts randomly
+            trajectory (TrajectoryBuffer): buffer to record player 0's steps in; reused across
+                batches if given
+
+        Returns:
+            states (array): view of true state index seen by player 0 each round,
+                (batch_size, num_rounds)
+            actions (array): view of action taken by player 0 each round, (batch_size, num_rounds)
+            rewards (array): +1, -1 or 0 if player 0 won, lost or drew each game, (batch_size,)
+
+        """
+        assert len(policies) == self.num_players, 'Batched games are played by two players.'
+        policies = [np.asarray(policy) for policy in policies]
+        if trajectory is None:
+            trajectory = TrajectoryBuffer(self.num_rounds, batch_size)
+        self.deal(batch_size)
+
+        def act(index, turn, smallest, median, largest):
+            game_state = self.game_state(smallest, median, largest)
+            if index != 0:
+                return policies[index][game_state]
+            if round_index < explore_rounds:  # exploring starts
+                action = np.random.randint(self.num_actions, size=batch_size)
+            else:
+                action = policies[0][game_state]
+            trajectory.record_batch(round_index, game_state, action)
+            return action
+
+        for round_index in range(self.num_rounds):
+            self.play_round(round_index, act)
+
+        rewards = np.sign(self.total_scores[:, 0] - self.total_scores[:, 1]).astype(np.int64)
+        states, actions = trajectory.episodes(batch_size, self.num_rounds)
+        return states, actions, rewards
+
+    def deal(self, batch_size, decks=None):
+        """Shuffle a deck for every game (unless decks are given) and deal initial hands.
+
+        Parameters:
+            batch_size (int): number of games to deal
+            decks (array): card indices of every game's deck, (batch_size, deck_size)
+
+        """
+        self.decks = self.deck.shuffled_decks(batch_size) if decks is None else decks
+        self.hands = np.zeros((batch_size, self.num_players, self.unique_cards), dtype=np.int64)
+        for index in range(self.num_players):
+            dealt = self.decks[:, index * self.hand_size:(index + 1) * self.hand_size]
+            self.hands[:, index] = (dealt[:, :, None] == np.arange(self.unique_cards)).sum(axis=1)
+        self.total_scores = np.zeros((batch_size, self.num_players))
+        self.num_deals = np.zeros(batch_size)
+        self.cursor = self.num_players * self.hand_size
+
+    def play_round(self, round_index, act):
+        """Play one round of every game in the batch.
+
+        Both players act in turn, each action is resolved to a card, both cards score if their
+        sum is at most value_of_dollar, and then each player draws a card while the deck lasts.
+        Player round_index % 2 goes first.
+
+        Parameters:
+            round_index (int): index of the round
+            act (callable): act(index, turn, smallest, median, largest) returns the action of
+                player index in every game, where turn is 0 if the player goes first and 1 if
+                second and the other arguments are card indices from hand_cards; card_showing
+                holds the card showing when it is called
+
+        Returns:
+            (array): card index each player played in every game, (2, batch_size)
+
+        """
+        batch_size = len(self.decks)
+        games = np.arange(batch_size)
+        self.card_showing = np.full(batch_size, self.unique_cards)
+        cards_played = np.empty((self.num_players, batch_size), dtype=np.int64)
+        turn_order = [round_index % self.num_players, (round_index + 1) % self.num_players]
+
+        for turn, index in enumerate(turn_order):
+            hand = self.hands[:, index]
+            smallest, median, largest = self.hand_cards(hand)
+            action = act(index, turn, smallest, median, largest)
+            card = self.action_table.resolve(self.card_showing, hand_mask(hand), median, action)
+            hand[games, card] -= 1
+            cards_played[index] = card
+            self.card_showing = card
+
+        values = self.card_values[cards_played]
+        scored = (0.0 + values[turn_order[0]] + values[turn_order[1]]) <= self.value_of_dollar
+        self.total_scores += np.where(scored, values, 0.0).T
+        self.num_deals += scored
+
+        for index in range(self.num_players):
+            if self.cursor < self.decks.shape[1]:
+                self.hands[games, index, self.decks[:, self.cursor]] += 1
+                self.cursor += 1
+        return cards_played
+
+    def game_state(self, smallest, median, largest):
+        """Return true state index of [card_showing, smallest, median, largest] for each game."""
+        return self.state_index.lookup[self.state_index.flat_index(
+            [self.card_showing, smallest, median, largest])]
+
+    def hand_cards(self, hand):
+        """Return card index of the smallest, median and largest card in each hand.
+
+        Parameters:
+            hand (array): number of each unique card in each hand, (batch_size, unique_cards)
+
+        """
+        in_hand = hand > 0
+        smallest = np.argmax(in_hand, axis=1)
+        largest = self.unique_cards - 1 - np.argmax(in_hand[:, ::-1], axis=1)
+        median = np.argmax(np.cumsum(hand, axis=1) > self.hand_size // 2, axis=1)
+        return smallest, median, largest
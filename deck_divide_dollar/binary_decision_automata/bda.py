@@ -1,13 +1,24 @@
 from __future__ import division
 
+import hashlib
+import json
 import random
+import struct
 from io import StringIO
 
+import numpy as np
+
+from ..files import atomic_write
+from ..state_index import StateIndex
+
 NUM_ACTIONS = 3
 NUM_INPUTS = 6
 NUM_TESTS = 3
 NEAR = 0.05
 MAX_TRANSITIONS = 5
+POPULATION_MAGIC = b'\x93BDAPOP'
+POPULATION_VERSION = 1
+POPULATION_ALIGN = 64
 
 
 class State(object):
@@ -118,13 +129,10 @@ class BDA(object):
 
     def write_bda(self):
         #output = '%i\n' % self.num_states
-        output = ''
-        for n in range(self.num_states):
-            output += '%i %i %.3f ' % (self.states[n].decision_index, self.states[n].decision_type, self.states[n].threshold_val)
-            for i in range(2):
-                output += '%i %i ' % (self.states[n].actions[i], self.states[n].transitions[i])
-            output += '\n'
-        return output
+        return ''.join('%i %i %.3f %i %i %i %i \n' % (state.decision_index, state.decision_type, state.threshold_val,
+                                                      state.actions[0], state.transitions[0],
+                                                      state.actions[1], state.transitions[1])
+                       for state in self.states)
 
     def read_bda(self, bda_array):
         self.__init__(int(len(bda_array)))
@@ -137,13 +145,312 @@ class BDA(object):
             self.states[n].actions[1] = int(state_data[5])
             self.states[n].transitions[1] = int(state_data[6])
 
+    def canonical(self):
+        # copy with only the states reachable from state 0, renumbered in breadth-first order
+        # (decision transition first); behaves exactly like this BDA from reset()
+        order = [0]
+        number = {0: 0}
+        for n in order:
+            for t in self.states[n].transitions:
+                if t not in number:
+                    number[t] = len(order)
+                    order.append(t)
+        canonical = BDA(len(order))
+        for new, n in zip(canonical.states, order):
+            new.decision_index = self.states[n].decision_index
+            new.decision_type = self.states[n].decision_type
+            new.threshold_val = self.states[n].threshold_val
+            new.actions = list(self.states[n].actions)
+            new.transitions = [number[t] for t in self.states[n].transitions]
+        return canonical
+
+    def fingerprint(self): # equal for BDAs with the same canonical form
+        return hashlib.sha1(self.canonical().write_bda().encode()).hexdigest()
+
     def print_bda(self): # human-readable form
         action_text = ('SmlSpl', 'Median', 'LrgMax')
         input_text = ('Ttl', 'Sml', 'Med', 'Lrg', 'Coop', 'Idx')
         decision_text = ('>', '<', 'near')
 
-        bda_output = '%i states\n' % self.num_states
+        bda_output = ['%i states\n' % self.num_states]
         for i in range(self.num_states):
-            bda_output += '%i) if(%s %s %.3f) ' % (i, input_text[self.states[i].decision_index], decision_text[self.states[i].decision_type], self.states[i].threshold_val)
-            bda_output += '%s-> %i else %s-> %i\n' % (action_text[self.states[i].actions[0]], self.states[i].transitions[0], action_text[self.states[i].actions[1]], self.states[i].transitions[1])
-        return bda_output
+            bda_output.append('%i) if(%s %s %.3f) ' % (i, input_text[self.states[i].decision_index], decision_text[self.states[i].decision_type], self.states[i].threshold_val))
+            bda_output.append('%s-> %i else %s-> %i\n' % (action_text[self.states[i].actions[0]], self.states[i].transitions[0], action_text[self.states[i].actions[1]], self.states[i].transitions[1]))
+        return ''.join(bda_output)
+
+
+class ArrayBDA(object):
+    """Population of BDAs with the same number of states, stored as arrays.
+
+    Field arrays have a leading axis over automata: decision_index, decision_type and
+    threshold_val are (num_automata, num_states) and actions and transitions are
+    (num_automata, num_states, 2). run_batch advances many games, each played by any
+    automaton of the population, at once and behaves exactly like BDA.run.
+    """
+
+    def __init__(self, ns, num_automata=1):
+        self.num_states = ns
+        self.num_automata = num_automata
+        self.decision_index = np.zeros((num_automata, ns), dtype=np.int64)
+        self.decision_type = np.zeros((num_automata, ns), dtype=np.int64)
+        self.threshold_val = np.full((num_automata, ns), 0.5)
+        self.transitions = np.zeros((num_automata, ns, 2), dtype=np.int64)
+        self.actions = np.zeros((num_automata, ns, 2), dtype=np.int64)
+        self.actions[:, :, 1] = -1
+
+    def __len__(self):
+        return self.num_automata
+
+    @classmethod
+    def from_bdas(cls, bdas):
+        population = cls(bdas[0].num_states, len(bdas))
+        for a, automaton in enumerate(bdas):
+            assert automaton.num_states == population.num_states, 'BDAs must have the same number of states.'
+            for n, state in enumerate(automaton.states):
+                population.decision_index[a, n] = state.decision_index
+                population.decision_type[a, n] = state.decision_type
+                population.threshold_val[a, n] = state.threshold_val
+                population.transitions[a, n] = state.transitions
+                population.actions[a, n] = state.actions
+        return population
+
+    def to_bdas(self):
+        bdas = []
+        for a in range(self.num_automata):
+            automaton = BDA(self.num_states)
+            for n, state in enumerate(automaton.states):
+                state.decision_index = int(self.decision_index[a, n])
+                state.decision_type = int(self.decision_type[a, n])
+                state.threshold_val = float(self.threshold_val[a, n])
+                state.transitions = [int(t) for t in self.transitions[a, n]]
+                state.actions = [int(t) for t in self.actions[a, n]]
+            bdas.append(automaton)
+        return bdas
+
+    fields = ('decision_index', 'decision_type', 'threshold_val', 'transitions', 'actions')
+
+    def fingerprints(self):
+        return [automaton.fingerprint() for automaton in self.to_bdas()]
+
+    def randomize(self, automata=None):
+        """Randomize automata (default all) like BDA.randomize, with one draw per field array."""
+        automata = np.arange(self.num_automata) if automata is None else np.asarray(automata)
+        shape = (len(automata), self.num_states)
+        self.decision_index[automata] = np.random.randint(0, NUM_INPUTS, shape)
+        self.decision_type[automata] = np.random.randint(0, NUM_TESTS, shape)
+        self.threshold_val[automata] = np.random.randint(0, 1001, shape)/1000
+        self.actions[automata] = np.random.randint(0, NUM_ACTIONS, shape + (2,))
+        self.transitions[automata] = np.random.randint(0, self.num_states, shape + (2,))
+        return self
+
+    def copy_automaton(self, source, target):
+        """Overwrite automaton target with a copy of automaton source."""
+        for field in self.fields:
+            getattr(self, field)[target] = getattr(self, field)[source]
+
+    def two_point_crossover(self, a, b, points=None):
+        """Swap states [pt1, pt2) of automata a and b, like BDA.two_point_crossover."""
+        if points is None:
+            points = np.random.randint(0, self.num_states, 2)
+        pt1, pt2 = sorted(points)
+        for field in self.fields:
+            values = getattr(self, field)
+            values[[a, b], pt1:pt2] = values[[b, a], pt1:pt2]
+
+    def mutate(self, a, num_mutations=1):
+        """Apply num_mutations mutations to automaton a, each like BDA.mutate."""
+        q = np.random.randint(0, self.num_states, num_mutations)  # states to mutate
+        m = np.random.randint(0, 7, num_mutations)  # objects to mutate
+        for i in range(num_mutations):  # in order, so later mutations of one object win
+            if m[i] == 0:
+                self.decision_index[a, q[i]] = np.random.randint(0, NUM_INPUTS)
+            elif m[i] == 1:
+                self.decision_type[a, q[i]] = np.random.randint(0, NUM_TESTS)
+            elif m[i] == 2:
+                self.threshold_val[a, q[i]] = np.random.randint(0, 1001)/1000
+            elif m[i] in (3, 4):
+                self.transitions[a, q[i], m[i] - 3] = np.random.randint(0, self.num_states)
+            else:
+                self.actions[a, q[i], m[i] - 5] = np.random.randint(0, NUM_ACTIONS)
+
+    @staticmethod
+    def record_dtype(ns):
+        # one record per automaton in a population file
+        return np.dtype([('decision_index', '<i1', (ns,)), ('decision_type', '<i1', (ns,)),
+                         ('threshold_val', '<f8', (ns,)), ('transitions', '<i4', (ns, 2)),
+                         ('actions', '<i1', (ns, 2)), ('fitness', '<f8')])
+
+    def save_population(self, path, fitness=None, metadata=None):
+        """Save the population, fitness and metadata to one binary file.
+
+        The file is a short header (magic, version, header length, then JSON with the sizes and
+        metadata) followed by one aligned block of fixed-size records, so load_population can
+        read or memory-map every automaton at once. It is written next to path and then moved
+        into place.
+        """
+        records = np.zeros(self.num_automata, dtype=self.record_dtype(self.num_states))
+        for field in self.fields:
+            records[field] = getattr(self, field)
+        records['fitness'] = np.nan if fitness is None else fitness
+        header = json.dumps({'num_automata': self.num_automata, 'num_states': self.num_states,
+                             'fitness': fitness is not None, 'metadata': metadata or {}}).encode()
+        prefix = POPULATION_MAGIC + struct.pack('<BI', POPULATION_VERSION, len(header)) + header
+        prefix += b'\x00' * (-len(prefix) % POPULATION_ALIGN)
+
+        with atomic_write(path) as population_file:
+            population_file.write(prefix)
+            population_file.write(records.tobytes())
+
+    @classmethod
+    def load_population(cls, path, mmap=False):
+        """Load a population file; return (population, fitness or None, metadata).
+
+        With mmap the population's arrays are read-only views of the memory-mapped file.
+        """
+        with open(path, 'rb') as population_file:
+            magic = population_file.read(len(POPULATION_MAGIC))
+            assert magic == POPULATION_MAGIC, '%s is not a BDA population file.' % path
+            version, header_length = struct.unpack('<BI', population_file.read(5))
+            assert version == POPULATION_VERSION, 'Unsupported population file version %i.' % version
+            header = json.loads(population_file.read(header_length).decode())
+        offset = len(POPULATION_MAGIC) + 5 + header_length
+        offset += -offset % POPULATION_ALIGN
+        dtype = cls.record_dtype(header['num_states'])
+        if mmap:
+            records = np.memmap(path, dtype=dtype, mode='r', offset=offset, shape=(header['num_automata'],))
+        else:
+            records = np.fromfile(path, dtype=dtype, count=header['num_automata'], offset=offset)
+
+        population = cls(header['num_states'], header['num_automata'])
+        for field in cls.fields:
+            setattr(population, field, records[field] if mmap else records[field].astype(getattr(population, field).dtype))
+        fitness = np.asarray(records['fitness']) if header['fitness'] else None
+        return population, fitness, header['metadata']
+
+    def compile(self, evaluator, check=True):
+        """Return the automata compiled into decision tables over every input of evaluator's games (see CompiledBDA)."""
+        return CompiledBDA(self, evaluator, check)
+
+    def run_batch(self, current_states, sim_states, automata=None):
+        """Run automata on simulator states; return (actions, next automaton states).
+
+        current_states (B,) is the state each game's automaton is in, sim_states (B, NUM_INPUTS)
+        its inputs and automata (B,) which automaton of the population plays it (default 0).
+        """
+        current = np.array(current_states, dtype=np.int64)
+        sim_states = np.asarray(sim_states, dtype=float)
+        if automata is None:
+            automata = np.zeros(len(current), dtype=np.int64)
+        bd = np.ones(len(current), dtype=np.int64)
+        for it in range(MAX_TRANSITIONS + 1):
+            active = np.flatnonzero(bd)
+            if not len(active):
+                break
+            a, n = automata[active], current[active]
+            x = sim_states[active, self.decision_index[a, n]]
+            threshold = self.threshold_val[a, n]
+            sdt = self.decision_type[a, n]
+            passed = (((sdt == 0) & (x > threshold)) | ((sdt == 1) & (x < threshold))
+                      | ((sdt == 2) & (np.abs(x - threshold) < NEAR)))
+            bd[active[passed]] = 0
+            failed = active[~passed]
+            current[failed] = self.transitions[automata[failed], current[failed], 1]
+
+        return self.actions[automata, current, bd], self.transitions[automata, current, bd]
+
+
+class CompiledBDA(object):
+    """Population of BDAs compiled into (action, next state) tables over every game input.
+
+    In games played by a FitnessEvaluator, every input an automaton sees is discrete: the
+    value of the card showing (which also fixes whether the player goes second), the
+    smallest, median and largest card index, and the fraction of rounds so far that scored,
+    num_deals / (round_index + 1). Compiling runs every automaton from every one of its
+    states on every such input once, so run_batch becomes a table read instead of up to
+    MAX_TRANSITIONS + 1 tests. Compiling costs about as much as playing
+    num_states * num_inputs decisions, so it pays off for automata that play many games.
+
+    Made with ArrayBDA.compile.
+
+    Parameters:
+        population (ArrayBDA): automata to compile
+        evaluator (FitnessEvaluator): game whose inputs are compiled
+        check (bool): check every table entry against the scalar interpreter, BDA.run
+
+    Attributes:
+        fractions (array): every possible fraction of rounds that scored, increasing
+        actions (array): action of each automaton, state and input index
+        next_states (array): next state of each automaton, state and input index
+
+    """
+
+    def __init__(self, population, evaluator, check=True):
+        """Compile a population of automata."""
+        assert min(evaluator.cards) > 0, 'Card values must be positive to tell them from no card.'
+        self.population = population
+        self.num_automata = len(population)
+        self.num_states = population.num_states
+        self.unique_cards = evaluator.unique_cards
+        self.state_index = StateIndex(self.unique_cards)
+        self.fractions = np.unique([num_deals / (round_index + 1)
+                                    for round_index in range(evaluator.num_rounds)
+                                    for num_deals in range(round_index + 1)])
+        self._showing_keys = np.append(0.0, evaluator.card_values)
+
+        card_showing, smallest, median, largest = np.indices(self.state_index.dims).reshape(4, -1)
+        valid = (smallest <= median) & (median <= largest)
+        game_states = np.array([card_showing, smallest, median, largest])[:, valid]
+        inputs = np.column_stack([
+            np.repeat(np.append(evaluator.card_values, 0.0)[game_states[0]], len(self.fractions)),
+            np.repeat(game_states[1:].T, len(self.fractions), axis=0),
+            np.tile(self.fractions, game_states.shape[1]),
+            np.repeat(game_states[0] != self.unique_cards, len(self.fractions))])
+        order = self._input_index(inputs)
+        num_inputs = len(inputs)
+
+        automata, states, input_index = [grid.ravel() for grid in np.meshgrid(
+            np.arange(self.num_automata), np.arange(self.num_states), np.arange(num_inputs),
+            indexing='ij')]
+        actions, next_states = population.run_batch(states, inputs[input_index], automata)
+        shape = (self.num_automata, self.num_states, num_inputs)
+        self.actions = np.empty(shape, dtype=np.int8)
+        self.next_states = np.empty(shape, dtype=np.int16)
+        self.actions[automata, states, order[input_index]] = actions
+        self.next_states[automata, states, order[input_index]] = next_states
+
+        if check:
+            for a, automaton in enumerate(population.to_bdas()):
+                for n in range(self.num_states):
+                    for sim_state, i in zip(inputs.tolist(), order):
+                        automaton.current_state = n
+                        assert automaton.run(sim_state) == self.actions[a, n, i] and \
+                            automaton.current_state == self.next_states[a, n, i], \
+                            'Compiled BDA %i disagrees with BDA.run in state %i on %s.' % (
+                                a, n, sim_state)
+
+    def __repr__(self):
+        return 'CompiledBDA(num_automata=%i, num_states=%i, num_inputs=%i)' % (
+            self.num_automata, self.num_states, self.actions.shape[2])
+
+    def __len__(self):
+        return self.num_automata
+
+    def fingerprints(self):
+        return self.population.fingerprints()
+
+    def run_batch(self, current_states, sim_states, automata=None):
+        """Return (actions, next automaton states) like ArrayBDA.run_batch, by table lookup."""
+        if automata is None:
+            automata = np.zeros(len(current_states), dtype=np.int64)
+        input_index = self._input_index(np.asarray(sim_states, dtype=float))
+        return (self.actions[automata, current_states, input_index].astype(np.int64),
+                self.next_states[automata, current_states, input_index].astype(np.int64))
+
+    def _input_index(self, sim_states):
+        """Return table column of each simulator state."""
+        # no card showing (value 0) sorts first and is card index unique_cards
+        card_showing = (np.searchsorted(self._showing_keys, sim_states[:, 0]) - 1) \
+            % (self.unique_cards + 1)
+        game_state = [card_showing] + [sim_states[:, i].astype(np.int64) for i in (1, 2, 3)]
+        fraction = np.searchsorted(self.fractions, sim_states[:, 4])
+        return self.state_index.rank(game_state) * len(self.fractions) + fraction
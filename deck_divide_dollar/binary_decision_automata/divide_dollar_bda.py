@@ -1,15 +1,30 @@
 from __future__ import division
 
-import copy
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import tempfile
 import time
 
-import bda
 import numpy as np
 import scipy.stats as st
 
-"""Evolving BDA agents to play divide-the-dollar."""
+from deck_divide_dollar.binary_decision_automata import bda
+from deck_divide_dollar.binary_decision_automata.fitness import FitnessCache, FitnessEvaluator, evaluate_parallel
+from deck_divide_dollar.binary_decision_automata.metrics import MetricsWriter, combine_metrics, read_metrics
+from deck_divide_dollar.files import atomic_write
+from deck_divide_dollar.scheduler import run_jobs
+from deck_divide_dollar.sweep import ResultCache, grid, run_sweep
 
-start = time.clock()
+"""Evolving BDA agents to play divide-the-dollar.
+
+Run from the repository root with python -m deck_divide_dollar.binary_decision_automata.divide_dollar_bda
+Run a parameter sweep with --sweep sweep.json, where sweep.json holds {parameter: [values]} (every combination
+is run, e.g. {"bda_states": [4, 8], "hand_size": [5, 7]}) or a list of configurations; see --help.
+The sweep is kept out of this file because results are cached by a hash of the package's source.
+"""
 
 # Parameters for divide-the-dollar game ##
 cards = [0.25, 0.50, 0.75]  # specifies the unique cards in the deck: indexed as [0,1,2]
@@ -20,6 +35,9 @@ hand_size = 5  # number of cards in a player's hand--must be odd
 num_players = 2  # number of players
 num_rounds = 1+(deck_size-(num_players*hand_size))//num_players  # number of hands to play (until deck runs out)
 num_episodes = 5  # number of games to play between two players (to ensure fair deck shuffling over time)
+common_random_decks = False  # every pair of players plays the same num_episodes decks each generation
+swap_seats = False  # also play every deck with the players' seats swapped
+archive_every = None  # save the population and fitness to pop-<run>-<gen>.bdapop every this many generations
 
 # Parameters for BDA specification
 bda_states = 8
@@ -28,6 +46,10 @@ actions = {'small_spoil': 0, 'median': 1, 'large_max': 2}
 num_actions = len(actions)
 assert num_actions == bda.NUM_ACTIONS, "num_actions=%i does not match bda.NUM_ACTIONS=%i" % (num_actions, bda.NUM_ACTIONS)
 
+fitness_evaluator = FitnessEvaluator(cards, num_of_unique_cards, hand_size, num_rounds)
+num_workers = 1  # number of processes each generation's matchups are spread across
+fitness_seed = None  # seed of the decks played (combined with the run and generation); if set, results are the same for any num_workers
+
 # Parameters for evolution
 pop_size = 15
 rand_pop_size = 25
@@ -35,210 +57,194 @@ t_size = 11
 max_mutations = 9
 num_gens = 250
 num_runs = 100
+fixed_opponents = False  # keep generation 0's random players instead of re-randomizing them
+cache_max_age = None  # with fixed_opponents, generations an evolving player's fitness is reused for (None: forever)
+run_workers = None  # number of runs played at once (defaults to the number of CPUs); needs num_workers = 1
+seed = None  # seed of each run's random number generators (combined with the run number)
+
+metrics = ('win_percen', 'plus_minus', 'score_earned', 'score_diff')
+metrics_flush_every = 50  # generations between writes of metrics-<run>.npz (also written after the last one)
+
+parameters = tuple(name for name, value in globals().items() if not name.startswith('_')
+                   and isinstance(value, (bool, int, float, str, list, tuple, dict, type(None))))  # all of the above
+derived = ('num_cards', 'deck_size', 'num_rounds', 'fitness_evaluator')
 
 
 def init_pop():
-    pop = []
-    for i in range(pop_size+rand_pop_size):
-        pop.append(bda.BDA(bda_states))
-        pop[i].randomize()
-    return pop
-
-
-def load_deck():
-    d = []
-    for card, num in enumerate(num_of_unique_cards):
-        d += [card]*num
-    return np.array(d)
-
-
-def play_action(card_showing, player, player_action):
-    if card_showing == num_cards: # player's going first
-        if player_action == actions['small_spoil']:
-            player_card_value = cards[player[0]] # play smallest card
-            card_showing = player[0] # update card showing
-            player = np.delete(player, 0) # remove card from player's hand
-        elif player_action == actions['large_max']:
-            player_card_value = cards[player[-1]] # play largest card
-            card_showing = player[-1] # update card showing
-            player = np.delete(player, -1) # remove card from player's hand
-        else:
-            player_card_value = cards[player[hand_size//2]] # play median card
-            card_showing = player[hand_size//2] # update card showing
-            player = np.delete(player, hand_size//2) # remove card from player's hand
-    else: # opponent went first, player's turn
-        if player_action == actions['small_spoil']: # spoil with smallest card
-            for c, pcard in enumerate(player):
-                if cards[pcard] + cards[card_showing] > 1.0: # can spoil, play this card
-                    player_card_value = cards[player[c]]
-                    player = np.delete(player, c) # remove card from player's hand
-                    break
-                elif c == len(player)-1: # can't spoil, play largest card
-                    player_card_value = cards[player[-1]]
-                    player = np.delete(player, -1) # remove card from player's hand
-        elif player_action == actions['large_max']: # maximize score with largest card
-            for c, pcard in enumerate(np.flipud(player)):
-                if cards[pcard] + cards[card_showing] <= 1.0: # can maximize, play this card
-                    player_card_value = cards[player[len(player)-1-c]]
-                    player = np.delete(player, len(player)-1-c) # remove card from player's hand
-                    break
-                elif len(player)-c == 0: # can't maximize, play smallest card
-                    player_card_value = cards[player[0]]
-                    player = np.delete(player, 0) # remove card from player's hand
-        else:
-            player_card_value = cards[player[hand_size//2]] # play median card
-            player = np.delete(player, hand_size//2) # remove card from player's hand
-    return card_showing, player, player_card_value
+    return bda.ArrayBDA(bda_states, pop_size+rand_pop_size).randomize()
 
 
 def save_pop(run, pop, fit):
     pop_file = open('pop-%i.txt' % run, 'w')
+    bdas = pop.to_bdas()
     first = True
     for i in np.argsort(fit)[0:][::-1]:
         if first:
-            pop_file.write('%s\n\n' % bda_pop[i].write_bda())
+            pop_file.write('%s\n\n' % bdas[i].write_bda())
             first = False
-        pop_file.write('%.6f -fitness\n%s\n\n' % (fit[i],bda_pop[i].print_bda()))
+        pop_file.write('%.6f -fitness\n%s\n\n' % (fit[i],bdas[i].print_bda()))
     pop_file.close()
 
 
-def report_fit_stats(stats_file, run, fit):
-    mean = np.mean(fit)
-    ci = st.t.interval(0.95, len(fit)-1, loc=mean, scale=st.sem(fit))
-    std = np.std(fit)
-    best = np.amax(fit)
-    stats_file.write('%.6f %.6f %.6f %.6f\n' % (mean, ci[1], std, best))
-
-
-for run in range(0,num_runs):
+def evolve(run):
+    """Evolve one population; writes each generation's fitness statistics to metrics-<run>.npz and pop-<run>.txt last."""
     print('run %i' % run)
-    win_percen_file = open('win_percen-%i.txt' % run, 'w')
-    plus_minus_file = open('plus_minus-%i.txt' % run, 'w')
-    score_earned_file = open('score_earned-%i.txt' % run, 'w')
-    score_diff_file = open('score_diff-%i.txt' % run, 'w')
+    seed_sequence = np.random.SeedSequence(None if seed is None else [seed, run])
+    np.random.seed(seed_sequence.generate_state(1)[0])
+    random.seed(int(seed_sequence.generate_state(2)[1]))
+    pool = multiprocessing.Pool(num_workers) if num_workers > 1 else None
+    fitness_cache = FitnessCache(cache_max_age) if fixed_opponents else None
+    common_decks = None
+    games_per_matchup = num_episodes*(2 if swap_seats else 1)
+    metrics_writer = MetricsWriter('metrics-%i.npz' % run, metrics, num_gens, pop_size, [run], flush_every=metrics_flush_every)
     bda_pop = init_pop()
     dx = np.array([i for i in range(pop_size)])  # sorting index
     for gen in range(num_gens):
         #print 'gen %i' % gen
 
-        if gen != 0:
-            for i in range(pop_size,pop_size+rand_pop_size):
-                bda_pop[i].randomize()
-
-        # (fitness) score-keeping
-        wins = np.array([0 for i in range(pop_size+rand_pop_size)])
-        losses = np.array([0 for i in range(pop_size+rand_pop_size)])
-        plus_minus = np.array([0 for i in range(pop_size+rand_pop_size)])
-        score_earned = np.array([0 for i in range(pop_size+rand_pop_size)])
-        score_diff = np.array([0 for i in range(pop_size+rand_pop_size)])
-
-        ## Round-robin Match-ups ##
-        for p1_index in range(pop_size): # Player 1 - evolving
-            for p2_index in range(pop_size,pop_size+rand_pop_size):  # Player 2 - random
-                for ep in range(num_episodes):
-                    # Load and shuffle deck
-                    deck = load_deck()
-                    np.random.shuffle(deck)
-
-                    bda_pop[p1_index].reset()
-                    bda_pop[p2_index].reset()
-                    p1_total_score = 0
-                    p2_total_score = 0
-                    num_deals = 0  # number of times a round resulted in a positive score for both players
-
-                    # Deal initial hands
-                    p1_cards = np.sort(deck[:hand_size])
-                    deck = deck[hand_size:]
-                    p2_cards = np.sort(deck[:hand_size])
-                    deck = deck[hand_size:]
-
-                    for round_index in range(num_rounds):
-                        p1_card_value = 0
-                        p2_card_value = 0
-
-                        # Determine the value of the card showing (0 if playing first; opponent's pick if playing second)
-                        card_showing = num_cards # an index of 'num_cards' corresponds to no card showing (i.e. zero)
-                        if round_index % 2 == 0:
-                            # Player 1 goes first
-                            p1_game_state = [0, p1_cards[0], p1_cards[hand_size//2], p1_cards[-1], num_deals/(round_index+1), 0]
-                            p1_action = bda_pop[p1_index].run(p1_game_state)
-                            card_showing, p1_cards, p1_card_value = play_action(card_showing, p1_cards, p1_action)
-
-                            # Player 2 goes second
-                            p2_game_state = [cards[card_showing], p2_cards[0], p2_cards[hand_size//2], p2_cards[-1], num_deals/(round_index+1), 1]
-                            p2_action = bda_pop[p2_index].run(p2_game_state)
-                            card_showing, p2_cards, p2_card_value = play_action(card_showing, p2_cards, p2_action)
-                        else:
-                            # Player 2 goes first
-                            p2_game_state = [0, p2_cards[0], p2_cards[hand_size//2], p2_cards[-1], num_deals/(round_index+1), 0]
-                            p2_action = bda_pop[p2_index].run(p2_game_state)
-                            card_showing, p2_cards, p2_card_value = play_action(card_showing, p2_cards, p2_action)
-
-                            # Player 1 goes second
-                            p1_game_state = [cards[card_showing], p1_cards[0], p1_cards[hand_size//2], p1_cards[-1], num_deals/(round_index+1), 1]
-                            p1_action = bda_pop[p1_index].run(p1_game_state)
-                            card_showing, p1_cards, p1_card_value = play_action(card_showing, p1_cards, p1_action)
-
-                        # Determine score for playing this hand
-                        if p1_card_value + p2_card_value <= 1:
-                            p1_total_score += p1_card_value
-                            p2_total_score += p2_card_value
-                            num_deals += 1
-
-                        # If deck isn't empty, pick up new cards
-                        if len(deck) != 0:
-                            p1_cards = np.sort(np.append(p1_cards, deck[:1]))
-                            deck = deck[1:]
-                        if len(deck) != 0:
-                            p2_cards = np.sort(np.append(p2_cards, deck[:1]))
-                            deck = deck[1:]
-
-                    # Determine final winner of the game and give out reward (+score keeping)
-                    if p1_total_score > p2_total_score:
-                        wins[p1_index] += 1
-                        losses[p2_index] += 1
-                        plus_minus[p1_index] += 1
-                        plus_minus[p2_index] -= 1
-                    elif p1_total_score < p2_total_score:
-                        losses[p1_index] += 1
-                        wins[p2_index] += 1
-                        plus_minus[p2_index] += 1
-                        plus_minus[p1_index] -= 1
-                    score_earned[p1_index] += p1_total_score
-                    score_earned[p2_index] += p2_total_score
-                    score_diff[p1_index] += p1_total_score - p2_total_score
-                    score_diff[p2_index] += p2_total_score - p1_total_score
-
-        fit = wins[0:pop_size]/(rand_pop_size*num_episodes) # choose fitness measure (i.e. wins, plus_minus, score_earned, score_diff)
-        report_fit_stats(win_percen_file, run, wins[0:pop_size]/(rand_pop_size*num_episodes)) # save information about fitness for this generation
-        report_fit_stats(plus_minus_file, run, plus_minus[0:pop_size])
-        report_fit_stats(score_earned_file, run, score_earned[0:pop_size])
-        report_fit_stats(score_diff_file, run, score_diff[0:pop_size])
+        if gen != 0 and not fixed_opponents:
+            bda_pop.randomize(range(pop_size,pop_size+rand_pop_size))
+
+        # shared decks are redrawn every generation, except against fixed opponents (keeps cached fitness exact)
+        if common_random_decks and (common_decks is None or not fixed_opponents):
+            common_decks = fitness_evaluator.deck.shuffled_decks(num_episodes)
+
+        # (fitness) score-keeping: every evolving player vs. every random player, num_episodes each
+        generation_seed = None if fitness_seed is None else [fitness_seed, run, gen]
+        if fitness_cache is not None:  # only players not seen against these opponents are played
+            stats = fitness_evaluator.evaluate_cached(bda_pop, pop_size, num_episodes, fitness_cache,
+                                                      common_decks=common_decks, swap_seats=swap_seats)
+        elif pool is None:
+            stats = fitness_evaluator.evaluate(bda_pop, pop_size, num_episodes, common_decks=common_decks,
+                                               swap_seats=swap_seats, seed=generation_seed)
+        else:
+            stats = evaluate_parallel(fitness_evaluator, bda_pop, pop_size,
+                                      num_episodes, num_workers, generation_seed, pool, common_decks, swap_seats)
+        wins = stats['wins']
+        losses = stats['losses']
+        plus_minus = stats['plus_minus']
+        score_earned = stats['score_earned']
+        score_diff = stats['score_diff']
+
+        fit = wins[0:pop_size]/(rand_pop_size*games_per_matchup) # choose fitness measure (i.e. wins, plus_minus, score_earned, score_diff)
+        metrics_writer.record(gen, win_percen=fit, plus_minus=plus_minus[0:pop_size], # save information about fitness for this generation
+                              score_earned=score_earned[0:pop_size], score_diff=score_diff[0:pop_size])
+        if archive_every and (gen % archive_every == 0 or gen == num_gens-1):
+            bda_pop.save_population('pop-%i-%i.bdapop' % (run, gen), np.append(fit, np.full(rand_pop_size, np.nan)),
+                                    {'run': run, 'gen': gen, 'num_evolving': pop_size, 'fitness': 'win_percen'})
         if gen == num_gens-1:
+            metrics_writer.flush()  # before the pop file, which marks the run as finished
             #save_pop(run, bda_pop, fit)
-            pop_file = open('pop-%i.txt' % run, 'w')
-            for i in np.argsort(fit)[0:][::-1]:
-                pop_file.write('%.6f -fitness (%i %.2f %.2f)\n%s\n\n' % (fit[i], plus_minus[i], score_earned[i], score_diff[i], bda_pop[i].print_bda()))
-            pop_file.close()
+            bdas = bda_pop.to_bdas()
+            with atomic_write('pop-%i.txt' % run, 'w') as pop_file:  # pop file marks the run as finished
+                for i in np.argsort(fit)[0:][::-1]:
+                    pop_file.write('%.6f -fitness (%i %.2f %.2f)\n%s\n\n' % (fit[i], plus_minus[i], score_earned[i], score_diff[i], bdas[i].print_bda()))
         else: ## Evolution time ##
             # Choose and sort the mating tournament participants
             dx = np.random.permutation(len(fit)) # sorting index
             dx[:t_size] = dx[:t_size][fit[dx][:t_size].argsort()]
 
             # Crossover (replace worst two with crossover result of best two)
-            bda_pop[dx[0]] = copy.deepcopy(bda_pop[dx[t_size-1]])
-            bda_pop[dx[1]] = copy.deepcopy(bda_pop[dx[t_size-2]])
-            bda_pop[dx[0]].two_point_crossover(bda_pop[dx[1]])
+            bda_pop.copy_automaton(dx[t_size-1], dx[0])
+            bda_pop.copy_automaton(dx[t_size-2], dx[1])
+            bda_pop.two_point_crossover(dx[0], dx[1])
             # Mutation
-            for m in range(max_mutations):
-                bda_pop[dx[0]].mutate()
-                bda_pop[dx[1]].mutate()
-
-    win_percen_file.close()
-    plus_minus_file.close()
-    score_earned_file.close()
-    score_diff_file.close()
-
-
-end = time.clock()
-print("%.2f minutes" % ((end-start)/60))
+            bda_pop.mutate(dx[0], max_mutations)
+            bda_pop.mutate(dx[1], max_mutations)
+
+    if pool is not None:
+        pool.close()
+
+
+def run_done(run):
+    return os.path.exists('pop-%i.txt' % run)
+
+
+def summarize_runs(runs):
+    """Combine the finished runs' statistics into metrics.npz and write summary.txt: per generation, each
+    metric's mean fitness and best fitness averaged over runs with a 95% confidence interval of the mean
+    fitness across runs."""
+    runs = [run for run in runs if run_done(run)]
+    combine_metrics(['metrics-%i.npz' % run for run in runs], 'metrics.npz')
+    experiment = read_metrics('metrics.npz')
+    columns = [np.arange(num_gens)]
+    header = 'gen'
+    for metric in metrics:
+        mean = experiment[metric]['mean'].mean(axis=0)
+        if len(runs) > 1:
+            ci = st.t.interval(0.95, len(runs)-1, loc=mean, scale=st.sem(experiment[metric]['mean'], axis=0))[1]
+        else:
+            ci = mean
+        columns += [mean, ci, experiment[metric]['best'].mean(axis=0)]
+        header += ' %s_mean %s_ci %s_best' % (metric, metric, metric)
+    np.savetxt('summary.txt', np.column_stack(columns), fmt='%.6f', header='%s (%i runs)' % (header, len(runs)))
+
+
+def configure(config):
+    """Set the parameters named in config (as above) and recompute the derived ones; returns the old values."""
+    global num_cards, deck_size, num_rounds, fitness_evaluator
+    old = {name: globals()[name] for name in set(config) | set(derived)}
+    for name, value in config.items():
+        assert name in parameters and name not in ('num_cards', 'deck_size'), 'Unknown parameter %s.' % name
+        globals()[name] = value
+    num_cards = len(cards)
+    deck_size = sum(num_of_unique_cards)
+    if 'num_rounds' not in config:
+        num_rounds = 1+(deck_size-(num_players*hand_size))//num_players
+    fitness_evaluator = FitnessEvaluator(cards, num_of_unique_cards, hand_size, num_rounds)
+    return old
+
+
+def resolved_config(config):
+    """Return the value of every parameter (as above) once config is applied; sweep results are keyed by it."""
+    old = configure(config)
+    try:
+        return {name: globals()[name] for name in parameters}
+    finally:
+        globals().update(old)
+
+
+def load_sweep(path):
+    """Return the configurations of a sweep file: a list of configurations, or {parameter: [values]} for grid."""
+    with open(path) as sweep_file:
+        sweep = json.load(sweep_file)
+    return grid(**sweep) if isinstance(sweep, dict) else sweep
+
+
+def sweep_point(config):
+    """Evolve num_runs populations with the parameters in config, one run after another in a scratch directory.
+
+    Returns the statistics of every run (read_metrics of the combined metrics.npz) and each run's final
+    population file."""
+    old = configure(config)
+    cwd = os.getcwd()
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            os.chdir(directory)
+            for run in range(num_runs):
+                evolve(run)
+            summarize_runs(range(num_runs))
+            return {'metrics': read_metrics('metrics.npz'),
+                    'populations': [open('pop-%i.txt' % run).read() for run in range(num_runs)]}
+    finally:
+        os.chdir(cwd)
+        globals().update(old)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Evolve BDA agents to play divide-the-dollar.')
+    parser.add_argument('--sweep', help='JSON file of configurations to run in place of the parameters above')
+    parser.add_argument('--sweep-workers', type=int, help='number of configurations run at once (defaults to the number of CPUs)')
+    parser.add_argument('--sweep-cache', default='sweep-cache', help="directory of finished configurations' results; only new ones are run")
+    args = parser.parse_args()
+    assert num_workers == 1 or run_workers == 1, 'Runs played at once cannot also spread their matchups across processes.'
+    start = time.perf_counter()
+    if args.sweep:
+        assert num_workers == 1, 'Configurations played at once cannot also spread their matchups across processes.'
+        run_sweep(sweep_point, load_sweep(args.sweep), ResultCache(args.sweep_cache), args.sweep_workers,
+                  callback=lambda config, result: print('finished %s' % config), resolve=resolved_config)
+    else:
+        run_jobs(evolve, range(num_runs), run_workers, is_done=run_done)
+        summarize_runs(range(num_runs))
+    end = time.perf_counter()
+    print("%.2f minutes" % ((end-start)/60))
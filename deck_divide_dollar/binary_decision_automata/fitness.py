@@ -0,0 +1,353 @@
+"""Array-based fitness evaluation of a population of BDAs playing divide-the-dollar."""
+import multiprocessing
+
+import numpy as np
+
+from ..batch import BatchDivideTheDollar
+from ..game import Deck
+from ..state_index import StateIndex
+
+ACTIONS = ['small_spoil', 'median', 'large_max']
+
+
+class FitnessEvaluator(object):
+    """Plays all matchups of one generation of divide_dollar_bda as a single batch of games.
+
+    Games follow divide_dollar_bda: player 1 is dealt the first hand_size cards and player 2
+    the next, player 1 goes first in even rounds, and after every round each player draws a
+    card while the deck lasts. Every game in the batch is advanced one round at a time with
+    BatchDivideTheDollar.play_round, with automata run with ArrayBDA.run_batch.
+
+    Parameters:
+        cards (list): unique card values, increasing
+        num_of_unique_cards (list): number of each unique card in the deck
+        hand_size (int): number of cards in a player's hand
+        num_rounds (int): number of rounds in a game; defaults to divide_dollar_bda's, which
+            plays the last round after the deck runs out
+        value_of_dollar (float): the threshold used for players' scoring card value vs. nothing
+
+    Attributes:
+        deck (Deck): deck that games are dealt from
+        engine (BatchDivideTheDollar): engine that deals and plays the rounds
+        action_table (ActionTable): card played for each action
+
+    """
+
+    num_players = 2
+
+    def __init__(self, cards, num_of_unique_cards, hand_size, num_rounds=None,
+                 value_of_dollar=1.0):
+        """Initialize fitness evaluator."""
+        assert list(cards) == sorted(cards), 'Cards must be increasing.'
+        self.cards = list(cards)
+        self.num_of_unique_cards = list(num_of_unique_cards)
+        self.deck = Deck(dict(zip(self.cards, self.num_of_unique_cards)))
+        self.deck_size = self.deck.deck_size
+        self.hand_size = hand_size
+        if num_rounds is None:
+            num_rounds = 1 + (self.deck_size - self.num_players * hand_size) // self.num_players
+        self.num_rounds = num_rounds
+        self.value_of_dollar = value_of_dollar
+        self.unique_cards = len(self.cards)
+        self.card_values = np.array(self.cards, dtype=float)
+        self.engine = BatchDivideTheDollar(self.deck, hand_size, num_rounds, ACTIONS,
+                                           StateIndex(self.unique_cards), value_of_dollar)
+        self.action_table = self.engine.action_table
+        self._showing_values = np.append(self.card_values, 0.0)
+
+    def __repr__(self):
+        return 'FitnessEvaluator(cards=%s, num_of_unique_cards=%s, hand_size=%i)' % (
+            repr(self.cards), repr(self.num_of_unique_cards), self.hand_size)
+
+    def matchups(self, num_evolving, num_players, num_episodes):
+        """Return (player 1, player 2) indices of every game of a generation.
+
+        Each of the first num_evolving automata plays num_episodes games against each of the
+        remaining automata up to num_players.
+        """
+        num_opponents = num_players - num_evolving
+        player_1 = np.repeat(np.arange(num_evolving), num_opponents * num_episodes)
+        player_2 = np.tile(np.repeat(np.arange(num_evolving, num_players), num_episodes),
+                           num_evolving)
+        return player_1, player_2
+
+    def evaluate(self, population, num_evolving, num_episodes, decks=None, common_decks=None,
+                 swap_seats=False, seed=None):
+        """Play a generation's round-robin and return every automaton's fitness statistics.
+
+        With common_decks every matchup pair plays the same decks (common random numbers), so
+        differences in fitness come from strategy rather than from luck of the deal. With
+        swap_seats every deck is also played with the seats swapped, which cancels the
+        advantage of being dealt first or going first in even rounds.
+
+        Parameters:
+            population (ArrayBDA): evolving automata followed by random opponents
+            num_evolving (int): number of evolving automata at the start of population
+            num_episodes (int): number of games each evolving automaton plays each opponent
+            decks (array): card indices of every game's deck in matchups order; shuffled if
+                not given
+            common_decks (array): card indices of the num_episodes decks every pair plays, e.g.
+                from deck.shuffled_decks(num_episodes); overrides decks
+            swap_seats (bool): also play every deck with the seats swapped
+            seed (int or list): if given instead of decks, every matchup pair's decks are
+                shuffled from its own seed spawned from seed, as in evaluate_parallel
+
+        Returns:
+            (dict): wins, losses, plus_minus (wins - losses), score_earned and score_diff
+                (own minus opponent's score) summed over each automaton's games
+
+        """
+        player_1, player_2 = self.matchups(num_evolving, len(population), num_episodes)
+        num_pairs = len(player_1) // num_episodes
+        if common_decks is not None:
+            decks = self.common_schedule(common_decks, num_pairs)
+        elif decks is None and seed is not None:
+            decks = self.seeded_decks(self.pair_seeds(seed, num_pairs), num_episodes)
+        elif decks is None:
+            decks = self.deck.shuffled_decks(len(player_1))
+        return self.play_statistics(population, player_1, player_2, decks, swap_seats)
+
+    def common_schedule(self, common_decks, num_pairs):
+        """Return decks of num_pairs matchup pairs that all play the same common_decks."""
+        return np.tile(np.asarray(common_decks), (num_pairs, 1))
+
+    def play_statistics(self, population, player_1, player_2, decks, swap_seats=False):
+        """Play one game per deck (two with swap_seats) and return fitness statistics."""
+        if swap_seats:
+            player_1, player_2 = (np.concatenate([player_1, player_2]),
+                                  np.concatenate([player_2, player_1]))
+            decks = np.concatenate([decks, decks])
+        scores = self.play(population, player_1, player_2, decks)
+        return self.statistics(len(population), player_1, player_2, scores)
+
+    def evaluate_cached(self, population, num_evolving, num_episodes, cache, conditions=None,
+                        common_decks=None, swap_seats=False):
+        """Like evaluate, but only play evolving automata without statistics in cache.
+
+        Evolving automata are keyed by fingerprint, so automata that differ only in states
+        unreachable from state 0 (and repeats within the population) are played once. The
+        cache is emptied whenever the opponents or conditions change.
+
+        Parameters:
+            population (ArrayBDA): evolving automata followed by opponents
+            num_evolving (int): number of evolving automata at the start of population
+            num_episodes (int): number of games each evolving automaton plays each opponent
+            cache (FitnessCache): statistics of evolving automata from earlier generations
+            conditions: anything else the statistics depend on, e.g. a deck seed
+            common_decks (array): decks every pair plays (see evaluate); pass the same decks
+                every generation, and say so in conditions, to compare players exactly
+            swap_seats (bool): also play every deck with the seats swapped
+
+        Returns:
+            (dict): wins, losses, plus_minus, score_earned and score_diff of every automaton;
+                opponents' entries only count the games played in this call
+
+        """
+        fingerprints = population.fingerprints()
+        cache.validate((tuple(fingerprints[num_evolving:]), conditions, swap_seats))
+        to_play = {}
+        for i, fingerprint in enumerate(fingerprints[:num_evolving]):
+            if fingerprint not in to_play and cache.lookup(fingerprint) is None:
+                to_play[fingerprint] = i
+
+        num_players = len(population)
+        evolving = np.array(sorted(to_play.values()), dtype=np.int64)
+        num_opponents = num_players - num_evolving
+        player_1 = np.repeat(evolving, num_opponents * num_episodes)
+        player_2 = np.tile(np.repeat(np.arange(num_evolving, num_players), num_episodes),
+                           len(evolving))
+        if common_decks is not None:
+            decks = self.common_schedule(common_decks, len(player_1) // num_episodes)
+        else:
+            decks = self.deck.shuffled_decks(len(player_1))
+        stats = self.play_statistics(population, player_1, player_2, decks, swap_seats)
+
+        for i in evolving:
+            cache.put(fingerprints[i], {name: values[i] for name, values in stats.items()})
+        for i, fingerprint in enumerate(fingerprints[:num_evolving]):
+            for name, value in cache.get(fingerprint).items():
+                stats[name][i] = value
+        cache.next_generation()
+        return stats
+
+    def pair_seeds(self, seed, num_pairs):
+        """Return the seed of each of num_pairs matchup pairs, spawned from seed."""
+        return np.array([pair_seed.generate_state(1)[0]
+                         for pair_seed in np.random.SeedSequence(seed).spawn(num_pairs)])
+
+    def seeded_decks(self, pair_seeds, num_episodes):
+        """Return num_episodes decks for each matchup pair, shuffled from the pair's own seed.
+
+        A pair's decks depend only on its seed, so games can be split across processes in any
+        way without changing which decks are played.
+        """
+        return np.concatenate([self.deck.shuffled_decks(num_episodes, np.random.RandomState(seed))
+                               for seed in pair_seeds])
+
+    def statistics(self, num_players, player_1, player_2, scores):
+        """Return fitness statistics of every automaton from each game's total scores."""
+        difference = scores[:, 0] - scores[:, 1]
+        won, lost = difference > 0, difference < 0
+
+        def total(weights_1, weights_2):
+            return (np.bincount(player_1, weights_1, minlength=num_players)
+                    + np.bincount(player_2, weights_2, minlength=num_players)).astype(float)
+
+        wins = total(won, lost).astype(np.int64)
+        losses = total(lost, won).astype(np.int64)
+        return {
+            'wins': wins,
+            'losses': losses,
+            'plus_minus': wins - losses,
+            'score_earned': total(scores[:, 0], scores[:, 1]),
+            'score_diff': total(difference, -difference),
+        }
+
+    def play(self, population, player_1, player_2, decks):
+        """Play one game per deck between automata player_1 and player_2 of population.
+
+        Returns:
+            (array): each player's total score, (num_games, 2)
+
+        """
+        num_games = len(decks)
+        automata = [np.asarray(player_1), np.asarray(player_2)]
+        current_states = [np.zeros(num_games, dtype=np.int64) for _ in automata]
+        engine = self.engine
+        engine.deal(num_games, decks)
+
+        def act(index, turn, smallest, median, largest):
+            sim_states = np.column_stack([self._showing_values[engine.card_showing], smallest,
+                                          median, largest, engine.num_deals / (round_index + 1),
+                                          np.full(num_games, turn)])
+            action, current_states[index] = population.run_batch(
+                current_states[index], sim_states, automata[index])
+            return action
+
+        for round_index in range(self.num_rounds):
+            engine.play_round(round_index, act)
+
+        return engine.total_scores
+
+
+class FitnessCache(object):
+    """Fitness statistics of evolving automata from earlier generations, keyed by fingerprint.
+
+    Statistics stay valid while the evaluation context (opponents and any other conditions)
+    is unchanged, and for at most max_age generations.
+
+    Parameters:
+        max_age (int): number of generations an entry is reused for; None keeps entries until
+            the context changes
+
+    Attributes:
+        hits (int): number of lookups answered from the cache
+        misses (int): number of lookups not in the cache
+        generation (int): number of generations evaluated since the cache was created
+
+    """
+
+    def __init__(self, max_age=None):
+        """Initialize empty fitness cache."""
+        assert max_age is None or max_age > 0, 'Maximum age must be greater than zero.'
+        self.max_age = max_age
+        self.context = None
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = {}
+
+    def __repr__(self):
+        return 'FitnessCache(max_age=%r)' % self.max_age
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, fingerprint):
+        return fingerprint in self._entries
+
+    def validate(self, context):
+        """Empty the cache if context differs from the one its entries were evaluated in."""
+        if context != self.context:
+            self.clear()
+            self.context = context
+
+    def get(self, fingerprint):
+        """Return statistics cached for fingerprint."""
+        return self._entries[fingerprint][1]
+
+    def lookup(self, fingerprint):
+        """Return statistics cached for fingerprint, or None; counted in hits and misses."""
+        if fingerprint in self._entries:
+            self.hits += 1
+            return self.get(fingerprint)
+        self.misses += 1
+        return None
+
+    def put(self, fingerprint, stats):
+        """Cache statistics of fingerprint evaluated this generation."""
+        self._entries[fingerprint] = (self.generation, stats)
+
+    def next_generation(self):
+        """Start a new generation and drop entries older than max_age generations."""
+        self.generation += 1
+        if self.max_age is not None:
+            self._entries = {fingerprint: entry for fingerprint, entry in self._entries.items()
+                             if self.generation - entry[0] < self.max_age}
+
+    def clear(self):
+        """Drop every entry."""
+        self._entries = {}
+
+
+def evaluate_parallel(evaluator, population, num_evolving, num_episodes, num_workers=None,
+                      seed=None, pool=None, common_decks=None, swap_seats=False):
+    """Play a generation's round-robin across worker processes; see FitnessEvaluator.evaluate.
+
+    Matchup pairs (evolving automaton, opponent) are split into one shard per worker. Each
+    pair's decks are shuffled from its own seed spawned from seed, so the statistics do not
+    depend on the number of workers.
+
+    Parameters:
+        evaluator (FitnessEvaluator): game the population plays
+        population (ArrayBDA): evolving automata followed by random opponents; sent to
+            workers as its arrays
+        num_evolving (int): number of evolving automata at the start of population
+        num_episodes (int): number of games each evolving automaton plays each opponent
+        num_workers (int): number of worker processes; defaults to the number of CPUs
+        seed (int): seed of the random number streams of every matchup pair
+        pool (Pool): pool of worker processes to reuse across generations
+        common_decks (array): decks every pair plays instead of its own (see evaluate)
+        swap_seats (bool): also play every deck with the seats swapped
+
+    Returns:
+        (dict): wins, losses, plus_minus, score_earned and score_diff of every automaton
+
+    """
+    num_workers = num_workers or multiprocessing.cpu_count()
+    num_opponents = len(population) - num_evolving
+    pair_seeds = evaluator.pair_seeds(seed, num_evolving * num_opponents)
+    shards = [(evaluator, population, num_evolving, num_episodes, pairs, pair_seeds[pairs],
+               common_decks, swap_seats)
+              for pairs in np.array_split(np.arange(len(pair_seeds)), num_workers) if len(pairs)]
+
+    if pool is None:
+        with multiprocessing.Pool(num_workers) as pool:
+            results = pool.map(_evaluate_shard, shards)
+    else:
+        results = pool.map(_evaluate_shard, shards)
+    return {name: sum(result[name] for result in results) for name in results[0]}
+
+
+def _evaluate_shard(shard):
+    """Play the games of some matchup pairs in a worker; return their statistics."""
+    (evaluator, population, num_evolving, num_episodes, pairs, pair_seeds, common_decks,
+     swap_seats) = shard
+    num_opponents = len(population) - num_evolving
+    player_1 = np.repeat(pairs // num_opponents, num_episodes)
+    player_2 = np.repeat(num_evolving + pairs % num_opponents, num_episodes)
+    if common_decks is not None:
+        decks = evaluator.common_schedule(common_decks, len(pairs))
+    else:
+        decks = evaluator.seeded_decks(pair_seeds, num_episodes)
+    return evaluator.play_statistics(population, player_1, player_2, decks, swap_seats)
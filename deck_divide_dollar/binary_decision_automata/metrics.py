@@ -0,0 +1,124 @@
+"""Buffered per-generation fitness statistics of evolutionary runs, stored as columnar files."""
+import numpy as np
+
+from ..files import atomic_write
+
+STATISTICS = ('mean', 'ci', 'std', 'best')
+
+
+class MetricsWriter(object):
+    """Buffers every generation's fitness of each metric and writes their statistics at once.
+
+    For each metric and generation the statistics are those divide_dollar_bda has always
+    reported: the mean fitness, the upper end of its confidence interval (Student's t), the
+    standard deviation and the best fitness. Fitness values are buffered only until the
+    writer is flushed; the statistics of the generations recorded since the last flush are
+    then computed in one pass and kept, and all kept statistics are saved to a .npz file with
+    one (num_runs, num_generations) array per metric and statistic.
+
+    Parameters:
+        path (str): file the statistics are written to
+        metrics (list): names of the metrics recorded every generation
+        num_generations (int): number of generations of a run
+        population_size (int): number of fitness values recorded per metric and generation
+        runs (list): numbers of the runs recorded in this file
+        confidence (float): confidence level of the intervals
+        flush_every (int): also flush after every this many recorded generations
+
+    Attributes:
+        recorded (array): whether each run and generation has been recorded
+
+    """
+
+    def __init__(self, path, metrics, num_generations, population_size, runs=(0,),
+                 confidence=0.95, flush_every=None):
+        """Initialize metrics writer with empty buffers."""
+        assert population_size > 1, 'Confidence intervals need at least two fitness values.'
+        self.path = path
+        self.metrics = list(metrics)
+        self.num_generations = num_generations
+        self.population_size = population_size
+        self.runs = list(runs)
+        self.confidence = confidence
+        self.flush_every = flush_every
+        self.recorded = np.zeros((len(self.runs), num_generations), dtype=bool)
+        self._statistics = {statistic: np.full((len(self.runs), num_generations,
+                                                len(self.metrics)), np.nan)
+                            for statistic in STATISTICS}
+        self._pending = []
+
+    def __repr__(self):
+        return 'MetricsWriter(path=%r, metrics=%r, num_generations=%i)' % (
+            self.path, self.metrics, self.num_generations)
+
+    def record(self, generation, run=None, **fitness):
+        """Buffer one generation's fitness values of every metric, given as keyword arrays."""
+        assert set(fitness) == set(self.metrics), 'Every metric must be recorded.'
+        row = 0 if run is None else self.runs.index(run)
+        self._pending.append((row, generation,
+                              np.array([fitness[metric] for metric in self.metrics], dtype=float)))
+        self.recorded[row, generation] = True
+        if self.flush_every and len(self._pending) >= self.flush_every:
+            self.flush()
+
+    def statistics(self):
+        """Return {statistic: (num_runs, num_generations, num_metrics) array} of the records.
+
+        Statistics are computed only for the generations buffered since the last flush.
+        """
+        if self._pending:
+            from scipy import stats  # only needed once per flush, for the t quantile
+            t_value = stats.t.ppf((1 + self.confidence) / 2, self.population_size - 1)
+            rows, generations, fitness = zip(*self._pending)
+            fitness = np.array(fitness)
+            mean = fitness.mean(axis=-1)
+            computed = {
+                'mean': mean,
+                'ci': mean + t_value * fitness.std(axis=-1, ddof=1)
+                / np.sqrt(self.population_size),
+                'std': fitness.std(axis=-1),
+                'best': fitness.max(axis=-1),
+            }
+            for statistic in STATISTICS:
+                self._statistics[statistic][rows, generations] = computed[statistic]
+            self._pending = []
+        return self._statistics
+
+    def flush(self):
+        """Write statistics of every recorded generation to path (moved into place)."""
+        statistics = self.statistics()
+        arrays = {'%s_%s' % (metric, statistic): statistics[statistic][:, :, column]
+                  for statistic in STATISTICS for column, metric in enumerate(self.metrics)}
+        with atomic_write(self.path) as metrics_file:
+            np.savez(metrics_file, metrics=np.array(self.metrics), runs=np.array(self.runs),
+                     recorded=self.recorded, **arrays)
+
+
+def read_metrics(path):
+    """Return statistics saved by MetricsWriter.
+
+    Returns:
+        (dict): runs (array), recorded (num_runs, num_generations) and
+            {metric: {statistic: (num_runs, num_generations) array}} for every metric;
+            unrecorded generations are NaN
+
+    """
+    with np.load(path) as metrics_file:
+        result = {'runs': metrics_file['runs'], 'recorded': metrics_file['recorded']}
+        for metric in metrics_file['metrics']:
+            result[str(metric)] = {statistic: metrics_file['%s_%s' % (metric, statistic)]
+                                   for statistic in STATISTICS}
+    return result
+
+
+def combine_metrics(paths, path):
+    """Write the statistics of several metrics files (e.g. one per run) to one file."""
+    parts = [read_metrics(part) for part in paths]
+    metrics = [name for name in parts[0] if name not in ('runs', 'recorded')]
+    arrays = {'%s_%s' % (metric, statistic): np.concatenate([part[metric][statistic]
+                                                             for part in parts])
+              for metric in metrics for statistic in STATISTICS}
+    with atomic_write(path) as metrics_file:
+        np.savez(metrics_file, metrics=np.array(metrics),
+                 runs=np.concatenate([part['runs'] for part in parts]),
+                 recorded=np.concatenate([part['recorded'] for part in parts]), **arrays)
@@ -0,0 +1,108 @@
+"""Early stopping of Monte Carlo training once learning has converged."""
+import numpy as np
+
+
+class EarlyStopping(object):
+    """Convergence criteria checked every check_interval games of training.
+
+    Training stops at the first check where any enabled criterion holds:
+
+        'stable_policy': optimal_policy has not changed over stable_windows consecutive checks
+        'ci_width': every state-action pair seen at least min_visits times has a confidence
+            interval on Q narrower than max_ci_width. Rewards lie in [-1, 1], so their
+            variance is at most 1 whatever the rewards seen so far, and the normal
+            approximation interval is at most 2 * z_score / sqrt(count) wide. min_visits
+            keeps pairs seen only a few times, for which that approximation is poor, from
+            counting towards the criterion.
+        'q_delta': the largest change in any Q value since the previous check is below
+            max_q_delta
+
+    Parameters:
+        check_interval (int): number of games between checks
+        stable_windows (int): number of consecutive checks without a policy change
+        max_ci_width (float): largest allowed confidence interval width of Q
+        max_q_delta (float): largest allowed change of Q between checks
+        z_score (float): standard normal quantile of the confidence interval (1.96 for 95%)
+        min_visits (int): minimum count of a state-action pair to be held to max_ci_width; at
+            least one pair must have been seen this often
+
+    Attributes:
+        criterion (str): criterion that stopped training, or None
+        episode (int): number of games played when training stopped, or None
+        policy_flips (int): number of states whose greedy action changed at the last check
+
+    """
+
+    def __init__(self, check_interval=10000, stable_windows=None, max_ci_width=None,
+                 max_q_delta=None, z_score=1.96, min_visits=30):
+        """Initialize early stopping criteria."""
+        assert check_interval > 0, 'Check interval must be greater than zero.'
+        assert any(criterion is not None
+                   for criterion in (stable_windows, max_ci_width, max_q_delta)), \
+            'At least one stopping criterion must be given.'
+        self.check_interval = check_interval
+        self.stable_windows = stable_windows
+        self.max_ci_width = max_ci_width
+        self.max_q_delta = max_q_delta
+        self.z_score = z_score
+        assert min_visits > 0, 'Minimum visits must be greater than zero.'
+        self.min_visits = min_visits
+
+        self.criterion = None
+        self.episode = None
+        self.policy_flips = None
+        self._stable_checks = 0
+        self._last_check = 0
+        self._last_policy = None
+        self._last_Q = None
+
+    def __repr__(self):
+        return ('EarlyStopping(check_interval=%i, stable_windows=%r, max_ci_width=%r, '
+                'max_q_delta=%r)' % (self.check_interval, self.stable_windows,
+                                     self.max_ci_width, self.max_q_delta))
+
+    def should_stop(self, q_learning, episode):
+        """Return True if training should stop; only checks every check_interval games.
+
+        Parameters:
+            q_learning (MonteCarloLearning): learner being trained
+            episode (int): number of games played so far
+
+        """
+        if episode - self._last_check < self.check_interval:
+            return False
+        self._last_check = episode
+
+        criterion = self._check(q_learning)
+        if criterion is not None:
+            self.criterion = criterion
+            self.episode = episode
+            return True
+        return False
+
+    def _check(self, q_learning):
+        """Return name of the first criterion that holds, or None."""
+        first_check = self._last_policy is None
+        if not first_check:
+            self.policy_flips = int(np.sum(q_learning.optimal_policy != self._last_policy))
+            self._stable_checks = self._stable_checks + 1 if self.policy_flips == 0 else 0
+            q_delta = np.max(np.abs(q_learning.Q - self._last_Q))
+        self._last_policy = q_learning.optimal_policy.copy()
+        self._last_Q = q_learning.Q.copy()
+
+        if (self.stable_windows is not None and not first_check
+                and self._stable_checks >= self.stable_windows):
+            return 'stable_policy'
+
+        if self.max_ci_width is not None:
+            count = q_learning.state_action_count
+            visited = count >= self.min_visits
+            if np.any(visited):
+                width = 2 * self.z_score / np.sqrt(count[visited])
+                if np.max(width) <= self.max_ci_width:
+                    return 'ci_width'
+
+        if self.max_q_delta is not None and not first_check and q_delta < self.max_q_delta:
+            return 'q_delta'
+
+        return None
@@ -0,0 +1,222 @@
+"""Exact evaluation of deck-based divide-the-dollar between two fixed table policies."""
+import fractions
+import functools
+import math
+
+import numpy as np
+
+from .actions import ActionTable
+from .state_index import StateIndex
+
+
+class ExactEvaluator(object):
+    """Exact outcome distribution of a game between two fixed table policies.
+
+    Games follow DeckBasedDivideTheDollar: player 0 is dealt the first hand_size cards and
+    player 1 the next, players alternate going first (player 0 in even rounds) and after
+    every round player 0 then player 1 draws a card. Instead of sampling shuffled decks,
+    the evaluator recurses over (remaining deck counts, hands) and memoizes the
+    distribution of the score difference still to be earned from each of them.
+
+    The number of memoized states grows with the number of ways to split the deck between
+    the hands, the cards played and the cards remaining, so this is meant for decks with a
+    few unique cards.
+
+    Parameters:
+        deck (Deck): deck the game is dealt from
+        hand_size (int): number of cards in a player's hand
+        actions (list): names of the actions available to players
+        value_of_dollar (float): the threshold used for players' scoring card value vs. nothing
+        num_rounds (int): number of rounds in a game; defaults to as many as the deck allows
+
+    Attributes:
+        state_index (StateIndex): true state index of each game state
+        action_table (ActionTable): card played for each action
+        score_unit (Fraction): largest value that every card value is a multiple of
+        num_states (int): number of (deck, hands) states memoized by the last evaluation
+
+    """
+
+    num_players = 2
+
+    def __init__(self, deck, hand_size, actions, value_of_dollar=1.0, num_rounds=None):
+        """Initialize exact evaluator."""
+        if num_rounds is None:
+            num_rounds = (deck.deck_size - self.num_players * hand_size) // self.num_players
+        assert num_rounds > 0, 'Number of rounds must be greater than zero.'
+        assert deck.deck_size >= self.num_players * (hand_size + num_rounds), \
+            'Not enough cards in deck to play all rounds.'
+        self.deck = deck
+        self.hand_size = hand_size
+        self.actions = actions
+        self.value_of_dollar = value_of_dollar
+        self.num_rounds = num_rounds
+        self.unique_cards = deck.unique_cards
+        self.card_values = deck.card_values
+        self.state_index = StateIndex(self.unique_cards)
+        self.action_table = ActionTable(self.card_values, actions, value_of_dollar)
+
+        card_fractions = [fractions.Fraction(value).limit_denominator(10 ** 6)
+                          for value in self.card_values]
+        denominator = functools.reduce(lambda a, b: a * b // math.gcd(a, b),
+                                       [value.denominator for value in card_fractions], 1)
+        self.score_unit = fractions.Fraction(1, denominator)
+        self.card_units = [int(value * denominator) for value in card_fractions]
+        self._offset = num_rounds * max(self.card_units)
+        self.num_states = 0
+
+        self._policies = None
+        self._memo = {}
+        self._plays = {}
+
+    def __repr__(self):
+        return 'ExactEvaluator(deck=%s, hand_size=%i, num_rounds=%i)' % (
+            repr(self.deck), self.hand_size, self.num_rounds)
+
+    def evaluate(self, policies):
+        """Return exact outcome of a game between two table policies.
+
+        Parameters:
+            policies (list of arrays): each player's action for every true state index
+
+        Returns:
+            (dict): expected_score_difference (player 0 minus player 1) and the win, draw and
+                loss probabilities of player 0
+
+        """
+        assert len(policies) == self.num_players, 'Exact evaluation is for two players.'
+        distribution = self.score_difference_distribution(policies)
+        differences = (np.arange(len(distribution)) - self._offset) * float(self.score_unit)
+        return {
+            'expected_score_difference': float(np.dot(distribution, differences)),
+            'win': float(np.sum(distribution[self._offset + 1:])),
+            'draw': float(distribution[self._offset]),
+            'loss': float(np.sum(distribution[:self._offset])),
+        }
+
+    def score_difference_distribution(self, policies):
+        """Return probability of each final score difference, in score units.
+
+        Returns:
+            (array): probability that player 0's score minus player 1's score equals
+                (index - num_rounds * max(card_units)) * score_unit
+
+        """
+        self._policies = [[int(action) for action in policy] for policy in policies]
+        self._memo = {}
+        self._plays = {}
+        deck = tuple(self.deck.cards[value] for value in self.card_values)
+
+        distribution = np.zeros(2 * self._offset + 1)
+        for hand_0, deck_0, probability_0 in self._deals(deck, self.hand_size):
+            for hand_1, deck_1, probability_1 in self._deals(deck_0, self.hand_size):
+                distribution += (probability_0 * probability_1
+                                 * self._future_distribution(deck_1, hand_0, hand_1, 0))
+        self.num_states = len(self._memo)
+        return distribution
+
+    def _future_distribution(self, deck, hand_0, hand_1, round_index):
+        """Return distribution of score difference earned from this round on."""
+        key = (deck, hand_0, hand_1)
+        if key in self._memo:
+            return self._memo[key]
+
+        hands = [list(hand_0), list(hand_1)]
+        card_showing = self.unique_cards
+        cards_played = [None, None]
+        first = round_index % self.num_players
+        for index in (first, 1 - first):
+            card = self._play(index, tuple(hands[index]), card_showing)
+            hands[index][card] -= 1
+            cards_played[index] = card
+            card_showing = card
+
+        values = [self.card_values[card] for card in cards_played]
+        increment = 0
+        if 0.0 + values[first] + values[1 - first] <= self.value_of_dollar:
+            increment = self.card_units[cards_played[0]] - self.card_units[cards_played[1]]
+
+        distribution = np.zeros(2 * self._offset + 1)
+        if round_index == self.num_rounds - 1:
+            distribution[self._offset] = 1.0
+        else:
+            for next_hand_0, deck_0, probability_0 in _draws(hands[0], list(deck)):
+                for next_hand_1, deck_1, probability_1 in _draws(hands[1], deck_0):
+                    distribution += probability_0 * probability_1 * self._future_distribution(
+                        tuple(deck_1), next_hand_0, next_hand_1, round_index + 1)
+
+        if increment > 0:
+            distribution = np.concatenate([np.zeros(increment), distribution[:-increment]])
+        elif increment < 0:
+            distribution = np.concatenate([distribution[-increment:], np.zeros(-increment)])
+        self._memo[key] = distribution
+        return distribution
+
+    def _play(self, player, hand, card_showing):
+        """Return card index played from hand (counts) following player's policy."""
+        key = (player, hand, card_showing)
+        if key in self._plays:
+            return self._plays[key]
+
+        state, hand_mask, median = self._observe(hand, card_showing)
+        card = int(self.action_table.card_type[card_showing, hand_mask, median,
+                                               self._policies[player][state]])
+        self._plays[key] = card
+        return card
+
+    def _observe(self, hand, card_showing):
+        """Return true state index, held card bitmask and median card of hand (counts)."""
+        held = [card for card in range(self.unique_cards) if hand[card]]
+        median, seen = None, 0
+        for card in held:
+            seen += hand[card]
+            if seen > sum(hand) // 2:
+                median = card
+                break
+        state = int(self.state_index.rank((card_showing, held[0], median, held[-1])))
+        return state, sum(1 << card for card in held), median
+
+    def _deals(self, deck, num_cards):
+        """Yield every hand of num_cards dealt from deck, the deck left and its probability."""
+        for hand in _compositions(num_cards, deck):
+            probability = _multivariate_hypergeometric(hand, deck)
+            yield hand, tuple(d - h for d, h in zip(deck, hand)), probability
+
+
+def _draws(hand, deck):
+    """Yield (hand, deck left, probability) for drawing each card value left in deck."""
+    num_cards = sum(deck)
+    for card, count in enumerate(deck):
+        if count:
+            hand[card] += 1
+            deck[card] -= 1
+            yield tuple(hand), list(deck), count / num_cards
+            hand[card] -= 1
+            deck[card] += 1
+
+
+def _compositions(total, limits):
+    """Yield every tuple of counts summing to total with each count at most its limit."""
+    if len(limits) == 1:
+        if total <= limits[0]:
+            yield (total,)
+        return
+    for count in range(min(total, limits[0]) + 1):
+        for rest in _compositions(total - count, limits[1:]):
+            yield (count,) + rest
+
+
+def _multivariate_hypergeometric(hand, deck):
+    """Probability of drawing exactly hand (counts) from deck (counts) without replacement."""
+    probability = 1
+    for h, d in zip(hand, deck):
+        probability *= _binomial(d, h)
+    return probability / _binomial(sum(deck), sum(hand))
+
+
+def _binomial(n, k):
+    """Return n choose k."""
+    result = 1
+    for i in range(k):
+        result = result * (n - i) // (i + 1)
+    return result
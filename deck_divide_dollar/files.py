@@ -0,0 +1,27 @@
+"""Writing output files so that readers never see a partly written file."""
+import contextlib
+import os
+
+
+@contextlib.contextmanager
+def atomic_write(path, mode='wb'):
+    """Open a temporary file to write path's contents to, and move it into place on success.
+
+    The temporary file is named after path and the process id, so processes writing the same
+    path do not write to each other's temporary file. If writing fails, it is removed and path
+    is left as it was.
+
+    Parameters:
+        path (str): file to write
+        mode (str): mode the temporary file is opened with, 'wb' or 'w'
+
+    """
+    temp_path = '%s.%i.tmp' % (path, os.getpid())
+    try:
+        with open(temp_path, mode) as temp_file:
+            yield temp_file
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
@@ -1,49 +1,122 @@
 import random
 
+import numpy as np
+
 
 class Deck(object):
     """Deck of cards.
 
+    Cards are dealt by advancing a cursor over the shuffled deck rather than by
+    slicing off the cards dealt. With shuffle_batch_size, deck_order is a row of a batch of
+    decks shuffled at once, so a reset only moves to the next row.
+
     Parameters:
         cards (dict): {card_value: unique_cards}
+        shuffle_batch_size (int): if given, shuffle this many decks at once and use one per reset
 
     Attributes:
         cards (dict): {card_value: num_cards}
         unique_cards (int): number of unique card values
         deck_size (int): total number of cards in the deck
         card_index (dict): maps each unique card to an integer for indexing purposes
-        current_deck (list): full list of cards remaining in deck
+        card_values (list): unique card values ordered by card index
+        deck_order (list or array): every card in the deck in the order it will be dealt; a
+            view of the pre-shuffled batch with shuffle_batch_size
+        cursor (int): position in deck_order of the next card to deal
+        current_deck (list or array): cards remaining in deck, sliced from deck_order
 
     """
 
-    def __init__(self, cards):
+    def __init__(self, cards, shuffle_batch_size=None):
         """Initialize deck of cards."""
         self.cards = cards
         self.unique_cards = len(self.cards)
         self.deck_size = sum(self.cards.values())
         self.card_index = {card_value: i
                            for i, card_value in enumerate(sorted(self.cards.keys()) + [0])}
-        self.current_deck = self.shuffle_deck()
+        self.card_values = sorted(self.cards.keys())
+        self.shuffle_batch_size = shuffle_batch_size
+        self._shuffled_decks = None
+        self._next_shuffled_deck = 0
+        self.deck_order = [card for card, num in zip(self.cards.keys(), self.cards.values())
+                           for n in range(num)]
+        self.cursor = 0
+        self.reset_current_deck()
 
     def __repr__(self):
         return 'Deck(cards=%s)' % repr(self.cards)
 
+    @property
+    def current_deck(self):
+        return self.deck_order[self.cursor:]
+
+    @current_deck.setter
+    def current_deck(self, deck):
+        self.deck_order = list(deck)
+        self.cursor = 0
+
     def shuffle_deck(self):
-        """Return shuffled deck of all cards."""
-        deck = [card for card, num in zip(self.cards.keys(), self.cards.values())
-                for n in range(num)]
-        random.shuffle(deck)
-        return deck
+        """Shuffle all cards back into the deck in place and return the shuffled deck."""
+        random.shuffle(self.deck_order)
+        self.cursor = 0
+        return self.deck_order
+
+    def shuffled_decks(self, num_decks, random_state=None):
+        """Return card indices of num_decks independently shuffled decks.
+
+        Parameters:
+            num_decks (int): number of decks to shuffle
+            random_state (RandomState): random number generator; defaults to np.random
+
+        Returns:
+            (array): (num_decks, deck_size) card index of each card, in dealing order
+
+        """
+        unshuffled = np.repeat(np.arange(self.unique_cards),
+                               [self.cards[card_value] for card_value in self.card_values])
+        random_state = np.random if random_state is None else random_state
+        order = np.argsort(random_state.random_sample((num_decks, self.deck_size)), axis=1)
+        return unshuffled[order]
 
     def reset_current_deck(self):
-        self.current_deck = self.shuffle_deck()
+        if not self.shuffle_batch_size:
+            self.shuffle_deck()
+            return
+
+        if (self._shuffled_decks is None
+                or self._next_shuffled_deck == len(self._shuffled_decks)):
+            self._shuffled_decks = np.asarray(self.card_values)[
+                self.shuffled_decks(self.shuffle_batch_size)]
+            self._next_shuffled_deck = 0
+        self.deck_order = self._shuffled_decks[self._next_shuffled_deck]
+        self.cursor = 0
+        self._next_shuffled_deck += 1
+
+    def get_state(self):
+        """Return {name: array} of the deck's dealing order, cursor and pre-shuffled decks."""
+        shuffled_decks = self._shuffled_decks
+        if shuffled_decks is None:
+            shuffled_decks = np.zeros((0, self.deck_size))
+        return {'deck_order': np.asarray(self.deck_order), 'cursor': self.cursor,
+                'shuffled_decks': shuffled_decks, 'next_shuffled_deck': self._next_shuffled_deck}
+
+    def set_state(self, state):
+        """Restore the dealing order, cursor and pre-shuffled decks saved by get_state."""
+        shuffled_decks = np.asarray(state['shuffled_decks'])
+        self._shuffled_decks = shuffled_decks if len(shuffled_decks) else None
+        self._next_shuffled_deck = int(state['next_shuffled_deck'])
+        deck_order = np.asarray(state['deck_order'])
+        self.deck_order = deck_order.copy() if self.shuffle_batch_size else deck_order.tolist()
+        self.cursor = int(state['cursor'])
 
     def deal_cards(self, num_cards_to_deal):
         """Deal N cards from top of deck."""
-        assert len(self.current_deck) >= num_cards_to_deal, \
+        assert len(self.deck_order) - self.cursor >= num_cards_to_deal, \
             'Not enough cards left in deck to deal those cards.'
-        dealt_cards = self.current_deck[:num_cards_to_deal]
-        self.current_deck = self.current_deck[num_cards_to_deal:]
+        dealt_cards = self.deck_order[self.cursor:self.cursor + num_cards_to_deal]
+        self.cursor += num_cards_to_deal
+        if isinstance(dealt_cards, np.ndarray):
+            return dealt_cards.tolist()
         return dealt_cards
 
 
@@ -64,12 +137,15 @@ class Player(object):
 
     """
 
+    __slots__ = ('policy', 'hand', 'game_state', 'next_action', 'last_card_played',
+                 'total_score', 'wins')
+
     hand_size = 7
 
     def __init__(self, policy=None):
         """Initialize player."""
         self.policy = policy
-        self.hand = []
+        self.reset_hand()
         self.game_state = None
         self.next_action = None
         self.last_card_played = None
@@ -91,10 +167,33 @@ class Player(object):
         self.last_card_played = card_value
         return card_value
 
+    def play_card_value(self, card_value):
+        """Play a card of specific value from hand."""
+        return self.play_card(self.hand.index(card_value))
+
+    def held_card_mask(self, card_index):
+        """Return bitmask with bit card_index[card] set for every card value in hand."""
+        mask = 0
+        for card in self.hand:
+            mask |= 1 << card_index[card]
+        return mask
+
+    def smallest_card(self):
+        """Return value of smallest card in hand."""
+        return self.hand[0]
+
+    def median_card(self):
+        """Return value of median card in hand."""
+        return self.hand[len(self.hand) // 2]
+
+    def largest_card(self):
+        """Return value of largest card in hand."""
+        return self.hand[-1]
+
     def set_game_state(self, card_showing):
         """TODO: Remove this method; not appropriate for player class."""
-        median_card_index = len(self.hand) // 2
-        self.game_state = [card_showing, self.hand[0], self.hand[median_card_index], self.hand[-1]]
+        self.game_state = [card_showing, self.smallest_card(), self.median_card(),
+                           self.largest_card()]
 
     def reset_hand(self):
         """Remove all cards from a player's hand."""
@@ -107,3 +206,110 @@ class Player(object):
     def reset_wins(self):
         """Reset player's win count to zero."""
         self.wins = 0
+
+
+class CountVectorPlayer(Player):
+    """Player of card game whose hand is stored as a count of each unique card value.
+
+    Drawing, playing and finding the smallest, median or largest card take
+    O(unique_cards) time without re-sorting or allocating a new hand. Every method used
+    during play reads hand_counts directly; the sorted hand list is only built when hand is
+    read, e.g. for display. DeckBasedDivideTheDollar creates these players when given a
+    number of players.
+
+    Parameters:
+        card_values (list): every unique card value in the deck
+        policy (list): an initial policy
+
+    Attributes:
+        card_values (list): unique card values in increasing order
+        card_index (dict): maps each unique card value to its position in card_values
+        hand_counts (list): number of each unique card value in the player's hand
+        num_cards (int): number of cards in the player's hand
+        hand (list): the player's cards in hand, sorted (built on access)
+
+    """
+
+    __slots__ = ('card_values', 'card_index', 'hand_counts', 'num_cards')
+
+    def __init__(self, card_values, policy=None):
+        """Initialize player with an empty count vector hand."""
+        self.card_values = sorted(card_values)
+        self.card_index = {card_value: i for i, card_value in enumerate(self.card_values)}
+        self.hand_counts = [0] * len(self.card_values)
+        super(CountVectorPlayer, self).__init__(policy)
+
+    def __repr__(self):
+        return 'CountVectorPlayer(card_values=%s, policy=%s)' % (repr(self.card_values),
+                                                                 repr(self.policy))
+
+    @property
+    def hand(self):
+        """Return a new sorted list of the cards in hand; not used during play."""
+        return [card_value for card_value, count in zip(self.card_values, self.hand_counts)
+                for n in range(count)]
+
+    def pick_up_cards(self, cards):
+        """Add cards (list) to player's hand."""
+        assert isinstance(cards, (list))
+        for card in cards:
+            self.hand_counts[self.card_index[card]] += 1
+        self.num_cards += len(cards)
+
+    def play_card(self, card_position_in_hand):
+        """Play specific card by position in hand."""
+        if card_position_in_hand < 0:
+            card_position_in_hand += self.num_cards
+        if not 0 <= card_position_in_hand < self.num_cards:
+            raise IndexError('Card position out of range.')
+        card_type = self._card_type_at(card_position_in_hand)
+        self.hand_counts[card_type] -= 1
+        self.num_cards -= 1
+        card_value = self.card_values[card_type]
+        self.last_card_played = card_value
+        return card_value
+
+    def play_card_value(self, card_value):
+        """Play a card of specific value from hand."""
+        card_type = self.card_index[card_value]
+        if self.hand_counts[card_type] == 0:
+            raise ValueError('Card value not in hand.')
+        self.hand_counts[card_type] -= 1
+        self.num_cards -= 1
+        self.last_card_played = card_value
+        return card_value
+
+    def held_card_mask(self, card_index):
+        """Return bitmask with bit card_index[card] set for every card value in hand."""
+        mask = 0
+        for card_value, count in zip(self.card_values, self.hand_counts):
+            if count:
+                mask |= 1 << card_index[card_value]
+        return mask
+
+    def smallest_card(self):
+        """Return value of smallest card in hand."""
+        return self.card_values[self._card_type_at(0)]
+
+    def median_card(self):
+        """Return value of median card in hand."""
+        return self.card_values[self._card_type_at(self.num_cards // 2)]
+
+    def largest_card(self):
+        """Return value of largest card in hand."""
+        return self.card_values[self._card_type_at(self.num_cards - 1)]
+
+    def reset_hand(self):
+        """Remove all cards from a player's hand."""
+        for card_type in range(len(self.hand_counts)):
+            self.hand_counts[card_type] = 0
+        self.num_cards = 0
+
+    def _card_type_at(self, card_position_in_hand):
+        """Return index of the card value at a position in the sorted hand."""
+        cards_seen = 0
+        for card_type, count in enumerate(self.hand_counts):
+            cards_seen += count
+            if cards_seen > card_position_in_hand:
+                return card_type
+        raise IndexError('Card position out of range.')
@@ -0,0 +1,197 @@
+"""Heuristic response to a fixed table policy, read off a full-information search."""
+import numpy as np
+
+from .exact import ExactEvaluator, _draws
+
+
+class HeuristicResponse(ExactEvaluator):
+    """Table policy responding to a fixed opponent table policy, and its exact outcome.
+
+    The search recurses over (remaining deck counts, hands, score difference, round) like
+    ExactEvaluator, with the responder picking the card that maximizes its expected reward
+    (1 for a win, 0 for a draw, -1 for a loss) at each of its turns. That player sees the
+    full game state, so its expected reward bounds from above what any table policy can
+    achieve against the opponent.
+
+    A table policy only sees the true state index, which many full game states share, so it
+    cannot in general play as the search does. The table policy is read off the search by a
+    heuristic: every state the responder reaches is weighted by the probability of reaching
+    it, each action that plays the searched card is credited with that weight, and each true
+    state index takes its most credited action. States that are never reached keep the
+    opponent's action. This is not a best response over the table's states; its expected
+    reward is exact, but only shows that the opponent can be beaten by at least that much.
+
+    Parameters:
+        deck (Deck): deck the game is dealt from
+        hand_size (int): number of cards in a player's hand
+        actions (list): names of the actions available to players
+        value_of_dollar (float): the threshold used for players' scoring card value vs. nothing
+        num_rounds (int): number of rounds in a game; defaults to as many as the deck allows
+        seat (int): player the responder plays as; learned policies train as player 0, so
+            by default the responder is player 1
+
+    Attributes:
+        num_states (int): number of game states memoized by the last search
+
+    """
+
+    def __init__(self, deck, hand_size, actions, value_of_dollar=1.0, num_rounds=None, seat=1):
+        """Initialize heuristic response solver."""
+        super(HeuristicResponse, self).__init__(deck, hand_size, actions, value_of_dollar,
+                                                num_rounds)
+        assert seat in range(self.num_players), 'Seat must be 0 or 1.'
+        self.seat = seat
+        self._values = {}
+        self._choices = {}
+
+    def __repr__(self):
+        return 'HeuristicResponse(deck=%s, hand_size=%i, num_rounds=%i, seat=%i)' % (
+            repr(self.deck), self.hand_size, self.num_rounds, self.seat)
+
+    def respond(self, policy):
+        """Return heuristic response table policy against policy and its exact outcome.
+
+        Parameters:
+            policy (array): opponent's action for every true state index, e.g.
+                MonteCarloLearning.optimal_policy
+
+        Returns:
+            (dict): policy (responder's action for every true state index), the win, draw
+                and loss probabilities and expected_reward of the responder playing it, and
+                full_information_reward, the responder's expected reward when it sees the
+                full game state (an upper bound on expected_reward of any table policy)
+
+        """
+        opponent_policy = [int(action) for action in policy]
+        self._policies = [opponent_policy, opponent_policy]
+        self._plays = {}
+        self._values = {}
+        self._choices = {}
+        deck = tuple(self.deck.cards[value] for value in self.card_values)
+
+        deals = [(hand_0, hand_1, deck_1, probability_0 * probability_1)
+                 for hand_0, deck_0, probability_0 in self._deals(deck, self.hand_size)
+                 for hand_1, deck_1, probability_1 in self._deals(deck_0, self.hand_size)]
+        full_information_reward = sum(probability * self._value(deck_1, hand_0, hand_1, 0, 0)
+                                      for hand_0, hand_1, deck_1, probability in deals)
+        self.num_states = len(self._values)
+
+        response = self._table_policy(deals, opponent_policy)
+        policies = [opponent_policy, opponent_policy]
+        policies[self.seat] = list(response)
+        result = self.evaluate(policies)
+        win, loss = (result['win'], result['loss']) if self.seat == 0 else \
+            (result['loss'], result['win'])
+        return {
+            'policy': response,
+            'win': win,
+            'draw': result['draw'],
+            'loss': loss,
+            'expected_reward': win - loss,
+            'full_information_reward': float(full_information_reward),
+        }
+
+    def _value(self, deck, hand_0, hand_1, difference, round_index):
+        """Return responder's expected reward from this round on, playing its best cards.
+
+        difference is player 0's score minus player 1's score so far, in score units.
+        """
+        key = (deck, hand_0, hand_1, difference, round_index)
+        if key in self._values:
+            return self._values[key]
+
+        first = round_index % self.num_players
+        hands = (hand_0, hand_1)
+        best = None
+        for card_first in self._candidates(first, hands[first], self.unique_cards):
+            value = None
+            for card_second in self._candidates(1 - first, hands[1 - first], card_first):
+                cards_played = [card_first, card_second] if first == 0 else \
+                    [card_second, card_first]
+                outcome = self._outcome(deck, hands, cards_played, difference, round_index)
+                if 1 - first == self.seat and (value is None or outcome > value):
+                    value = outcome
+                    self._choices[key + (card_first,)] = card_second
+                elif 1 - first != self.seat:
+                    value = outcome
+            if first == self.seat and (best is None or value > best):
+                best = value
+                self._choices[key + (self.unique_cards,)] = card_first
+            elif first != self.seat:
+                best = value
+
+        self._values[key] = best
+        return best
+
+    def _candidates(self, player, hand, card_showing):
+        """Return card indices player may play: every card held by the responder."""
+        if player == self.seat:
+            return [card for card in range(self.unique_cards) if hand[card]]
+        return [self._play(player, hand, card_showing)]
+
+    def _outcome(self, deck, hands, cards_played, difference, round_index):
+        """Return responder's expected reward after cards_played (by player) this round."""
+        first = round_index % self.num_players
+        values = [self.card_values[card] for card in cards_played]
+        if 0.0 + values[first] + values[1 - first] <= self.value_of_dollar:
+            difference += self.card_units[cards_played[0]] - self.card_units[cards_played[1]]
+
+        if round_index == self.num_rounds - 1:
+            reward = float(np.sign(difference))
+            return reward if self.seat == 0 else -reward
+
+        next_hands = [list(hand) for hand in hands]
+        for player, card in enumerate(cards_played):
+            next_hands[player][card] -= 1
+        value = 0.0
+        for next_hand_0, deck_0, probability_0 in _draws(next_hands[0], list(deck)):
+            for next_hand_1, deck_1, probability_1 in _draws(next_hands[1], deck_0):
+                value += probability_0 * probability_1 * self._value(
+                    tuple(deck_1), next_hand_0, next_hand_1, difference, round_index + 1)
+        return value
+
+    def _table_policy(self, deals, opponent_policy):
+        """Return table policy crediting actions by how likely the searched play is reached."""
+        weights = np.zeros((self.state_index.num_states, len(self.actions)))
+        reach = {}
+        for hand_0, hand_1, deck, probability in deals:
+            key = (deck, hand_0, hand_1, 0)
+            reach[key] = reach.get(key, 0.0) + probability
+
+        for round_index in range(self.num_rounds):
+            next_reach = {}
+            first = round_index % self.num_players
+            for (deck, hand_0, hand_1, difference), probability in reach.items():
+                hands = (hand_0, hand_1)
+                key = (deck, hand_0, hand_1, difference, round_index)
+                card_showing = self.unique_cards
+                cards_played = [None, None]
+                for player in (first, 1 - first):
+                    if player == self.seat:
+                        card = self._choices[key + (card_showing,)]
+                        state, hand_mask, median = self._observe(hands[player], card_showing)
+                        weights[state] += probability * (
+                            self.action_table.card_type[card_showing, hand_mask, median] == card)
+                    else:
+                        card = self._play(player, hands[player], card_showing)
+                    cards_played[player] = card
+                    card_showing = card
+
+                if round_index == self.num_rounds - 1:
+                    continue
+                values = [self.card_values[card] for card in cards_played]
+                if 0.0 + values[first] + values[1 - first] <= self.value_of_dollar:
+                    difference += (self.card_units[cards_played[0]]
+                                   - self.card_units[cards_played[1]])
+                next_hands = [list(hand) for hand in hands]
+                for player, card in enumerate(cards_played):
+                    next_hands[player][card] -= 1
+                for next_hand_0, deck_0, probability_0 in _draws(next_hands[0], list(deck)):
+                    for next_hand_1, deck_1, probability_1 in _draws(next_hands[1], deck_0):
+                        next_key = (tuple(deck_1), next_hand_0, next_hand_1, difference)
+                        next_reach[next_key] = (next_reach.get(next_key, 0.0)
+                                                + probability * probability_0 * probability_1)
+            reach = next_reach
+
+        reached = weights.sum(axis=1) > 0
+        return np.where(reached, np.argmax(weights, axis=1), opponent_policy)
@@ -0,0 +1,83 @@
+"""Throughput and per-phase timing of training runs."""
+import collections
+import time
+
+
+class PhaseTimer(object):
+    """Accumulates wall time spent in each phase of training and reports it at intervals.
+
+    Call start() before the first phase, lap(phase) at the end of every phase and
+    episodes_done(n) after every n games. Every report_interval games a report is appended
+    to reports and passed to callback.
+
+    Parameters:
+        report_interval (int): number of games between reports
+        callback (callable): called with each report (dict)
+        history (int): number of most recent reports kept in reports
+
+    Attributes:
+        episodes (int): number of games timed
+        phase_seconds (dict): {phase: total seconds spent in phase}
+        reports (deque): most recent reports, oldest first
+
+    """
+
+    def __init__(self, report_interval=10000, callback=None, history=100):
+        """Initialize phase timer."""
+        assert report_interval > 0, 'Report interval must be greater than zero.'
+        self.report_interval = report_interval
+        self.callback = callback
+        self.reports = collections.deque(maxlen=history)
+        self.episodes = 0
+        self.phase_seconds = collections.defaultdict(float)
+        self._start_time = None
+        self._lap_time = None
+        self._report_episodes = 0
+        self._report_time = None
+
+    def __repr__(self):
+        return 'PhaseTimer(report_interval=%i)' % self.report_interval
+
+    def start(self):
+        """Start timing from now."""
+        self._lap_time = time.perf_counter()
+        if self._start_time is None:
+            self._start_time = self._report_time = self._lap_time
+
+    def lap(self, phase):
+        """Add time since the previous lap (or start) to phase."""
+        now = time.perf_counter()
+        self.phase_seconds[phase] += now - self._lap_time
+        self._lap_time = now
+
+    def episodes_done(self, num_episodes=1):
+        """Count finished games and report if report_interval games have passed."""
+        self.episodes += num_episodes
+        if self.episodes - self._report_episodes >= self.report_interval:
+            self.report()
+
+    def report(self):
+        """Append a report of throughput and time per phase so far, and pass it to callback.
+
+        Returns:
+            (dict): episodes, elapsed seconds, episodes per second overall and since the
+                previous report, and seconds spent in each phase
+
+        """
+        now = time.perf_counter()
+        elapsed = now - self._start_time
+        recent_elapsed = now - self._report_time
+        report = {
+            'episodes': self.episodes,
+            'elapsed_seconds': elapsed,
+            'episodes_per_second': self.episodes / elapsed if elapsed else 0.0,
+            'recent_episodes_per_second': ((self.episodes - self._report_episodes)
+                                           / recent_elapsed if recent_elapsed else 0.0),
+            'phase_seconds': dict(self.phase_seconds),
+        }
+        self._report_episodes = self.episodes
+        self._report_time = now
+        self.reports.append(report)
+        if self.callback is not None:
+            self.callback(report)
+        return report
@@ -1,10 +1,12 @@
-import itertools
-import math
+import random
 
 import numpy as np
 
-from .game import Deck, Player
-from .q_learning import MonteCarloLearning
+from .actions import ActionTable
+from .batch import BatchDivideTheDollar
+from .game import CountVectorPlayer, Deck, Player
+from .q_learning import MonteCarloLearning, TrajectoryBuffer
+from .state_index import StateIndex
 
 
 class DeckBasedDivideTheDollar(object):
@@ -13,50 +15,184 @@ class DeckBasedDivideTheDollar(object):
     Parameters:
         value_of_dollar (float): the threshold used for players' scoring card value vs. nothing
         deck (Deck):
-        players (list of Players): list of Players, first is assumed to be Monte Carlo Q-Learner
+        players (list of Players or int): list of Players, first is assumed to be Monte Carlo
+            Q-Learner; or the number of players to create
         num_games_to_play (int): number of full games of deck-based divide-the-dollar to play
+        batch_size (int): if given, play games in batches of this size with BatchDivideTheDollar
+        checkpoint_interval (int): if given, save a checkpoint every this many games
+        checkpoint_path (str): file name of checkpoint
+        timer (PhaseTimer): if given, time each phase of training and report throughput
+        stopping (EarlyStopping): if given, stop before num_games_to_play once converged
+        count_vector_hands (bool): if players is a number, create CountVectorPlayers, whose
+            hands are counts of each card value, rather than Players holding sorted lists
+
+    Attributes:
+        episodes_played (int): number of games played so far, including any resumed from
 
     """
 
-    def __init__(self, deck, players, num_games_to_play=2000000, value_of_dollar=1.0):
+    def __init__(self, deck, players, num_games_to_play=2000000, value_of_dollar=1.0,
+                 batch_size=None, checkpoint_interval=None, checkpoint_path='checkpoint.npz',
+                 timer=None, stopping=None, count_vector_hands=True):
         self.value_of_dollar = value_of_dollar
         self.deck = deck
+        if isinstance(players, int):
+            players = [CountVectorPlayer(deck.card_values) if count_vector_hands else Player()
+                       for _ in range(players)]
         self.players = players
         self.num_players = len(self.players)
         self.num_games_to_play = num_games_to_play
+        self.batch_size = batch_size
+        self.checkpoint_interval = checkpoint_interval
+        self.checkpoint_path = checkpoint_path
+        self.timer = timer
+        self.stopping = stopping
+        self.episodes_played = 0
+        self._last_checkpoint = 0
         self.actions = ['small_spoil', 'median', 'large_max']
         self.num_actions = len(self.actions)
-        self.num_states = ((self.deck.unique_cards + 1)
-                           * (math.factorial(self.num_actions + self.deck.unique_cards - 1))
-                           / (math.factorial(self.num_actions)
-                              * math.factorial(self.deck.unique_cards - 1)))
-        self.true_state_index = true_state_index(self.deck.unique_cards)
+        self.action_table = ActionTable(self.deck.card_values, self.actions, self.value_of_dollar)
+        self.state_index = StateIndex(self.deck.unique_cards)
+        self.num_states = self.state_index.num_states
         self.num_rounds = ((self.deck.deck_size - (self.num_players * Player.hand_size))
                            // self.num_players)
-        self.q_learning = MonteCarloLearning(self.num_states, self.num_actions)
+        self.q_learning = MonteCarloLearning(self.num_states, self.num_actions,
+                                             episode_length=self.num_rounds)
         for player in self.players:  # TODO: set initial policy, and update how?
             player.policy = self.q_learning.optimal_policy
 
-    def play_games(self):
+    def play_games(self, save_output=True):
         """Play all games in order to converge to optimal policy via q-learning."""
-        for episode_index in range(self.num_games_to_play):
+        if self.batch_size:
+            self._play_batched_games()
+        elif self.timer:
+            self._play_timed_games()
+        else:
+            while self.episodes_played < self.num_games_to_play:
+                self._initialize_episode()
+                self._play_rounds()
+                game_result = self._scorekeeping()  # reward for monte carlo player
+                self._aggregate_learning(game_result)
+                self.episodes_played += 1
+                self.checkpoint()
+                if self.converged():
+                    break
+        if save_output:
+            self.save_learning()
+
+    def resume(self, path=None, warm_start=False):
+        """Load q-learning from a checkpoint and continue from the episode it was saved at.
+
+        Besides the learning statistics, the checkpoint holds the random number generator
+        states, the players' wins and the deck's state, so a resumed run plays the same games
+        as one that was never interrupted. The state of stopping and timer is not saved.
+
+        Parameters:
+            path (str): checkpoint file name; defaults to checkpoint_path
+            warm_start (bool): only reuse the learned statistics and start counting games from
+                zero with the current random number generator states
+
+        """
+        path = path or self.checkpoint_path
+        episode = self.q_learning.load_checkpoint(path, restore_rng=not warm_start)
+        self.episodes_played = 0 if warm_start else episode
+        extra = self.q_learning.checkpoint_extra(path)
+        if not warm_start and extra:
+            for player, wins in zip(self.players, extra['wins']):
+                player.wins = int(wins)
+            self.deck.set_state({name[len('deck_'):]: value for name, value in extra.items()
+                                 if name.startswith('deck_')})
+        self._last_checkpoint = self.episodes_played
+
+    def converged(self):
+        """Return True if early stopping criteria say training has converged."""
+        return bool(self.stopping
+                    and self.stopping.should_stop(self.q_learning, self.episodes_played))
+
+    def checkpoint(self):
+        """Save a checkpoint if checkpoint_interval games have been played since the last one."""
+        if (self.checkpoint_interval
+                and self.episodes_played - self._last_checkpoint >= self.checkpoint_interval):
+            extra = {'deck_' + name: value for name, value in self.deck.get_state().items()}
+            extra['wins'] = [player.wins for player in self.players]
+            self.q_learning.save_checkpoint(self.checkpoint_path, self.episodes_played, extra)
+            self._last_checkpoint = self.episodes_played
+
+    def save_learning(self):
+        """Save the learned action values and statistics to .txt files.
+
+        Files are named after episodes_played, the number of games training actually ran for,
+        which is less than num_games_to_play if it stopped early.
+        """
+        self.q_learning.save_learning(self.episodes_played)
+
+    def _play_timed_games(self):
+        """Play all games one at a time, timing each phase with timer."""
+        timer = self.timer
+        timer.start()
+        while self.episodes_played < self.num_games_to_play:
             self._initialize_episode()
+            timer.lap('initialize_episode')
             self._play_rounds()
-            game_result = self._scorekeeping()  # reward for monte carlo player
+            timer.lap('play_rounds')
+            game_result = self._scorekeeping()
+            timer.lap('scorekeeping')
             self._aggregate_learning(game_result)
-        self._save_output()
+            timer.lap('aggregate_learning')
+            self.episodes_played += 1
+            self.checkpoint()
+            timer.lap('checkpoint')
+            timer.episodes_done(1)
+            if self.converged():
+                break
+
+    def _play_batched_games(self):
+        """Play all games in batches of batch_size, updating q-learning after each batch.
+
+        Every game in a batch is played with the policy as it stood at the start of the batch.
+
+        """
+        assert self.num_players == BatchDivideTheDollar.num_players, \
+            'Batched games are played by two players.'
+        engine = BatchDivideTheDollar(self.deck, Player.hand_size, self.num_rounds, self.actions,
+                                      self.state_index, self.value_of_dollar)
+        trajectory = TrajectoryBuffer(self.num_rounds, self.batch_size)
+        timer = self.timer
+        if timer:
+            timer.start()
+        while self.episodes_played < self.num_games_to_play:
+            batch_size = min(self.batch_size, self.num_games_to_play - self.episodes_played)
+            states, actions, rewards = engine.play_batch(
+                [player.policy for player in self.players], batch_size, trajectory=trajectory)
+            if timer:
+                timer.lap('play_rounds')
+            self.players[0].wins += int(np.sum(rewards == 1))
+            self.players[1].wins += int(np.sum(rewards == -1))
+            if timer:
+                timer.lap('scorekeeping')
+            self.q_learning.update_batch(states, actions, rewards[:, np.newaxis])
+            if timer:
+                timer.lap('aggregate_learning')
+            self.episodes_played += batch_size
+            self.checkpoint()
+            if timer:
+                timer.lap('checkpoint')
+                timer.episodes_done(batch_size)
+            if self.converged():
+                break
 
     def _initialize_episode(self):
         """Initialize game by shuffling deck and resetting players' hands and q-learning states."""
         self.deck.reset_current_deck()
         for player in self.players:
             player.reset_hand()
+            player.reset_score()
             player.pick_up_cards(self.deck.deal_cards(Player.hand_size))
-        self.q_learning.clear_states_seen()
+        self.q_learning.trajectory.clear()
 
     def _play_rounds(self):
         """Play all rounds of game; players take turns going first."""
-        turn_order = range(len(self.players))
+        turn_order = list(range(len(self.players)))
         for round_index in range(self.num_rounds):
             sum_of_cards = 0.0
 
@@ -70,7 +206,7 @@ class DeckBasedDivideTheDollar(object):
                     player.total_score += player.last_card_played
 
             for player in self.players:
-                player.pick_up_cards(deck.deal_cards(1))
+                player.pick_up_cards(self.deck.deal_cards(1))
 
             turn_order = turn_order[1:] + turn_order[:1]
 
@@ -89,20 +225,16 @@ class DeckBasedDivideTheDollar(object):
         """
         player.set_game_state(card_showing)
         game_state = [self.deck.card_index[card_value] for card_value in player.game_state]
-        if monte_carlo:
-            self.q_learning.record_state_seen(game_state)
-
-        policy_index = int(self.true_state_index[int(np.ravel_multi_index(
-            game_state, dims=(self.deck.unique_cards + 1,
-                              self.deck.unique_cards,
-                              self.deck.unique_cards,
-                              self.deck.unique_cards)))])
+        policy_index = int(self.state_index.rank(game_state))
 
         if monte_carlo and (round_index <= 1):  # exploring starts
             player.next_action = np.random.choice(self.num_actions)
         else:
             player.next_action = player.policy[policy_index]
 
+        if monte_carlo:
+            self.q_learning.record_step(policy_index, player.next_action)
+
         return self._play_action(card_showing, player)
 
     def _play_action(self, card_showing, player):
@@ -116,33 +248,12 @@ class DeckBasedDivideTheDollar(object):
             card value of action played
 
         """
-        card_value = 0
-        if card_showing == 0:  # player goes first
-            if player.next_action == self.actions.index('small_spoil'):
-                card_value = player.play_card(0)
-            elif player.next_action == self.actions.index('large_max'):
-                card_value = player.play_card(-1)
-            else:
-                card_value = player.play_card(Player.hand_size // 2)
-        else:  # opponent went first, player's turn
-            if player.next_action == self.actions.index('small_spoil'):
-                for c, card in enumerate(player.hand):
-                    if card + card_showing > self.value_of_dollar:  # can spoil, play this card
-                        card_value = player.play_card(c)
-                        break
-                    elif c == len(player.hand) - 1:  # can't spoil, play largest card
-                        card_value = player.play_card(-1)
-            elif player.next_action == self.actions.index('large_max'):
-                for c, card in enumerate(np.flipud(player.hand)):
-                    if card + card_showing <= self.value_of_dollar:  # can maximize, play this card
-                        card_value = player.play_card(len(player.hand) - 1 - c)
-                        break
-                    elif len(player.hand) - c == 0:  # can't maximize, play smallest card
-                        card_value = player.play_card(0)
-            else:
-                card_value = player.play_card(Player.hand_size // 2)
-
-        return card_value
+        card_index = self.deck.card_index
+        card_type = self.action_table.resolve(card_index[card_showing],
+                                              player.held_card_mask(card_index),
+                                              card_index[player.median_card()],
+                                              player.next_action)
+        return player.play_card_value(self.deck.card_values[card_type])
 
     def _scorekeeping(self):
         """Determine winner of game (highest total score).
@@ -167,25 +278,14 @@ class DeckBasedDivideTheDollar(object):
         return 0
 
     def _aggregate_learning(self, game_result):
-        """Use states seen during game and game result to update Monte Carlo q-learner.
+        """Use states seen and actions taken during game and game result to update q-learner.
 
         Parameters:
             game_result: result of game from Monte Carlo agent's perspective
                 (+1 for win; -1 for loss)
 
         """
-        for state in range(len(self.q_learning.states_seen)):
-            state_index = int(self.true_state_index[int(np.ravel_multi_index(
-                self.q_learning.states_seen[state], dims=(self.deck.unique_cards + 1,
-                                                          self.deck.unique_cards,
-                                                          self.deck.unique_cards,
-                                                          self.deck.unique_cards)))])
-            action_index = int(self.true_state_index[
-                int(self.q_learning.optimal_policy[state_index])])
-            self.q_learning.update(state_index, action_index, game_result)
-
-    def _save_output(self):
-        self.q_learning.save_learning(self.num_games_to_play)
+        self.q_learning.update_trajectory(game_result)
 
 
 def true_state_index(unique_cards):
@@ -194,34 +294,47 @@ def true_state_index(unique_cards):
     For a potential game state permutation [card_showing, smallest, median, largest],
     if smallest <= median <= largest does not hold, the permutation is an invalid game state
     and the true state index should be a -1. For all valid permutations, the true state index
-    should be sequentially increasing.
+    should be sequentially increasing. See StateIndex, which ranks states without this list.
 
     Returns:
         (list): true state index of valid permutations
 
     """
-    states = [np.array([card_showing, smallest, median, largest])
-              for card_showing in range(unique_cards + 1)
-              for smallest in range(unique_cards)
-              for median in range(unique_cards)
-              for largest in range(unique_cards)]
-
-    counter = itertools.count()
-    true_state_index = [next(counter) if np.all(state[1:-1] <= state[2:]) else -1
-                        for state in states]
+    return StateIndex(unique_cards).lookup.tolist()
 
-    return true_state_index
 
+def train_policy(config, save_output=False):
+    """Train a Monte Carlo learner in self-play from a configuration, e.g. one of a sweep's.
 
-if __name__ == 'main':
-    num_players = 2
-    value_of_dollar = 1.0
-    num_games_to_play = 2000000
-    cards_in_deck = {0.25: 16, 0.50: 28, 0.75: 16}
-    Player.hand_size = 5
+    Parameters:
+        config (dict): cards (list of card values), num_of_unique_cards (list of counts),
+            and optionally hand_size (5), num_games_to_play (2000000), value_of_dollar (1.0),
+            batch_size (None) and seed (None)
+        save_output (bool): also save the learned action values and statistics to .txt files
 
-    deck = Deck(cards_in_deck)
-    players = [Player() for _ in range(num_players)]
+    Returns:
+        (dict): policy (action for every true state index) and wins of each player
 
-    divide_the_dollar = DeckBasedDivideTheDollar(deck, players, num_games_to_play, value_of_dollar)
-    divide_the_dollar.play_games()
+    """
+    seed = config.get('seed')
+    if seed is not None:
+        np.random.seed(seed)
+        random.seed(seed)
+    hand_size = Player.hand_size
+    Player.hand_size = config.get('hand_size', 5)
+    try:
+        deck = Deck(dict(zip(config['cards'], config['num_of_unique_cards'])))
+        game = DeckBasedDivideTheDollar(deck, 2, config.get('num_games_to_play', 2000000),
+                                        config.get('value_of_dollar', 1.0),
+                                        batch_size=config.get('batch_size'))
+        game.play_games(save_output=save_output)
+    finally:
+        Player.hand_size = hand_size
+    return {'policy': game.q_learning.optimal_policy.copy(),
+            'wins': [player.wins for player in game.players]}
+
+
+if __name__ == '__main__':
+    train_policy({'cards': [0.25, 0.50, 0.75], 'num_of_unique_cards': [16, 28, 16],
+                  'hand_size': 5, 'num_games_to_play': 2000000, 'value_of_dollar': 1.0},
+                 save_output=True)
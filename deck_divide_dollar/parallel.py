@@ -0,0 +1,83 @@
+"""Monte Carlo training sharded across a pool of worker processes."""
+import multiprocessing
+import random
+
+import numpy as np
+
+from .game import CountVectorPlayer, Deck, Player
+from .main import DeckBasedDivideTheDollar
+
+
+def play_games_parallel(divide_the_dollar, num_workers=None, sync_interval=100000, seed=None):
+    """Play all games of divide_the_dollar across worker processes.
+
+    Games are played in rounds of sync_interval games split evenly across workers. Every
+    worker starts a round from the merged statistics, learns from its own shard of games
+    and returns only the counts and reward sums it added. These are merged exactly into
+    divide_the_dollar.q_learning, whose greedy policy is broadcast to the next round.
+
+    Parameters:
+        divide_the_dollar (DeckBasedDivideTheDollar): game to train; workers use its deck
+            (cards and shuffle_batch_size), hand representation, batch_size and
+            value_of_dollar
+        num_workers (int): number of worker processes; defaults to the number of CPUs
+        sync_interval (int): number of games played between merges
+        seed (int): seed of the independent random number streams given to each shard; the
+            streams of a round also depend on the number of games played before it, so a run
+            resumed from a checkpoint continues with new streams rather than repeating them
+
+    """
+    game = divide_the_dollar
+    num_workers = num_workers or multiprocessing.cpu_count()
+    self_play = game.players[1].policy is game.q_learning.optimal_policy
+    entropy = np.random.SeedSequence(seed).entropy
+
+    with multiprocessing.Pool(num_workers) as pool:
+        while game.episodes_played < game.num_games_to_play:
+            num_games = min(sync_interval, game.num_games_to_play - game.episodes_played)
+            seed_sequence = np.random.SeedSequence(entropy, spawn_key=(game.episodes_played,))
+            shard_sizes = [size for size in np.diff(np.linspace(0, num_games, num_workers + 1)
+                                                    .astype(int)) if size > 0]
+            shards = [(game.deck.cards, game.deck.shuffle_batch_size, Player.hand_size,
+                       game.value_of_dollar, game.batch_size, int(shard_size),
+                       game.q_learning.state_action_count,
+                       game.q_learning.state_action_reward_sum, game.q_learning.optimal_policy,
+                       None if self_play else game.players[1].policy,
+                       isinstance(game.players[0], CountVectorPlayer),
+                       shard_seed.generate_state(1)[0])
+                      for shard_size, shard_seed in zip(shard_sizes,
+                                                        seed_sequence.spawn(len(shard_sizes)))]
+
+            for count, reward_sum, wins in pool.map(_play_shard, shards):
+                game.q_learning.merge(count, reward_sum)
+                for player, player_wins in zip(game.players, wins):
+                    player.wins += player_wins
+            game.episodes_played += num_games
+            game.checkpoint()
+            if game.converged():
+                break
+
+    game.save_learning()
+
+
+def _play_shard(shard):
+    """Play one shard of games in a worker; return the statistics and wins it added."""
+    (cards, shuffle_batch_size, hand_size, value_of_dollar, batch_size, num_games,
+     state_action_count, state_action_reward_sum, optimal_policy, opponent_policy,
+     count_vector_hands, seed) = shard
+    np.random.seed(seed)
+    random.seed(int(seed))
+    Player.hand_size = hand_size
+
+    game = DeckBasedDivideTheDollar(Deck(cards, shuffle_batch_size), 2, num_games,
+                                    value_of_dollar, batch_size=batch_size,
+                                    count_vector_hands=count_vector_hands)
+    game.q_learning.merge(state_action_count, state_action_reward_sum)
+    game.q_learning.optimal_policy[:] = optimal_policy
+    if opponent_policy is not None:
+        game.players[1].policy = opponent_policy
+    game.play_games(save_output=False)
+
+    return (game.q_learning.state_action_count - state_action_count,
+            game.q_learning.state_action_reward_sum - state_action_reward_sum,
+            [player.wins for player in game.players])
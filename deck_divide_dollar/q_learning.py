@@ -1,5 +1,11 @@
+import random
+
 import numpy as np
 
+from .files import atomic_write
+
+CHECKPOINT_VERSION = 1
+
 
 class MonteCarloLearning(object):
     """Monte Carlo Q-learning.
@@ -9,17 +15,20 @@ class MonteCarloLearning(object):
     Parameters:
         num_states (int): number of states in the game being played
         num_actions (int): number of actions in the game being played
+        episode_length (int): number of steps the agent takes in one game, if known
 
     Attributes:
         Q (array): action-value function: expected reward from taking action while in state
         optimal_policy (array): dictates which action is best to take for each state
         state_action_reward_sum (array): sum of rewards for each state-action pair
         state_action_count (array): number of times each state-action pair has been seen
-        states_seen (list): all states seen by the agent during the current game
+        states_seen (list): legacy list of game states passed to record_state_seen; games no
+            longer fill it (see trajectory), and it is kept only for existing callers
+        trajectory (TrajectoryBuffer): state and action indices of the current game
 
     """
 
-    def __init__(self, num_states, num_actions):
+    def __init__(self, num_states, num_actions, episode_length=1):
         """Initialize Monte Carlo Q-learning."""
         assert num_states > 0, 'Number of game states must be greater than zero.'
         assert num_actions > 0, 'Number of possible actions must be greater than zero.'
@@ -31,6 +40,7 @@ class MonteCarloLearning(object):
         self.state_action_reward_sum = np.zeros((self.num_states, self.num_actions))
         self.state_action_count = np.zeros((self.num_states, self.num_actions))
         self.states_seen = []
+        self.trajectory = TrajectoryBuffer(episode_length)
 
     def update(self, state_index, action_index, reward):
         """Update statistics for action value function Q.
@@ -51,17 +61,85 @@ class MonteCarloLearning(object):
         self.optimal_policy[state_index] = np.argmax(self.Q[state_index])
         return self.optimal_policy
 
+    def update_batch(self, state_indices, action_indices, rewards):
+        """Update statistics for action value function Q with many state-action pairs at once.
+
+        Equivalent to calling update() for every (state, action, reward) in turn, but counts
+        and reward sums are accumulated in bulk and Q and optimal_policy are only recomputed
+        for the states touched. Small batches, such as one episode, are added pair by pair;
+        large ones are counted over every state-action pair with np.bincount.
+
+        Parameters:
+            state_indices (array): array indices of states
+            action_indices (array): array indices of actions, same shape as state_indices
+            rewards (array): reward for each state-action pair; broadcast to state_indices
+
+        """
+        rewards = np.broadcast_to(rewards, np.shape(state_indices)).ravel()
+        state_indices = np.asarray(state_indices).ravel()
+        action_indices = np.asarray(action_indices).ravel()
+        assert np.all(state_indices < self.num_states), 'Invalid state (does not exist).'
+        assert np.all(action_indices < self.num_actions), 'Invalid action (does not exist).'
+
+        pair_indices = state_indices * self.num_actions + action_indices
+        size = self.num_states * self.num_actions
+        if len(pair_indices) * 8 < size:  # only touch the pairs seen, not all S * A of them
+            np.add.at(self.state_action_count, (state_indices, action_indices), 1)
+            np.add.at(self.state_action_reward_sum, (state_indices, action_indices), rewards)
+        else:
+            self.state_action_count += np.bincount(
+                pair_indices, minlength=size).reshape(self.state_action_count.shape)
+            self.state_action_reward_sum += np.bincount(
+                pair_indices, weights=rewards, minlength=size).reshape(self.Q.shape)
+
+        touched = np.unique(state_indices)
+        count = self.state_action_count[touched]
+        self.Q[touched] = np.divide(self.state_action_reward_sum[touched], count,
+                                    out=self.Q[touched], where=count > 0)
+        self.optimal_policy[touched] = np.argmax(self.Q[touched], axis=1)
+        return self.optimal_policy
+
     def record_state_seen(self, game_state):
         """Add game_state to list of states seen by player.
 
+        Legacy: games record their steps with record_step instead; kept for existing callers.
+
         Parameters:
             game_state (list): [card_showing, smallest, median, largest]
 
         """
         self.states_seen.append(np.array(game_state))
 
+    def merge(self, state_action_count, state_action_reward_sum):
+        """Add counts and reward sums gathered elsewhere (e.g. by another worker) to Q.
+
+        Counts and reward sums are plain sums, so merging is exact.
+
+        Parameters:
+            state_action_count (array): number of times each state-action pair was seen
+            state_action_reward_sum (array): sum of rewards for each state-action pair
+
+        """
+        self.state_action_count += state_action_count
+        self.state_action_reward_sum += state_action_reward_sum
+        touched = np.flatnonzero(np.sum(state_action_count, axis=1))
+        count = self.state_action_count[touched]
+        self.Q[touched] = np.divide(self.state_action_reward_sum[touched], count,
+                                    out=self.Q[touched], where=count > 0)
+        self.optimal_policy[touched] = np.argmax(self.Q[touched], axis=1)
+        return self.optimal_policy
+
+    def record_step(self, state_index, action_index):
+        """Add state and action index taken in it to the current game's trajectory."""
+        self.trajectory.record(state_index, action_index)
+
+    def update_trajectory(self, reward):
+        """Update Q with every step of the current game's trajectory and the game's reward."""
+        if self.trajectory.lengths[0]:
+            self.update_batch(self.trajectory.states(), self.trajectory.actions(), reward)
+
     def clear_states_seen(self):
-        """Clear list of states seen."""
+        """Clear list of states seen; legacy, kept for existing callers of record_state_seen."""
         self.states_seen = []
 
     def save_learning(self, episode):
@@ -82,3 +160,153 @@ class MonteCarloLearning(object):
         np.savetxt('state_action_count-%i.txt' % episode, self.state_action_count, fmt='%i')
         np.savetxt('state_action_reward_sum-%i.txt' % episode,
                    self.state_action_reward_sum, fmt='%i')
+
+    def save_checkpoint(self, path, episode, extra=None):
+        """Save learning statistics and random number generator states to a binary .npz file.
+
+        The file is written next to path and then moved into place, so an interrupted save
+        never leaves a partial checkpoint behind.
+
+        Parameters:
+            path (str): checkpoint file name
+            episode (int): number of training episodes elapsed
+            extra (dict): other {name: array} state of the training run to save with it, read
+                back with checkpoint_extra
+
+        """
+        numpy_state = np.random.get_state()
+        python_state = random.getstate()
+        python_gauss = np.nan if python_state[2] is None else python_state[2]
+
+        with atomic_write(path) as checkpoint_file:
+            np.savez(checkpoint_file,
+                     version=CHECKPOINT_VERSION,
+                     num_states=self.num_states,
+                     num_actions=self.num_actions,
+                     episode=episode,
+                     Q=self.Q,
+                     optimal_policy=self.optimal_policy,
+                     state_action_count=self.state_action_count,
+                     state_action_reward_sum=self.state_action_reward_sum,
+                     numpy_rng_keys=numpy_state[1],
+                     numpy_rng_pos=numpy_state[2],
+                     numpy_rng_gauss=[numpy_state[3], numpy_state[4]],
+                     python_rng_version=python_state[0],
+                     python_rng_state=np.array(python_state[1], dtype=np.uint64),
+                     python_rng_gauss=python_gauss,
+                     **{'extra_' + name: value for name, value in (extra or {}).items()})
+
+    def load_checkpoint(self, path, restore_rng=True):
+        """Load learning statistics saved by save_checkpoint, in place.
+
+        Arrays are overwritten in place so that players sharing optimal_policy see the
+        loaded policy.
+
+        Parameters:
+            path (str): checkpoint file name
+            restore_rng (bool): also restore the numpy and random module generator states
+
+        Returns:
+            (int): number of training episodes elapsed when the checkpoint was saved
+
+        """
+        with np.load(path) as checkpoint:
+            assert int(checkpoint['version']) == CHECKPOINT_VERSION, \
+                'Unsupported checkpoint version.'
+            assert (int(checkpoint['num_states']) == self.num_states
+                    and int(checkpoint['num_actions']) == self.num_actions), \
+                'Checkpoint does not match number of states and actions.'
+            self.Q[:] = checkpoint['Q']
+            self.optimal_policy[:] = checkpoint['optimal_policy']
+            self.state_action_count[:] = checkpoint['state_action_count']
+            self.state_action_reward_sum[:] = checkpoint['state_action_reward_sum']
+
+            if restore_rng:
+                has_gauss, cached_gaussian = checkpoint['numpy_rng_gauss']
+                np.random.set_state(('MT19937', checkpoint['numpy_rng_keys'],
+                                     int(checkpoint['numpy_rng_pos']), int(has_gauss),
+                                     float(cached_gaussian)))
+                python_gauss = float(checkpoint['python_rng_gauss'])
+                random.setstate((int(checkpoint['python_rng_version']),
+                                 tuple(int(n) for n in checkpoint['python_rng_state']),
+                                 None if np.isnan(python_gauss) else python_gauss))
+
+            return int(checkpoint['episode'])
+
+    @staticmethod
+    def checkpoint_extra(path):
+        """Return {name: array} of the extra state saved with a checkpoint by save_checkpoint."""
+        with np.load(path) as checkpoint:
+            return {name[len('extra_'):]: checkpoint[name] for name in checkpoint.files
+                    if name.startswith('extra_')}
+
+
+class TrajectoryBuffer(object):
+    """Reusable integer buffer of the state and action indices seen during episodes.
+
+    Arrays are allocated once and reused; clear() only resets the episode lengths.
+    Recording past episode_length steps grows the buffer.
+
+    Parameters:
+        episode_length (int): number of steps held for each episode
+        num_episodes (int): number of episodes held at once
+
+    Attributes:
+        state_indices (array): (num_episodes, episode_length) state index of each step
+        action_indices (array): (num_episodes, episode_length) action index taken at each step
+        lengths (array): number of steps recorded for each episode
+
+    """
+
+    def __init__(self, episode_length, num_episodes=1):
+        """Initialize empty trajectory buffer."""
+        assert episode_length > 0, 'Episode length must be greater than zero.'
+        assert num_episodes > 0, 'Number of episodes must be greater than zero.'
+        self.state_indices = np.zeros((num_episodes, episode_length), dtype=np.int64)
+        self.action_indices = np.zeros((num_episodes, episode_length), dtype=np.int64)
+        self.lengths = np.zeros(num_episodes, dtype=np.int64)
+
+    def __repr__(self):
+        return 'TrajectoryBuffer(episode_length=%i, num_episodes=%i)' % (
+            self.state_indices.shape[1], self.state_indices.shape[0])
+
+    def record(self, state_index, action_index, episode=0):
+        """Append one step to an episode."""
+        step = self.lengths[episode]
+        if step == self.state_indices.shape[1]:
+            self._grow()
+        self.state_indices[episode, step] = state_index
+        self.action_indices[episode, step] = action_index
+        self.lengths[episode] = step + 1
+
+    def record_batch(self, step, state_indices, action_indices):
+        """Set one step of the first len(state_indices) episodes at once."""
+        num_episodes = len(state_indices)
+        assert num_episodes <= len(self.lengths), 'Not enough episodes in buffer.'
+        while step >= self.state_indices.shape[1]:
+            self._grow()
+        self.state_indices[:num_episodes, step] = state_indices
+        self.action_indices[:num_episodes, step] = action_indices
+        self.lengths[:num_episodes] = step + 1
+
+    def states(self, episode=0):
+        """Return view of the state indices recorded for an episode."""
+        return self.state_indices[episode, :self.lengths[episode]]
+
+    def actions(self, episode=0):
+        """Return view of the action indices recorded for an episode."""
+        return self.action_indices[episode, :self.lengths[episode]]
+
+    def episodes(self, num_episodes, num_steps):
+        """Return views of the state and action indices of the first episodes and steps."""
+        return (self.state_indices[:num_episodes, :num_steps],
+                self.action_indices[:num_episodes, :num_steps])
+
+    def clear(self):
+        """Forget all recorded steps."""
+        self.lengths[:] = 0
+
+    def _grow(self):
+        """Double the number of steps held for each episode."""
+        self.state_indices = np.hstack([self.state_indices, np.zeros_like(self.state_indices)])
+        self.action_indices = np.hstack([self.action_indices, np.zeros_like(self.action_indices)])
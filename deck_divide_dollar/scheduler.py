@@ -0,0 +1,50 @@
+"""Running independent jobs (e.g. experiment runs) concurrently, skipping finished ones."""
+import multiprocessing
+
+
+def run_jobs(function, jobs, num_workers=None, is_done=None, callback=None):
+    """Call function(job) for every job not yet done, in a pool of worker processes.
+
+    Jobs must be independent and write their own outputs; is_done lets an interrupted
+    experiment be restarted and pick up where it left off. Jobs finish in any order.
+
+    Parameters:
+        function (callable): called with each job in a worker process; must be picklable
+        jobs (iterable): picklable arguments of each call, e.g. run numbers
+        num_workers (int): number of worker processes; defaults to the number of CPUs, and
+            1 runs the jobs one after another in this process
+        is_done (callable): returns True for jobs whose outputs already exist
+        callback (callable): called with (job, result) as each job finishes
+
+    Returns:
+        (dict): {job: result} of the jobs that were run
+
+    """
+    pending = [job for job in jobs if is_done is None or not is_done(job)]
+    num_workers = min(num_workers or multiprocessing.cpu_count(), max(len(pending), 1))
+
+    results = {}
+    if num_workers == 1:
+        finished = ((job, function(job)) for job in pending)
+        for job, result in finished:
+            results[job] = result
+            if callback is not None:
+                callback(job, result)
+        return results
+
+    with multiprocessing.Pool(num_workers) as pool:
+        for job, result in pool.imap_unordered(_CallWithJob(function), pending):
+            results[job] = result
+            if callback is not None:
+                callback(job, result)
+    return results
+
+
+class _CallWithJob(object):
+    """Picklable wrapper returning (job, function(job)) so unordered results keep their job."""
+
+    def __init__(self, function):
+        self.function = function
+
+    def __call__(self, job):
+        return job, self.function(job)
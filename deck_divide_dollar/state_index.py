@@ -0,0 +1,69 @@
+"""Closed-form indexing of divide-the-dollar game states."""
+import numpy as np
+
+
+class StateIndex(object):
+    """True state index of each game state [card_showing, smallest, median, largest].
+
+    Only sorted hands (smallest <= median <= largest) are valid game states. Valid states
+    are numbered sequentially in lexicographic order, which is the same numbering as
+    main.true_state_index but computed combinatorially instead of by enumeration.
+
+    Parameters:
+        unique_cards (int): number of unique card values; card_showing may also equal
+            unique_cards (no card showing)
+
+    Attributes:
+        unique_cards (int): number of unique card values
+        num_hand_states (int): number of sorted [smallest, median, largest] triples
+        num_states (int): number of valid game states
+        dims (tuple): shape of the full [card_showing, smallest, median, largest] space
+        lookup (array): true state index (or -1 if invalid) of every flattened game state
+
+    """
+
+    def __init__(self, unique_cards):
+        """Initialize state index."""
+        assert unique_cards > 0, 'Number of unique cards must be greater than zero.'
+        self.unique_cards = unique_cards
+        self.dims = (unique_cards + 1, unique_cards, unique_cards, unique_cards)
+
+        # multisets of size 2 and 3 drawn from the n largest card values
+        n = np.arange(unique_cards + 1)
+        self._pairs = n * (n + 1) // 2
+        self._triples = n * (n + 1) * (n + 2) // 6
+        self.num_hand_states = int(self._triples[unique_cards])
+        self.num_states = (unique_cards + 1) * self.num_hand_states
+        self._lookup = None
+
+    def __repr__(self):
+        return 'StateIndex(unique_cards=%i)' % self.unique_cards
+
+    def rank(self, game_state):
+        """Return true state index of a valid game state in O(1).
+
+        Parameters:
+            game_state (list or array): [card_showing, smallest, median, largest] card indices;
+                each entry may also be an array to rank many states at once
+
+        """
+        card_showing, smallest, median, largest = game_state
+        hand_rank = (self._triples[self.unique_cards] - self._triples[self.unique_cards - smallest]
+                     + self._pairs[self.unique_cards - smallest]
+                     - self._pairs[self.unique_cards - median]
+                     + largest - median)
+        return card_showing * self.num_hand_states + hand_rank
+
+    @property
+    def lookup(self):
+        if self._lookup is None:
+            card_showing, smallest, median, largest = np.indices(self.dims).reshape(4, -1)
+            valid = (smallest <= median) & (median <= largest)
+            self._lookup = np.where(valid, self.rank([card_showing, smallest, median, largest]), -1)
+        return self._lookup
+
+    def flat_index(self, game_state):
+        """Return position of game state(s) in lookup (same as np.ravel_multi_index)."""
+        card_showing, smallest, median, largest = game_state
+        return ((card_showing * self.unique_cards + smallest) * self.unique_cards
+                + median) * self.unique_cards + largest
@@ -0,0 +1,141 @@
+"""Parameter sweeps over grids of configurations, with results cached by content hash."""
+import hashlib
+import itertools
+import json
+import os
+import pickle
+import sys
+
+from .files import atomic_write
+from .scheduler import run_jobs
+
+
+def grid(base=None, **axes):
+    """Return every configuration of base with one value from each axis (last axis varies fastest).
+
+    For example grid({'hand_size': 5}, bda_states=[4, 8], pop_size=[15, 30]) returns four
+    configurations. Values must be JSON serializable so that configurations can be hashed.
+    """
+    base = dict(base or {})
+    names = list(axes)
+    return [dict(base, **dict(zip(names, values)))
+            for values in itertools.product(*(axes[name] for name in names))]
+
+
+def code_version(package_dir=None):
+    """Return sha1 of every Python source file of the package, so results follow code changes."""
+    package_dir = package_dir or os.path.dirname(os.path.abspath(__file__))
+    digest = hashlib.sha1()
+    for directory, subdirectories, files in sorted(os.walk(package_dir)):
+        subdirectories[:] = sorted(name for name in subdirectories if name != '__pycache__')
+        for name in sorted(files):
+            if name.endswith('.py'):
+                path = os.path.join(directory, name)
+                digest.update(os.path.relpath(path, package_dir).encode())
+                with open(path, 'rb') as source_file:
+                    digest.update(source_file.read())
+    return digest.hexdigest()
+
+
+def config_key(function, config, version):
+    """Return sha1 of the experiment function's name, its configuration and the code version."""
+    module = function.__module__
+    if module == '__main__':  # a script run with python -m keys its results by its module name
+        module = getattr(sys.modules['__main__'].__spec__, 'name', module)
+    name = '%s.%s' % (module, getattr(function, '__qualname__', function.__name__))
+    return hashlib.sha1(json.dumps([name, config, version], sort_keys=True).encode()).hexdigest()
+
+
+class ResultCache(object):
+    """Directory of experiment results, one pickle per key, with the configuration it came from.
+
+    Results are moved into place once fully written, so a sweep that is interrupted (or run
+    by several processes at once) never leaves a partial result behind.
+
+    Parameters:
+        directory (str): directory the results are stored in; created if missing
+
+    """
+
+    def __init__(self, directory):
+        """Initialize result cache."""
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def __repr__(self):
+        return 'ResultCache(directory=%r)' % self.directory
+
+    def __contains__(self, key):
+        return os.path.exists(self.path(key))
+
+    def __len__(self):
+        return len([name for name in os.listdir(self.directory) if name.endswith('.pkl')])
+
+    def path(self, key):
+        """Return file name of the result stored under key."""
+        return os.path.join(self.directory, '%s.pkl' % key)
+
+    def get(self, key):
+        """Return (config, result) stored under key."""
+        with open(self.path(key), 'rb') as result_file:
+            entry = pickle.load(result_file)
+        return entry['config'], entry['result']
+
+    def put(self, key, config, result):
+        """Store result of config under key."""
+        with atomic_write(self.path(key)) as result_file:
+            pickle.dump({'config': config, 'result': result}, result_file)
+
+
+def run_sweep(function, configs, cache, num_workers=None, version=None, callback=None,
+              resolve=None):
+    """Return function(config) of every configuration, computing only those not in cache.
+
+    Each configuration is keyed by config_key of its resolved form, so rerunning a sweep after
+    an interruption, or a larger grid that contains an earlier one, only runs the new
+    configurations; changing any source file of the package invalidates every result. The
+    grid itself and settings such as num_workers should therefore be kept out of the
+    package's source, e.g. read from a file when a script is run.
+
+    Parameters:
+        function (callable): experiment run in a worker process for each configuration; must
+            be picklable (defined at module level) and return a picklable result
+        configs (list): JSON serializable configurations, e.g. from grid
+        cache (ResultCache): where results are stored and looked up
+        num_workers (int): number of worker processes; defaults to the number of CPUs, and 1
+            runs the configurations one after another in this process
+        version (str): code version of the results; defaults to code_version()
+        callback (callable): called with (config, result) as each new configuration finishes
+        resolve (callable): returns the full configuration config stands for, with every
+            default filled in, so that configurations differing only in defaults they spell
+            out share one result; defaults to config itself
+
+    Returns:
+        (list): result of every configuration, in the order of configs
+
+    """
+    version = code_version() if version is None else version
+    keys = [config_key(function, config if resolve is None else resolve(config), version)
+            for config in configs]
+    pending = {}
+    for key, config in zip(keys, configs):
+        pending.setdefault(key, config)
+    run_jobs(_CachedCall(function, pending, cache), list(pending), num_workers,
+             is_done=lambda key: key in cache,
+             callback=None if callback is None else
+             lambda key, result: callback(pending[key], result))
+    return [cache.get(key)[1] for key in keys]
+
+
+class _CachedCall(object):
+    """Picklable wrapper running the configuration of a key and storing its result in cache."""
+
+    def __init__(self, function, configs, cache):
+        self.function = function
+        self.configs = configs
+        self.cache = cache
+
+    def __call__(self, key):
+        result = self.function(self.configs[key])
+        self.cache.put(key, self.configs[key], result)
+        return result
@@ -0,0 +1,256 @@
+"""Round-robin tournaments between agents over a shared batch of shuffled decks."""
+import numpy as np
+
+from .batch import BatchDivideTheDollar
+from .binary_decision_automata.bda import ArrayBDA
+from .state_index import StateIndex
+
+
+class TableAgent(object):
+    """Agent taking the action of a table policy, e.g. MonteCarloLearning.optimal_policy.
+
+    Parameters:
+        policy (array): action for every true state index
+
+    """
+
+    def __init__(self, policy):
+        """Initialize table policy agent."""
+        self.policy = np.asarray(policy)
+
+    def __repr__(self):
+        return 'TableAgent(num_states=%i)' % len(self.policy)
+
+    def initial_state(self, batch_size):
+        """Return the agent's memory at the start of each game; a table policy has none."""
+        return None
+
+    def act(self, observation, memory):
+        """Return action for every game and the updated memory."""
+        return self.policy[observation['state']], memory
+
+
+class FixedAgent(object):
+    """Agent always taking the same action, e.g. one of the fixed 'large_max' heuristics.
+
+    Parameters:
+        action (int): index of the action to take
+
+    """
+
+    def __init__(self, action):
+        """Initialize fixed action agent."""
+        self.action = action
+
+    def __repr__(self):
+        return 'FixedAgent(action=%i)' % self.action
+
+    def initial_state(self, batch_size):
+        """Return the agent's memory at the start of each game; a fixed agent has none."""
+        return None
+
+    def act(self, observation, memory):
+        """Return action for every game and the updated memory."""
+        return np.full(len(observation['state']), self.action), memory
+
+
+class BDAAgent(object):
+    """Agent playing a binary decision automaton (bda.BDA) in every game.
+
+    The automaton sees the same inputs as in divide_dollar_bda: [value of the card showing
+    (0 if going first), smallest, median and largest card index, fraction of rounds so far
+    that scored, 0 if going first else 1]. Its memory is the automaton state of each game,
+    and all games are advanced at once with ArrayBDA.run_batch.
+
+    Parameters:
+        automaton (BDA or ArrayBDA): automaton to play; converted to an ArrayBDA at the start
+            of every match so that changes to a BDA between matches are picked up
+
+    """
+
+    def __init__(self, automaton):
+        """Initialize binary decision automaton agent."""
+        self.automaton = automaton
+        self._array_bda = None
+
+    def __repr__(self):
+        return 'BDAAgent(num_states=%i)' % self.automaton.num_states
+
+    def initial_state(self, batch_size):
+        """Return the automaton state of every game at the start of play."""
+        self._array_bda = self.automaton if isinstance(self.automaton, ArrayBDA) else \
+            ArrayBDA.from_bdas([self.automaton])
+        return np.zeros(batch_size, dtype=np.int64)
+
+    def act(self, observation, memory):
+        """Return action for every game and the updated automaton states."""
+        sim_states = np.column_stack([observation['card_showing_value'],
+                                      observation['smallest'], observation['median'],
+                                      observation['largest'], observation['deal_fraction'],
+                                      observation['second']])
+        return self._array_bda.run_batch(memory, sim_states)
+
+
+class Tournament(object):
+    """Round-robin tournament in which every pair of agents plays the same shuffled decks.
+
+    Agents may be TableAgent, FixedAgent or BDAAgent instances, or anything they are made
+    from: an array of actions per true state index, an action name or index, or a bda.BDA.
+    Any other object with initial_state(batch_size) and act(observation, memory) methods
+    can also play; observation is a dict of arrays over the games in the batch with keys
+    state (true state index), card_showing, card_showing_value, smallest, median, largest,
+    deal_fraction and second.
+
+    Confidence intervals use the normal approximation, with half-width z_score standard
+    errors.
+
+    Parameters:
+        deck (Deck): deck that every game is dealt from
+        hand_size (int): number of cards in a player's hand
+        actions (list): names of the actions available to players
+        value_of_dollar (float): the threshold used for players' scoring card value vs. nothing
+        num_rounds (int): number of rounds in a game; defaults to as many as the deck allows
+        z_score (float): standard normal quantile of the confidence intervals (1.96 for 95%)
+
+    Attributes:
+        engine (BatchDivideTheDollar): engine used to deal and resolve actions
+
+    """
+
+    num_players = 2
+
+    def __init__(self, deck, hand_size, actions, value_of_dollar=1.0, num_rounds=None,
+                 z_score=1.96):
+        """Initialize tournament."""
+        if num_rounds is None:
+            num_rounds = (deck.deck_size - self.num_players * hand_size) // self.num_players
+        self.deck = deck
+        self.hand_size = hand_size
+        self.actions = actions
+        self.value_of_dollar = value_of_dollar
+        self.num_rounds = num_rounds
+        self.z_score = z_score
+        self.engine = BatchDivideTheDollar(deck, hand_size, num_rounds, actions,
+                                           StateIndex(deck.unique_cards), value_of_dollar)
+        self._showing_values = np.append(self.engine.card_values, 0.0)
+
+    def __repr__(self):
+        return 'Tournament(deck=%s, hand_size=%i, num_rounds=%i)' % (
+            repr(self.deck), self.hand_size, self.num_rounds)
+
+    def agent(self, agent):
+        """Return agent wrapped as a tournament agent if it is a policy, action or BDA."""
+        if hasattr(agent, 'act'):
+            return agent
+        if isinstance(agent, str):
+            return FixedAgent(self.actions.index(agent))
+        if isinstance(agent, (int, np.integer)):
+            return FixedAgent(int(agent))
+        if hasattr(agent, 'run') or hasattr(agent, 'run_batch'):
+            return BDAAgent(agent)
+        return TableAgent(agent)
+
+    def play(self, agents, num_games, swap_seats=True, decks=None):
+        """Play every pair of agents against each other on the same shuffled decks.
+
+        Parameters:
+            agents (list): agents, or policies, actions or automata to wrap as agents
+            num_games (int): number of decks each pair plays
+            swap_seats (bool): also play every deck with the agents' seats swapped
+            decks (array): card indices of every deck, (num_games, deck_size); shuffled if
+                not given
+
+        Returns:
+            (dict): with N agents and agent i against agent j in row i, column j:
+                win_rate, draw_rate, loss_rate (N, N): fraction of games won, drawn or lost
+                win_rate_ci (N, N): confidence interval half-width of win_rate
+                score_difference (N, N): mean of agent i's minus agent j's score
+                score_difference_ci (N, N): confidence interval half-width of score_difference
+                overall_win_rate, overall_win_rate_ci (N,): over all of an agent's games
+                overall_score_difference, overall_score_difference_ci (N,): likewise
+                num_games (int): number of games each pair played
+
+        """
+        agents = [self.agent(agent) for agent in agents]
+        num_agents = len(agents)
+        if decks is None:
+            decks = self.deck.shuffled_decks(num_games)
+        num_pair_games = len(decks) * (2 if swap_seats else 1)
+
+        matrix_keys = ('win_rate', 'draw_rate', 'loss_rate', 'win_rate_ci', 'score_difference',
+                       'score_difference_ci')
+        result = {key: np.zeros((num_agents, num_agents)) for key in matrix_keys}
+        differences = [[] for _ in agents]
+        for i in range(num_agents):
+            for j in range(i + 1, num_agents):
+                difference = self.play_match([agents[i], agents[j]], decks)
+                if swap_seats:
+                    difference = np.concatenate([difference,
+                                                 -self.play_match([agents[j], agents[i]], decks)])
+                differences[i].append(difference)
+                differences[j].append(-difference)
+                for row, column, sign in ((i, j, 1), (j, i, -1)):
+                    win_rate, win_rate_ci = self._rate(sign * difference > 0)
+                    result['win_rate'][row, column] = win_rate
+                    result['win_rate_ci'][row, column] = win_rate_ci
+                    result['draw_rate'][row, column] = np.mean(difference == 0)
+                    result['loss_rate'][row, column] = np.mean(sign * difference < 0)
+                    mean, mean_ci = self._mean(sign * difference)
+                    result['score_difference'][row, column] = mean
+                    result['score_difference_ci'][row, column] = mean_ci
+
+        overall = [np.concatenate(difference) if difference else np.zeros(0)
+                   for difference in differences]
+        result['overall_win_rate'], result['overall_win_rate_ci'] = np.array(
+            [self._rate(difference > 0) for difference in overall]).reshape(num_agents, 2).T
+        result['overall_score_difference'], result['overall_score_difference_ci'] = np.array(
+            [self._mean(difference) for difference in overall]).reshape(num_agents, 2).T
+        result['num_games'] = num_pair_games
+        return result
+
+    def play_match(self, agents, decks):
+        """Play one game per deck between two agents; return player 0's minus player 1's score.
+
+        Parameters:
+            agents (list): agents in seat order, or policies, actions or automata to wrap
+            decks (array): card indices of every deck, (num_games, deck_size)
+
+        """
+        assert len(agents) == self.num_players, 'Matches are played by two players.'
+        agents = [self.agent(agent) for agent in agents]
+        engine = self.engine
+        batch_size = len(decks)
+        engine.deal(batch_size, np.asarray(decks))
+        memories = [agent.initial_state(batch_size) for agent in agents]
+
+        def act(index, turn, smallest, median, largest):
+            observation = {
+                'state': engine.game_state(smallest, median, largest),
+                'card_showing': engine.card_showing,
+                'card_showing_value': self._showing_values[engine.card_showing],
+                'smallest': smallest,
+                'median': median,
+                'largest': largest,
+                'deal_fraction': engine.num_deals / (round_index + 1),
+                'second': np.full(batch_size, turn),
+            }
+            action, memories[index] = agents[index].act(observation, memories[index])
+            return action
+
+        for round_index in range(self.num_rounds):
+            engine.play_round(round_index, act)
+
+        return engine.total_scores[:, 0] - engine.total_scores[:, 1]
+
+    def _rate(self, outcomes):
+        """Return fraction of outcomes that are True and its confidence interval half-width."""
+        if not len(outcomes):
+            return 0.0, 0.0
+        rate = np.mean(outcomes)
+        return rate, self.z_score * np.sqrt(rate * (1 - rate) / len(outcomes))
+
+    def _mean(self, samples):
+        """Return mean of samples and its confidence interval half-width."""
+        if not len(samples):
+            return 0.0, 0.0
+        return np.mean(samples), self.z_score * np.std(samples) / np.sqrt(len(samples))
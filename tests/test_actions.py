@@ -0,0 +1,73 @@
+import itertools
+
+import numpy as np
+import pytest
+from deck_divide_dollar.actions import ActionTable, hand_mask
+
+CARD_VALUES = [0.25, 0.50, 0.75]
+ACTIONS = ['small_spoil', 'median', 'large_max']
+
+
+def play_action(card_showing, hand, action):
+    """Card value played from sorted hand, following the rules card by card."""
+    if card_showing == 0:  # player goes first
+        if action == 'small_spoil':
+            return hand[0]
+        elif action == 'large_max':
+            return hand[-1]
+        return hand[len(hand) // 2]
+
+    if action == 'small_spoil':
+        spoilers = [card for card in hand if card + card_showing > 1.0]
+        return spoilers[0] if spoilers else hand[-1]
+    elif action == 'large_max':
+        maximizers = [card for card in hand if card + card_showing <= 1.0]
+        return maximizers[-1] if maximizers else hand[0]
+    return hand[len(hand) // 2]
+
+
+class TestActionTable(object):
+    def test_init(self):
+        table = ActionTable(CARD_VALUES, ACTIONS)
+        assert table.unique_cards == len(CARD_VALUES)
+        assert table.card_type.shape == (4, 8, 3, 3)
+        assert np.all(table.card_type[:, 0] == -1)
+
+    def test_matches_rules(self):
+        table = ActionTable(CARD_VALUES, ACTIONS)
+        for hand in itertools.combinations_with_replacement(range(len(CARD_VALUES)), 5):
+            counts = np.bincount(hand, minlength=len(CARD_VALUES))
+            median = hand[len(hand) // 2]
+            for card_showing in range(len(CARD_VALUES) + 1):
+                showing_value = 0 if card_showing == len(CARD_VALUES) else CARD_VALUES[card_showing]
+                for action_index, action in enumerate(ACTIONS):
+                    card = table.resolve(card_showing, hand_mask(counts), median, action_index)
+                    expected = play_action(showing_value, [CARD_VALUES[c] for c in hand], action)
+                    assert CARD_VALUES[card] == expected
+
+    def test_resolve_arrays(self):
+        table = ActionTable(CARD_VALUES, ACTIONS)
+        hands = np.array([[5, 0, 0], [0, 2, 3], [1, 3, 1]])
+        cards = table.resolve(np.array([3, 2, 0]), hand_mask(hands), np.array([0, 2, 1]),
+                              np.array([2, 0, 2]))
+        assert list(cards) == [0, 1, 2]
+
+    def test_many_unique_cards(self):
+        card_values = [i / 20 for i in range(1, 21)]
+        table = ActionTable(card_values, ACTIONS)
+        with pytest.raises(AssertionError):
+            table.card_type
+        np.random.seed(0)
+        hands = np.sort(np.random.randint(len(card_values), size=(200, 5)), axis=1)
+        counts = np.array([np.bincount(hand, minlength=len(card_values)) for hand in hands])
+        card_showing = np.random.randint(len(card_values) + 1, size=len(hands))
+        actions = np.random.randint(len(ACTIONS), size=len(hands))
+        cards = table.resolve(card_showing, hand_mask(counts), hands[:, 2], actions)
+        for hand, showing, action, card in zip(hands, card_showing, actions, cards):
+            showing_value = 0 if showing == len(card_values) else card_values[showing]
+            assert card_values[card] == play_action(
+                showing_value, [card_values[c] for c in hand], ACTIONS[action])
+
+
+def test_hand_mask():
+    assert list(hand_mask(np.array([[1, 0, 2], [0, 0, 5], [1, 1, 1]]))) == [5, 4, 7]
@@ -0,0 +1,102 @@
+import pytest
+
+import numpy as np
+from deck_divide_dollar.batch import BatchDivideTheDollar
+from deck_divide_dollar.game import Deck, Player
+from deck_divide_dollar.main import DeckBasedDivideTheDollar
+
+
+@pytest.fixture
+def divide_the_dollar(monkeypatch):
+    monkeypatch.setattr(Player, 'hand_size', 5)
+    deck = Deck({0.25: 16, 0.50: 28, 0.75: 16})
+    return DeckBasedDivideTheDollar(deck, [Player(), Player()], num_games_to_play=10)
+
+
+def replay_game(divide_the_dollar, deck_order, actions, opponent_policy):
+    """Replay one game with the scalar engine; return player 0's states and reward."""
+    game = divide_the_dollar
+    card_values = sorted(game.deck.cards.keys())
+    game.deck.current_deck = [card_values[card] for card in deck_order]
+    players = [Player(), Player()]
+    for player in players:
+        player.pick_up_cards(game.deck.deal_cards(Player.hand_size))
+
+    states = []
+    turn_order = [0, 1]
+    for round_index in range(game.num_rounds):
+        sum_of_cards = 0.0
+        for index in turn_order:
+            player = players[index]
+            player.set_game_state(sum_of_cards)
+            game_state = [game.deck.card_index[card_value] for card_value in player.game_state]
+            state_index = game.state_index.rank(game_state)
+            if index == 0:
+                states.append(state_index)
+                player.next_action = actions[round_index]
+            else:
+                player.next_action = opponent_policy[state_index]
+            sum_of_cards += game._play_action(sum_of_cards, player)
+
+        if sum_of_cards <= game.value_of_dollar:
+            for player in players:
+                player.total_score += player.last_card_played
+        for player in players:
+            player.pick_up_cards(game.deck.deal_cards(1))
+        turn_order = turn_order[::-1]
+
+    reward = int(np.sign(players[0].total_score - players[1].total_score))
+    return states, reward
+
+
+class TestBatchDivideTheDollar(object):
+    def test_init(self, divide_the_dollar):
+        game = divide_the_dollar
+        engine = BatchDivideTheDollar(game.deck, Player.hand_size, game.num_rounds, game.actions,
+                                      game.state_index)
+        assert list(engine.card_values) == [0.25, 0.50, 0.75]
+
+        with pytest.raises(AssertionError):
+            BatchDivideTheDollar(game.deck, Player.hand_size, game.deck.deck_size, game.actions,
+                                 game.state_index)
+
+    def test_play_batch(self, divide_the_dollar):
+        game = divide_the_dollar
+        engine = BatchDivideTheDollar(game.deck, Player.hand_size, game.num_rounds, game.actions,
+                                      game.state_index)
+        batch_size = 50
+        policies = [np.random.randint(game.num_actions, size=game.num_states) for _ in range(2)]
+        states, actions, rewards = engine.play_batch(policies, batch_size)
+
+        assert states.shape == (batch_size, game.num_rounds)
+        assert actions.shape == (batch_size, game.num_rounds)
+        assert rewards.shape == (batch_size,)
+        assert np.all((states >= 0) & (states < game.num_states))
+        assert np.all(actions[:, 2:] == policies[0][states[:, 2:]])
+        assert set(rewards).issubset({-1, 0, 1})
+        assert np.all(engine.hands.sum(axis=2) == Player.hand_size)
+
+    def test_play_batch_matches_scalar_engine(self, divide_the_dollar):
+        game = divide_the_dollar
+        engine = BatchDivideTheDollar(game.deck, Player.hand_size, game.num_rounds, game.actions,
+                                      game.state_index)
+        policies = [np.random.randint(game.num_actions, size=game.num_states) for _ in range(2)]
+        states, actions, rewards = engine.play_batch(policies, 20)
+
+        for game_index in range(len(rewards)):
+            scalar_states, scalar_reward = replay_game(
+                game, engine.decks[game_index], actions[game_index], policies[1])
+            assert list(states[game_index]) == scalar_states
+            assert rewards[game_index] == scalar_reward
+
+
+class TestBatchedPlayGames(object):
+    def test_play_games(self, divide_the_dollar, monkeypatch):
+        game = divide_the_dollar
+        game.num_games_to_play = 25
+        game.batch_size = 10
+        monkeypatch.setattr(game, 'save_learning', lambda: None)
+        game.play_games()
+
+        assert np.sum(game.q_learning.state_action_count) == 25 * game.num_rounds
+        assert game.players[0].wins + game.players[1].wins <= 25
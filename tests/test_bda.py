@@ -0,0 +1,231 @@
+import os
+import random
+
+import pytest
+
+import numpy as np
+from deck_divide_dollar.binary_decision_automata import bda
+from deck_divide_dollar.binary_decision_automata.fitness import FitnessEvaluator
+
+CARDS = [0.25, 0.50, 0.75]
+
+
+def random_bdas(num_automata, num_states, seed=0):
+    random.seed(seed)
+    bdas = [bda.BDA(num_states) for _ in range(num_automata)]
+    for automaton in bdas:
+        automaton.randomize()
+    return bdas
+
+
+def random_sim_states(num_games, seed=0):
+    """Inputs like divide_dollar_bda's, with values near common thresholds."""
+    rng = np.random.RandomState(seed)
+    return np.column_stack([rng.choice([0.0, 0.25, 0.5, 0.75], num_games),
+                            rng.randint(3, size=num_games), rng.randint(3, size=num_games),
+                            rng.randint(3, size=num_games), rng.randint(11, size=num_games) / 10,
+                            rng.randint(2, size=num_games)])
+
+
+class TestArrayBDA(object):
+    def test_from_bdas_round_trip(self):
+        bdas = random_bdas(4, 6)
+        population = bda.ArrayBDA.from_bdas(bdas)
+        assert len(population) == 4
+        assert population.threshold_val.shape == (4, 6)
+        assert population.actions.shape == (4, 6, 2)
+        for automaton, copy in zip(bdas, population.to_bdas()):
+            assert copy.write_bda() == automaton.write_bda()
+
+    def test_run_batch_matches_run(self):
+        bdas = random_bdas(5, 8, seed=1)
+        population = bda.ArrayBDA.from_bdas(bdas)
+        num_games = 2000
+        sim_states = random_sim_states(num_games, seed=1)
+        rng = np.random.RandomState(2)
+        current_states = rng.randint(8, size=num_games)
+        automata = rng.randint(5, size=num_games)
+
+        actions, next_states = population.run_batch(current_states, sim_states, automata)
+        for game in range(num_games):
+            automaton = bdas[automata[game]]
+            automaton.current_state = current_states[game]
+            assert automaton.run(list(sim_states[game])) == actions[game]
+            assert automaton.current_state == next_states[game]
+
+    def test_run_batch_over_games(self):
+        automaton = random_bdas(1, 4, seed=3)[0]
+        population = bda.ArrayBDA.from_bdas([automaton])
+        sim_states = random_sim_states(30, seed=3)
+        current_states = np.zeros(10, dtype=np.int64)
+        for turn in range(3):
+            actions, current_states = population.run_batch(current_states,
+                                                           sim_states[turn::3])
+        automaton.reset()
+        for turn in range(3):
+            automaton.run(list(sim_states[turn]))
+        assert automaton.current_state == current_states[0]
+
+
+class TestCanonicalBDA(object):
+    def test_canonical_drops_unreachable_states(self):
+        automaton = random_bdas(1, 6, seed=4)[0]
+        for n, state in enumerate(automaton.states):
+            state.transitions = [(n + 2) % 6, (n + 4) % 6]  # odd states are unreachable
+        canonical = automaton.canonical()
+        assert canonical.num_states == 3
+        assert canonical.states[0].threshold_val == automaton.states[0].threshold_val
+
+        sim_states = random_sim_states(200, seed=4)
+        automaton.reset()
+        canonical.reset()
+        for sim_state in sim_states:
+            assert canonical.run(list(sim_state)) == automaton.run(list(sim_state))
+
+    def test_fingerprint(self):
+        automaton = random_bdas(1, 6, seed=5)[0]
+        other = random_bdas(1, 6, seed=6)[0]
+        assert automaton.fingerprint() != other.fingerprint()
+        assert automaton.canonical().fingerprint() == automaton.fingerprint()
+
+        renumbered = bda.BDA(6)
+        permutation = [0] + list(np.random.RandomState(0).permutation(range(1, 6)))
+        for n, state in enumerate(automaton.states):
+            new = renumbered.states[permutation[n]]
+            new.decision_index = state.decision_index
+            new.decision_type = state.decision_type
+            new.threshold_val = state.threshold_val
+            new.actions = list(state.actions)
+            new.transitions = [permutation[t] for t in state.transitions]
+        assert renumbered.fingerprint() == automaton.fingerprint()
+        assert bda.ArrayBDA.from_bdas([automaton, other]).fingerprints() == \
+            [automaton.fingerprint(), other.fingerprint()]
+
+
+class TestArrayBDAOperators(object):
+    def test_randomize(self):
+        np.random.seed(0)
+        population = bda.ArrayBDA(8, 200).randomize()
+        assert set(np.unique(population.decision_index)) == set(range(bda.NUM_INPUTS))
+        assert set(np.unique(population.decision_type)) == set(range(bda.NUM_TESTS))
+        assert set(np.unique(population.actions)) == set(range(bda.NUM_ACTIONS))
+        assert set(np.unique(population.transitions)) == set(range(8))
+        assert population.threshold_val.min() >= 0 and population.threshold_val.max() <= 1
+        assert np.allclose(population.threshold_val * 1000,
+                           np.round(population.threshold_val * 1000))
+        assert abs(population.threshold_val.mean() - 0.5) < 0.03
+
+        before = population.decision_index.copy()
+        population.randomize([3])
+        assert np.array_equal(np.delete(population.decision_index, 3, axis=0),
+                              np.delete(before, 3, axis=0))
+
+    def test_copy_and_crossover_match_bda(self):
+        bdas = random_bdas(3, 8, seed=7)
+        population = bda.ArrayBDA.from_bdas(bdas)
+        population.copy_automaton(2, 0)
+        assert population.to_bdas()[0].write_bda() == bdas[2].write_bda()
+
+        population = bda.ArrayBDA.from_bdas(bdas)
+        random.seed(8)
+        points = [random.randint(0, 7), random.randint(0, 7)]
+        random.seed(8)
+        bdas[0].two_point_crossover(bdas[1])
+        population.two_point_crossover(0, 1, points)
+        for automaton, crossed in zip(bdas, population.to_bdas()):
+            assert crossed.write_bda() == automaton.write_bda()
+
+    def test_mutate(self):
+        np.random.seed(1)
+        population = bda.ArrayBDA.from_bdas(random_bdas(2, 8, seed=9))
+        changed_fields = []
+        for _ in range(500):
+            before = [getattr(population, field).copy() for field in population.fields]
+            population.mutate(0)
+            changes = [np.argwhere(getattr(population, field) != values)
+                       for field, values in zip(population.fields, before)]
+            assert sum(len(change) for change in changes) <= 1
+            assert all(np.all(change[:, 0] == 0) for change in changes if len(change))
+            changed_fields += [field for field, change in zip(population.fields, changes)
+                               if len(change)]
+        assert set(changed_fields) == set(population.fields)
+        assert np.all(population.transitions < 8)
+        assert np.all(population.actions < bda.NUM_ACTIONS)
+
+
+class TestPopulationFile(object):
+    def test_write_bda(self):
+        automaton = bda.BDA(2)
+        automaton.states[1].threshold_val = 0.125
+        automaton.states[1].actions = [2, 1]
+        automaton.states[1].transitions = [1, 0]
+        assert automaton.write_bda() == '0 0 0.500 0 0 -1 0 \n0 0 0.125 2 1 1 0 \n'
+        assert automaton.print_bda().startswith('2 states\n0) if(Ttl > 0.500) ')
+
+    @pytest.mark.parametrize('mmap', [False, True])
+    def test_save_and_load(self, tmp_path, mmap):
+        population = bda.ArrayBDA.from_bdas(random_bdas(5, 6, seed=10))
+        fitness = np.linspace(0, 1, 5)
+        path = str(tmp_path / 'pop.bdapop')
+        population.save_population(path, fitness, {'run': 3, 'gen': 7})
+        assert not os.path.exists(path + '.tmp')
+
+        loaded, loaded_fitness, metadata = bda.ArrayBDA.load_population(path, mmap=mmap)
+        assert metadata == {'run': 3, 'gen': 7}
+        assert np.array_equal(loaded_fitness, fitness)
+        assert len(loaded) == 5
+        for field in population.fields:
+            assert np.array_equal(getattr(loaded, field), getattr(population, field))
+        assert [automaton.write_bda() for automaton in loaded.to_bdas()] == \
+            [automaton.write_bda() for automaton in population.to_bdas()]
+
+        sim_states = random_sim_states(50, seed=10)
+        current_states = np.zeros(50, dtype=np.int64)
+        automata = np.arange(50) % 5
+        for result, expected in zip(loaded.run_batch(current_states, sim_states, automata),
+                                    population.run_batch(current_states, sim_states, automata)):
+            assert np.array_equal(result, expected)
+
+    def test_without_fitness(self, tmp_path):
+        path = str(tmp_path / 'pop.bdapop')
+        bda.ArrayBDA(4, 2).save_population(path)
+        population, fitness, metadata = bda.ArrayBDA.load_population(path)
+        assert fitness is None
+        assert metadata == {}
+        assert population.decision_index.dtype == np.int64
+
+        with open(path, 'wb') as population_file:
+            population_file.write(b'not a population')
+        with pytest.raises(AssertionError):
+            bda.ArrayBDA.load_population(path)
+
+
+class TestCompiledBDA(object):
+    def test_matches_interpreter(self):
+        evaluator = FitnessEvaluator(CARDS, [6, 8, 6], 3)
+        array_bda = bda.ArrayBDA.from_bdas(random_bdas(2, 8))
+        compiled = array_bda.compile(evaluator)
+        assert len(compiled) == 2
+        assert compiled.actions.shape == (2, 8, 40 * len(compiled.fractions))
+        assert compiled.fractions[0] == 0.0 and compiled.fractions[-1] < 1.0
+
+        np.random.seed(7)
+        player_1, player_2 = evaluator.matchups(1, 2, 50)
+        decks = evaluator.deck.shuffled_decks(len(player_1))
+        assert np.array_equal(evaluator.play(compiled, player_1, player_2, decks),
+                              evaluator.play(array_bda, player_1, player_2, decks))
+        assert compiled.fingerprints() == array_bda.fingerprints()
+
+    def test_check(self, monkeypatch):
+        evaluator = FitnessEvaluator(CARDS, [6, 8, 6], 3)
+        array_bda = bda.ArrayBDA.from_bdas(random_bdas(1, 8))
+        run_batch = array_bda.run_batch
+
+        def wrong_run_batch(current_states, sim_states, automata=None):
+            actions, next_states = run_batch(current_states, sim_states, automata)
+            return (actions + 1) % bda.NUM_ACTIONS, next_states
+
+        monkeypatch.setattr(array_bda, 'run_batch', wrong_run_batch)
+        with pytest.raises(AssertionError):
+            array_bda.compile(evaluator)
+        array_bda.compile(evaluator, check=False)
@@ -0,0 +1,84 @@
+import pytest
+
+import numpy as np
+from deck_divide_dollar.convergence import EarlyStopping
+from deck_divide_dollar.game import Deck, Player
+from deck_divide_dollar.main import DeckBasedDivideTheDollar
+from deck_divide_dollar.q_learning import MonteCarloLearning
+
+
+class TestEarlyStopping(object):
+    def test_init(self):
+        stopping = EarlyStopping(stable_windows=2)
+        assert stopping.criterion is None
+        assert stopping.episode is None
+
+        with pytest.raises(AssertionError):
+            EarlyStopping()
+
+        with pytest.raises(AssertionError):
+            EarlyStopping(check_interval=0, stable_windows=2)
+
+    def test_check_interval(self):
+        agent = MonteCarloLearning(3, 2)
+        stopping = EarlyStopping(check_interval=10, max_q_delta=1.0)
+        assert not stopping.should_stop(agent, 5)
+        assert not stopping.should_stop(agent, 10)  # first check only records Q
+        assert not stopping.should_stop(agent, 15)
+        assert stopping.should_stop(agent, 20)
+        assert stopping.criterion == 'q_delta'
+        assert stopping.episode == 20
+
+    def test_stable_policy(self):
+        agent = MonteCarloLearning(3, 2)
+        stopping = EarlyStopping(check_interval=1, stable_windows=2)
+        assert not stopping.should_stop(agent, 1)
+        agent.optimal_policy[0] = 1 - agent.optimal_policy[0]
+        assert not stopping.should_stop(agent, 2)
+        assert stopping.policy_flips == 1
+        assert not stopping.should_stop(agent, 3)
+        assert stopping.should_stop(agent, 4)
+        assert stopping.criterion == 'stable_policy'
+
+    def test_ci_width(self):
+        agent = MonteCarloLearning(3, 2)
+        stopping = EarlyStopping(check_interval=1, max_ci_width=0.5, min_visits=2)
+        agent.update_batch([0, 1], [0, 1], [1, -1])
+        assert not stopping.should_stop(agent, 1)  # no pair seen twice yet
+
+        agent.update_batch(np.zeros(100, dtype=int), np.ones(100, dtype=int),
+                           np.tile([1, -1], 50))
+        assert stopping.should_stop(agent, 2)
+        assert stopping.criterion == 'ci_width'
+
+    def test_ci_width_ignores_lucky_visits(self):
+        agent = MonteCarloLearning(3, 2)
+        stopping = EarlyStopping(check_interval=1, max_ci_width=0.5)
+        agent.update_batch([0, 1, 1], [0, 1, 1], [1, -1, -1])  # Q of +-1 on a few visits
+        assert not stopping.should_stop(agent, 1)
+        agent.update_batch(np.zeros(29, dtype=int), np.zeros(29, dtype=int), 1)
+        assert not stopping.should_stop(agent, 2)  # 2 * 1.96 / sqrt(30) > 0.5
+
+
+def test_play_games_stops_early(monkeypatch):
+    monkeypatch.setattr(Player, 'hand_size', 5)
+    stopping = EarlyStopping(check_interval=4, max_q_delta=np.inf)
+    game = DeckBasedDivideTheDollar(Deck({0.25: 16, 0.50: 28, 0.75: 16}), [Player(), Player()],
+                                    num_games_to_play=100, batch_size=2, stopping=stopping)
+    game.play_games(save_output=False)
+
+    assert game.episodes_played == 8
+    assert stopping.criterion == 'q_delta'
+    assert stopping.episode == 8
+
+
+def test_saved_learning_names_stopping_episode(monkeypatch, tmp_path):
+    monkeypatch.setattr(Player, 'hand_size', 5)
+    monkeypatch.chdir(tmp_path)
+    stopping = EarlyStopping(check_interval=4, max_q_delta=np.inf)
+    game = DeckBasedDivideTheDollar(Deck({0.25: 16, 0.50: 28, 0.75: 16}), [Player(), Player()],
+                                    num_games_to_play=100, batch_size=2, stopping=stopping)
+    game.play_games()
+
+    assert (tmp_path / 'Q-8.txt').exists()
+    assert not (tmp_path / 'Q-100.txt').exists()
@@ -0,0 +1,110 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from deck_divide_dollar.scheduler import run_jobs
+from deck_divide_dollar.sweep import ResultCache, grid, run_sweep
+
+
+class TestDivideDollarBDA(object):
+    def test_runs_resume_and_summary(self, monkeypatch, tmp_path):
+        pytest.importorskip('scipy')
+        from deck_divide_dollar.binary_decision_automata import divide_dollar_bda as script
+        from deck_divide_dollar.binary_decision_automata.metrics import read_metrics
+        for name, value in (('pop_size', 3), ('rand_pop_size', 3), ('t_size', 3),
+                            ('num_gens', 3), ('num_runs', 2), ('num_episodes', 1), ('seed', 0),
+                            ('archive_every', 2)):
+            monkeypatch.setattr(script, name, value)
+        monkeypatch.chdir(tmp_path)
+
+        assert sorted(run_jobs(script.evolve, range(2), 2, is_done=script.run_done)) == [0, 1]
+        for run in range(2):
+            assert script.run_done(run)
+            statistics = read_metrics('metrics-%i.npz' % run)
+            assert statistics['recorded'].all()
+            for metric in script.metrics:
+                assert statistics[metric]['mean'].shape == (1, 3)
+        assert sorted(name for name in os.listdir('.') if name.endswith('.bdapop')) == \
+            ['pop-0-0.bdapop', 'pop-0-2.bdapop', 'pop-1-0.bdapop', 'pop-1-2.bdapop']
+        first_run = open('metrics-0.npz', 'rb').read()
+        assert open('metrics-1.npz', 'rb').read() != first_run or \
+            open('pop-1.txt').read() != open('pop-0.txt').read()
+
+        os.remove('pop-1.txt')
+        assert list(run_jobs(script.evolve, range(2), 2, is_done=script.run_done)) == [1]
+        assert open('metrics-0.npz', 'rb').read() == first_run
+
+        script.summarize_runs(range(2))
+        with open('summary.txt') as summary_file:
+            assert '(2 runs)' in summary_file.readline()
+        assert len(open('summary.txt').readlines()) == 4
+        experiment = read_metrics('metrics.npz')
+        assert list(experiment['runs']) == [0, 1]
+        np.testing.assert_array_equal(experiment['win_percen']['best'][1],
+                                      read_metrics('metrics-1.npz')['win_percen']['best'][0])
+
+    def test_fitness_seed_independent_of_num_workers(self, monkeypatch, tmp_path):
+        pytest.importorskip('scipy')
+        from deck_divide_dollar.binary_decision_automata import divide_dollar_bda as script
+        from deck_divide_dollar.binary_decision_automata.metrics import read_metrics
+        for name, value in (('pop_size', 3), ('rand_pop_size', 3), ('t_size', 3),
+                            ('num_gens', 3), ('num_episodes', 2), ('seed', 0),
+                            ('fitness_seed', 5)):
+            monkeypatch.setattr(script, name, value)
+        monkeypatch.chdir(tmp_path)
+
+        statistics = []
+        for num_workers in (1, 2):
+            monkeypatch.setattr(script, 'num_workers', num_workers)
+            script.evolve(0)
+            statistics.append(read_metrics('metrics-0.npz'))
+            os.remove('pop-0.txt')
+        for metric in script.metrics:
+            for name in statistics[0][metric]:
+                np.testing.assert_array_equal(statistics[1][metric][name],
+                                              statistics[0][metric][name])
+
+
+class TestDivideDollarBDASweep(object):
+    def test_sweep_point(self, monkeypatch, tmp_path):
+        pytest.importorskip('scipy')
+        from deck_divide_dollar.binary_decision_automata import divide_dollar_bda as script
+        monkeypatch.chdir(tmp_path)
+        num_rounds = script.num_rounds
+
+        base = {'pop_size': 3, 'rand_pop_size': 3, 't_size': 3, 'num_gens': 2, 'num_runs': 2,
+                'num_episodes': 1, 'seed': 0}
+        configs = grid(base, bda_states=[2, 4], num_of_unique_cards=[[4, 6, 4]])
+        results = run_sweep(script.sweep_point, configs, ResultCache('cache'), 2,
+                            resolve=script.resolved_config)
+        for config, result in zip(configs, results):
+            assert result['metrics']['win_percen']['mean'].shape == (2, 2)
+            assert len(result['populations']) == 2
+            assert result['populations'][0].count('%i states' % config['bda_states']) == 3
+        assert sorted(os.listdir('.')) == ['cache']
+        assert script.num_rounds == num_rounds and script.bda_states == 8
+        assert script.pop_size == 15
+
+        with pytest.raises(AssertionError):
+            script.configure({'deck_size': 10})
+
+    def test_extended_sweep_runs_only_new_points(self, monkeypatch, tmp_path):
+        pytest.importorskip('scipy')
+        from deck_divide_dollar.binary_decision_automata import divide_dollar_bda as script
+        monkeypatch.chdir(tmp_path)
+        base = {'pop_size': 3, 'rand_pop_size': 3, 't_size': 3, 'num_gens': 2, 'num_runs': 1,
+                'num_episodes': 1, 'seed': 0, 'num_of_unique_cards': [4, 6, 4]}
+        with open('sweep.json', 'w') as sweep_file:
+            json.dump({'bda_states': [2]}, sweep_file)
+        assert script.load_sweep('sweep.json') == [{'bda_states': 2}]
+
+        finished = []
+        for configs in ([dict(base, bda_states=2)],
+                        [dict(base, bda_states=2, hand_size=5), dict(base, bda_states=4)]):
+            run_sweep(script.sweep_point, configs, ResultCache('cache'), 1,
+                      callback=lambda config, result: finished.append(config),
+                      resolve=script.resolved_config)
+        assert [config['bda_states'] for config in finished] == [2, 4]
+        assert script.resolved_config({})['bda_states'] == 8
@@ -0,0 +1,58 @@
+import itertools
+
+import pytest
+
+import numpy as np
+from deck_divide_dollar.batch import BatchDivideTheDollar
+from deck_divide_dollar.exact import ExactEvaluator
+from deck_divide_dollar.game import Deck
+
+ACTIONS = ['small_spoil', 'median', 'large_max']
+
+
+def all_deck_orders(deck):
+    """Card indices of every distinct order of deck; all are equally likely."""
+    cards = [deck.card_index[card] for card in sorted(deck.deck_order)]
+    return np.array(sorted(set(itertools.permutations(cards))))
+
+
+class TestExactEvaluator(object):
+    def test_init(self):
+        deck = Deck({0.25: 4, 0.50: 6, 0.75: 4})
+        evaluator = ExactEvaluator(deck, 3, ACTIONS)
+        assert evaluator.num_rounds == 4
+        assert evaluator.card_units == [1, 2, 3]
+        assert float(evaluator.score_unit) == 0.25
+
+        with pytest.raises(AssertionError):
+            ExactEvaluator(deck, 3, ACTIONS, num_rounds=5)
+
+    @pytest.mark.parametrize('cards, hand_size', [({0.25: 2, 0.50: 3, 0.75: 2}, 1),
+                                                  ({0.25: 3, 0.50: 2, 0.75: 3}, 2)])
+    def test_matches_every_deck_order(self, monkeypatch, cards, hand_size):
+        deck = Deck(cards)
+        evaluator = ExactEvaluator(deck, hand_size, ACTIONS)
+        np.random.seed(0)
+        policies = [np.random.randint(len(ACTIONS), size=evaluator.state_index.num_states)
+                    for _ in range(2)]
+        result = evaluator.evaluate(policies)
+
+        decks = all_deck_orders(deck)
+        monkeypatch.setattr(deck, 'shuffled_decks', lambda num_decks: decks)
+        engine = BatchDivideTheDollar(deck, hand_size, evaluator.num_rounds, ACTIONS,
+                                      evaluator.state_index)
+        rewards = engine.play_batch(policies, len(decks), explore_rounds=0)[2]
+        score_difference = engine.total_scores[:, 0] - engine.total_scores[:, 1]
+
+        assert result['win'] == pytest.approx(np.mean(rewards == 1))
+        assert result['draw'] == pytest.approx(np.mean(rewards == 0))
+        assert result['loss'] == pytest.approx(np.mean(rewards == -1))
+        assert result['expected_score_difference'] == pytest.approx(np.mean(score_difference))
+        assert evaluator.num_states > 0
+
+    def test_symmetric_policies(self):
+        deck = Deck({0.25: 3, 0.50: 4, 0.75: 3})
+        evaluator = ExactEvaluator(deck, 3, ACTIONS)
+        policy = np.ones(evaluator.state_index.num_states, dtype=int)
+        result = evaluator.evaluate([policy, policy])
+        assert result['win'] + result['draw'] + result['loss'] == pytest.approx(1.0)
@@ -0,0 +1,21 @@
+import os
+
+import pytest
+
+from deck_divide_dollar.files import atomic_write
+
+
+class TestAtomicWrite(object):
+    def test_atomic_write(self, tmp_path):
+        path = str(tmp_path / 'out.txt')
+        with atomic_write(path, 'w') as out_file:
+            out_file.write('first')
+            assert not os.path.exists(path)
+        assert open(path).read() == 'first'
+
+        with pytest.raises(ValueError):
+            with atomic_write(path, 'w') as out_file:
+                out_file.write('second')
+                raise ValueError
+        assert open(path).read() == 'first'
+        assert os.listdir(str(tmp_path)) == ['out.txt']
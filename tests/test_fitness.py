@@ -0,0 +1,234 @@
+import random
+
+import pytest
+
+import numpy as np
+from deck_divide_dollar.binary_decision_automata import bda
+from deck_divide_dollar.binary_decision_automata.fitness import (FitnessCache, FitnessEvaluator,
+                                                                 evaluate_parallel)
+
+CARDS = [0.25, 0.50, 0.75]
+
+
+def play_action(card_showing, hand, action):
+    """divide_dollar_bda.play_action on a sorted list, with the large_max fallback fixed."""
+    if card_showing == len(CARDS) or action == 1:
+        position = {0: 0, 1: len(hand) // 2, 2: -1}[action]
+    elif action == 0:
+        position = next((c for c, card in enumerate(hand)
+                         if CARDS[card] + CARDS[card_showing] > 1.0), -1)
+    else:
+        position = next((c for c in reversed(range(len(hand)))
+                         if CARDS[hand[c]] + CARDS[card_showing] <= 1.0), 0)
+    return hand.pop(position)
+
+
+def play_game(automata, deck, hand_size, num_rounds):
+    """Play one game as divide_dollar_bda does; return both players' total scores."""
+    deck = list(deck)
+    hands = [sorted(deck[:hand_size]), sorted(deck[hand_size:2 * hand_size])]
+    deck = deck[2 * hand_size:]
+    for automaton in automata:
+        automaton.reset()
+    scores = [0.0, 0.0]
+    num_deals = 0
+    for round_index in range(num_rounds):
+        card_showing = len(CARDS)
+        played = [None, None]
+        first = round_index % 2
+        for turn, index in enumerate((first, 1 - first)):
+            hand = hands[index]
+            showing_value = 0 if turn == 0 else CARDS[card_showing]
+            game_state = [showing_value, hand[0], hand[hand_size // 2], hand[-1],
+                          num_deals / (round_index + 1), turn]
+            action = automata[index].run(game_state)
+            played[index] = play_action(card_showing, hand, action)
+            card_showing = played[index]
+        if CARDS[played[0]] + CARDS[played[1]] <= 1:
+            scores = [score + CARDS[card] for score, card in zip(scores, played)]
+            num_deals += 1
+        for hand in hands:
+            if deck:
+                hand.append(deck.pop(0))
+                hand.sort()
+    return scores
+
+
+@pytest.fixture
+def population():
+    random.seed(0)
+    bdas = [bda.BDA(8) for _ in range(5)]
+    for automaton in bdas:
+        automaton.randomize()
+    return bdas
+
+
+class TestFitnessEvaluator(object):
+    def test_init(self):
+        evaluator = FitnessEvaluator(CARDS, [16, 28, 16], 5)
+        assert evaluator.num_rounds == 26
+        assert evaluator.deck_size == 60
+
+        with pytest.raises(AssertionError):
+            FitnessEvaluator(CARDS[::-1], [16, 28, 16], 5)
+
+    def test_matchups(self):
+        evaluator = FitnessEvaluator(CARDS, [16, 28, 16], 5)
+        player_1, player_2 = evaluator.matchups(2, 5, 2)
+        assert list(player_1) == [0] * 6 + [1] * 6
+        assert list(player_2) == [2, 2, 3, 3, 4, 4] * 2
+
+    def test_play_matches_scalar_games(self, population):
+        evaluator = FitnessEvaluator(CARDS, [16, 28, 16], 5)
+        array_bda = bda.ArrayBDA.from_bdas(population)
+        np.random.seed(0)
+        player_1, player_2 = evaluator.matchups(2, len(population), 20)
+        decks = evaluator.deck.shuffled_decks(len(player_1))
+        scores = evaluator.play(array_bda, player_1, player_2, decks)
+
+        for game, deck in enumerate(decks):
+            expected = play_game([population[player_1[game]], population[player_2[game]]],
+                                 deck, 5, evaluator.num_rounds)
+            assert scores[game] == pytest.approx(expected)
+
+    def test_evaluate(self, population):
+        evaluator = FitnessEvaluator(CARDS, [16, 28, 16], 5)
+        array_bda = bda.ArrayBDA.from_bdas(population)
+        np.random.seed(1)
+        stats = evaluator.evaluate(array_bda, 2, 10)
+
+        assert stats['wins'][:2].sum() + stats['wins'][2:].sum() <= 60
+        assert np.array_equal(stats['wins'][:2].sum(), stats['losses'][2:].sum())
+        assert np.array_equal(stats['plus_minus'], stats['wins'] - stats['losses'])
+        assert stats['score_diff'].sum() == pytest.approx(0.0)
+        assert np.all(stats['wins'][:2] + stats['losses'][:2] <= 30)
+        assert np.all(stats['wins'][2:] + stats['losses'][2:] <= 20)
+
+        np.random.seed(1)
+        player_1, player_2 = evaluator.matchups(2, len(population), 10)
+        decks = evaluator.deck.shuffled_decks(len(player_1))
+        scores = evaluator.play(array_bda, player_1, player_2, decks)
+        for name, values in evaluator.statistics(5, player_1, player_2, scores).items():
+            assert np.allclose(stats[name], values)
+        assert stats['score_earned'][0] == pytest.approx(scores[player_1 == 0, 0].sum())
+
+
+class TestEvaluateParallel(object):
+    def test_independent_of_num_workers(self, population):
+        evaluator = FitnessEvaluator(CARDS, [16, 28, 16], 5)
+        array_bda = bda.ArrayBDA.from_bdas(population)
+        results = [evaluate_parallel(evaluator, array_bda, 2, 4, num_workers, seed=7)
+                   for num_workers in (1, 2, 4)]
+        for result in results[1:]:
+            for name in results[0]:
+                assert np.array_equal(result[name], results[0][name])
+
+        different_seed = evaluate_parallel(evaluator, array_bda, 2, 4, 2, seed=8)
+        assert not all(np.array_equal(different_seed[name], results[0][name])
+                       for name in results[0])
+
+    def test_matches_serial_evaluation(self, population):
+        evaluator = FitnessEvaluator(CARDS, [16, 28, 16], 5)
+        array_bda = bda.ArrayBDA.from_bdas(population)
+        result = evaluate_parallel(evaluator, array_bda, 2, 4, 3, seed=7)
+
+        pair_seeds = [pair_seed.generate_state(1)[0]
+                      for pair_seed in np.random.SeedSequence(7).spawn(6)]
+        serial = evaluator.evaluate(array_bda, 2, 4, evaluator.seeded_decks(pair_seeds, 4))
+        seeded = evaluator.evaluate(array_bda, 2, 4, seed=7)
+        for name in serial:
+            assert np.allclose(result[name], serial[name])
+            assert np.array_equal(seeded[name], serial[name])
+
+
+class TestFitnessCache(object):
+    def test_evaluate_cached(self, population):
+        evaluator = FitnessEvaluator(CARDS, [16, 28, 16], 5)
+        population.insert(1, population[0].canonical())
+        array_bda = bda.ArrayBDA.from_bdas(population)
+        cache = FitnessCache()
+        np.random.seed(3)
+        stats = evaluator.evaluate_cached(array_bda, 3, 4, cache)
+        assert len(cache) == 2
+        assert (cache.hits, cache.misses) == (0, 2)
+        assert stats['wins'][1] == stats['wins'][0]
+        assert stats['wins'][0] + stats['losses'][0] <= 12
+        assert stats['wins'][3:].sum() + stats['wins'][[0, 2]].sum() <= 24
+
+        again = evaluator.evaluate_cached(array_bda, 3, 4, cache)
+        for name in stats:
+            assert np.array_equal(again[name][:3], stats[name][:3])
+        assert np.all(again['wins'][3:] == 0)
+
+        random.seed(4)
+        population[-1].randomize()
+        new_opponents = evaluator.evaluate_cached(bda.ArrayBDA.from_bdas(population), 3, 4,
+                                                  cache)
+        assert new_opponents['wins'][3:].sum() + new_opponents['losses'][3:].sum() > 0
+
+    def test_max_age_and_context(self):
+        cache = FitnessCache(max_age=2)
+        cache.validate('opponents')
+        cache.put('a', {'wins': 1})
+        cache.next_generation()
+        assert 'a' in cache
+        assert cache.lookup('a') == {'wins': 1}
+        cache.next_generation()
+        assert 'a' not in cache
+        assert cache.lookup('a') is None
+        assert cache.hits == 1
+        assert cache.misses == 1
+
+        cache.put('b', {'wins': 1})
+        cache.validate('opponents')
+        assert len(cache) == 1
+        cache.validate('other opponents')
+        assert len(cache) == 0
+
+
+class TestCommonRandomNumbers(object):
+    def test_common_decks(self, population):
+        evaluator = FitnessEvaluator(CARDS, [16, 28, 16], 5)
+        array_bda = bda.ArrayBDA.from_bdas(population)
+        np.random.seed(5)
+        common_decks = evaluator.deck.shuffled_decks(3)
+        stats = evaluator.evaluate(array_bda, 2, 3, common_decks=common_decks)
+
+        player_1, player_2 = evaluator.matchups(2, len(population), 3)
+        decks = np.concatenate([common_decks] * 6)
+        expected = evaluator.statistics(len(population), player_1, player_2,
+                                        evaluator.play(array_bda, player_1, player_2, decks))
+        for name in stats:
+            assert np.allclose(stats[name], expected[name])
+
+    def test_identical_players_tie_with_swapped_seats(self, population):
+        evaluator = FitnessEvaluator(CARDS, [16, 28, 16], 5)
+        population = [population[0], population[0].canonical()] + population[1:]
+        array_bda = bda.ArrayBDA.from_bdas(population)
+        np.random.seed(6)
+        common_decks = evaluator.deck.shuffled_decks(4)
+        stats = evaluator.evaluate(array_bda, 2, 4, common_decks=common_decks, swap_seats=True)
+        for name in stats:
+            assert stats[name][0] == pytest.approx(stats[name][1])
+        assert stats['wins'][0] + stats['losses'][0] <= 2 * 4 * 4
+
+    def test_swap_seats(self, population):
+        evaluator = FitnessEvaluator(CARDS, [16, 28, 16], 5)
+        array_bda = bda.ArrayBDA.from_bdas(population)
+        decks = evaluator.deck.shuffled_decks(1)
+        stats = evaluator.play_statistics(array_bda, [0], [1], decks, swap_seats=True)
+        first = evaluator.play(array_bda, [0], [1], decks)[0]
+        swapped = evaluator.play(array_bda, [1], [0], decks)[0]
+        assert stats['score_earned'][0] == pytest.approx(first[0] + swapped[1])
+        assert stats['score_diff'][1] == pytest.approx(first[1] - first[0] + swapped[0]
+                                                       - swapped[1])
+
+    def test_parallel_common_decks(self, population):
+        evaluator = FitnessEvaluator(CARDS, [16, 28, 16], 5)
+        array_bda = bda.ArrayBDA.from_bdas(population)
+        common_decks = evaluator.deck.shuffled_decks(2)
+        serial = evaluator.evaluate(array_bda, 2, 2, common_decks=common_decks, swap_seats=True)
+        parallel = evaluate_parallel(evaluator, array_bda, 2, 2, 2, common_decks=common_decks,
+                                     swap_seats=True)
+        for name in serial:
+            assert np.allclose(parallel[name], serial[name])
@@ -1,7 +1,7 @@
 import pytest
 
 import numpy as np
-from deck_divide_dollar.game import Deck, Player
+from deck_divide_dollar.game import CountVectorPlayer, Deck, Player
 
 
 class TestDeck(object):
@@ -34,6 +34,41 @@ class TestDeck(object):
         with pytest.raises(AssertionError):
             deck.deal_cards(deck.deck_size + 1)
 
+    def test_deal_cards_advances_cursor(self):
+        cards = {card: 1 for card in range(10)}
+        deck = Deck(cards)
+        deck_order = list(deck.deck_order)
+        assert deck.deal_cards(3) == deck_order[:3]
+        assert deck.deal_cards(2) == deck_order[3:5]
+        assert deck.cursor == 5
+        assert deck.deck_order == deck_order
+        assert deck.current_deck == deck_order[5:]
+
+        deck.reset_current_deck()
+        assert deck.cursor == 0
+        assert sorted(deck.current_deck) == sorted(deck_order)
+
+    def test_shuffled_decks(self):
+        cards = {1: 5, 2: 5, 3: 10}
+        deck = Deck(cards)
+        decks = deck.shuffled_decks(4)
+        assert decks.shape == (4, deck.deck_size)
+        for shuffled in decks:
+            assert list(np.bincount(shuffled)) == [5, 5, 10]
+
+        assert np.array_equal(deck.shuffled_decks(3, np.random.RandomState(1)),
+                              deck.shuffled_decks(3, np.random.RandomState(1)))
+
+    def test_shuffle_batch_size(self):
+        cards = {1: 5, 2: 5, 3: 10}
+        deck = Deck(cards, shuffle_batch_size=3)
+        for episode in range(5):
+            deck.reset_current_deck()
+            hand = deck.deal_cards(5)
+            assert isinstance(hand, list)
+            assert isinstance(deck.current_deck, np.ndarray)  # a row of the batch, not a copy
+            assert sorted(hand + deck.current_deck.tolist()) == [1] * 5 + [2] * 5 + [3] * 10
+
 
 class TestPlayer(object):
     def test_init(self):
@@ -100,3 +135,61 @@ class TestPlayer(object):
         player.wins += 5
         player.reset_wins()
         assert player.wins == 0
+
+
+class TestCountVectorPlayer(object):
+    card_values = [1, 2, 3, 4, 5]
+
+    def test_init(self):
+        policy = [1, 1, 1, 1]
+        player = CountVectorPlayer(self.card_values, policy)
+        assert player.policy == policy
+        assert player.hand_counts == [0] * len(self.card_values)
+        assert player.num_cards == 0
+        assert player.hand == []
+        assert player.total_score == 0
+
+        with pytest.raises(AttributeError):
+            player.some_attribute = None
+
+    def test_pick_up_cards(self):
+        player = CountVectorPlayer(self.card_values)
+
+        with pytest.raises(AssertionError):
+            player.pick_up_cards(1)
+
+        player.pick_up_cards([1, 3, 2, 3])
+        assert player.hand_counts == [1, 1, 2, 0, 0]
+        assert player.num_cards == 4
+        assert player.hand == [1, 2, 3, 3]
+
+    def test_play_card(self):
+        player = CountVectorPlayer(self.card_values)
+        hand = [1, 2, 3, 4, 5]
+        player.pick_up_cards(hand)
+
+        assert player.play_card(-1) == 5
+        assert player.play_card(1) == 2
+        assert player.last_card_played == 2
+        assert player.hand == [1, 3, 4]
+
+        with pytest.raises(IndexError):
+            player.play_card(3)
+
+    def test_matches_list_player(self):
+        list_player = Player()
+        count_player = CountVectorPlayer(self.card_values)
+        for cards, position in [([5, 1, 3, 3, 2], 2), ([4], -1), ([1], 0), ([2], 4)]:
+            for player in (list_player, count_player):
+                player.pick_up_cards(cards)
+                player.set_game_state(0)
+            assert count_player.hand == list_player.hand
+            assert count_player.game_state == list_player.game_state
+            assert count_player.play_card(position) == list_player.play_card(position)
+
+    def test_reset_hand(self):
+        player = CountVectorPlayer(self.card_values)
+        player.pick_up_cards([1, 2, 3, 4, 5])
+        player.reset_hand()
+        assert player.hand == []
+        assert player.num_cards == 0
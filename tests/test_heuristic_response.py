@@ -0,0 +1,61 @@
+import pytest
+
+import numpy as np
+from deck_divide_dollar.heuristic_response import HeuristicResponse
+from deck_divide_dollar.exact import ExactEvaluator
+from deck_divide_dollar.game import Deck
+
+ACTIONS = ['small_spoil', 'median', 'large_max']
+
+
+class TestHeuristicResponse(object):
+    def test_init(self):
+        deck = Deck({0.25: 3, 0.50: 2, 0.75: 3})
+        solver = HeuristicResponse(deck, 2, ACTIONS)
+        assert solver.seat == 1
+
+        with pytest.raises(AssertionError):
+            HeuristicResponse(deck, 2, ACTIONS, seat=2)
+
+    @pytest.mark.parametrize('seat', [0, 1])
+    def test_matches_exact_evaluation(self, seat):
+        deck = Deck({0.25: 4, 0.50: 6, 0.75: 4})
+        solver = HeuristicResponse(deck, 3, ACTIONS, seat=seat)
+        np.random.seed(0)
+        opponent = np.random.randint(len(ACTIONS), size=solver.state_index.num_states)
+        result = solver.respond(opponent)
+
+        assert result['policy'].shape == opponent.shape
+        assert result['win'] + result['draw'] + result['loss'] == pytest.approx(1.0)
+        assert result['expected_reward'] == pytest.approx(result['win'] - result['loss'])
+        assert result['full_information_reward'] >= result['expected_reward'] - 1e-12
+        assert solver.num_states > 0
+
+        policies = [opponent, opponent]
+        policies[seat] = result['policy']
+        exact = ExactEvaluator(deck, 3, ACTIONS).evaluate(policies)
+        win, loss = (exact['win'], exact['loss']) if seat == 0 else (exact['loss'], exact['win'])
+        assert result['win'] == pytest.approx(win)
+        assert result['loss'] == pytest.approx(loss)
+
+    @pytest.mark.parametrize('action', range(len(ACTIONS)))
+    def test_full_information_bounds_fixed_responses(self, action):
+        deck = Deck({0.25: 4, 0.50: 6, 0.75: 4})
+        solver = HeuristicResponse(deck, 3, ACTIONS)
+        evaluator = ExactEvaluator(deck, 3, ACTIONS)
+        num_states = solver.state_index.num_states
+        opponent = np.full(num_states, action)
+        result = solver.respond(opponent)
+
+        for response in range(len(ACTIONS)):
+            fixed = evaluator.evaluate([opponent, np.full(num_states, response)])
+            assert result['full_information_reward'] >= fixed['loss'] - fixed['win'] - 1e-12
+
+    def test_median_opponent_in_symmetric_deck(self):
+        # with one card in hand every action plays the same card, so no policy has an edge
+        deck = Deck({0.25: 2, 0.50: 2, 0.75: 2})
+        solver = HeuristicResponse(deck, 1, ACTIONS)
+        opponent = np.ones(solver.state_index.num_states, dtype=int)
+        result = solver.respond(opponent)
+        assert result['expected_reward'] == pytest.approx(0.0)
+        assert result['full_information_reward'] == pytest.approx(0.0)
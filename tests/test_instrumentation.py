@@ -0,0 +1,45 @@
+import pytest
+
+from deck_divide_dollar.game import Deck, Player
+from deck_divide_dollar.instrumentation import PhaseTimer
+from deck_divide_dollar.main import DeckBasedDivideTheDollar
+
+
+class TestPhaseTimer(object):
+    def test_init(self):
+        timer = PhaseTimer(report_interval=5)
+        assert timer.episodes == 0
+        assert len(timer.reports) == 0
+
+        with pytest.raises(AssertionError):
+            PhaseTimer(report_interval=0)
+
+    def test_lap_and_report(self):
+        reports = []
+        timer = PhaseTimer(report_interval=3, callback=reports.append, history=2)
+        timer.start()
+        for episode in range(10):
+            timer.lap('first')
+            timer.lap('second')
+            timer.episodes_done(1)
+
+        assert [report['episodes'] for report in reports] == [3, 6, 9]
+        assert [report['episodes'] for report in timer.reports] == [6, 9]
+        assert set(reports[-1]['phase_seconds']) == {'first', 'second'}
+        assert reports[-1]['episodes_per_second'] > 0
+        assert reports[-1]['recent_episodes_per_second'] > 0
+        assert timer.report()['episodes'] == 10
+
+
+@pytest.mark.parametrize('batch_size', [None, 4])
+def test_timed_play_games(monkeypatch, batch_size):
+    monkeypatch.setattr(Player, 'hand_size', 5)
+    reports = []
+    timer = PhaseTimer(report_interval=4, callback=reports.append)
+    game = DeckBasedDivideTheDollar(Deck({0.25: 16, 0.50: 28, 0.75: 16}), [Player(), Player()],
+                                    num_games_to_play=8, batch_size=batch_size, timer=timer)
+    game.play_games(save_output=False)
+
+    assert timer.episodes == 8
+    assert [report['episodes'] for report in reports] == [4, 8]
+    assert {'play_rounds', 'scorekeeping', 'aggregate_learning'} <= set(timer.phase_seconds)
@@ -0,0 +1,110 @@
+import random
+
+import pytest
+
+import numpy as np
+from deck_divide_dollar.game import CountVectorPlayer, Deck, Player
+from deck_divide_dollar.main import DeckBasedDivideTheDollar, train_policy, true_state_index
+
+
+@pytest.fixture
+def divide_the_dollar(monkeypatch):
+    monkeypatch.setattr(Player, 'hand_size', 5)
+    monkeypatch.setattr(DeckBasedDivideTheDollar, 'save_learning', lambda self: None)
+    deck = Deck({0.25: 16, 0.50: 28, 0.75: 16})
+    return DeckBasedDivideTheDollar(deck, [Player(), Player()], num_games_to_play=20)
+
+
+class TestDeckBasedDivideTheDollar(object):
+    def test_init(self, divide_the_dollar):
+        game = divide_the_dollar
+        assert game.num_states == 40
+        assert game.num_rounds == 25
+        assert game.episodes_played == 0
+        assert all(player.policy is game.q_learning.optimal_policy for player in game.players)
+
+    def test_play_games(self, divide_the_dollar):
+        game = divide_the_dollar
+        game.play_games()
+        assert game.episodes_played == 20
+        assert np.sum(game.q_learning.state_action_count) == 20 * game.num_rounds
+        assert game.players[0].wins + game.players[1].wins <= 20
+
+    def test_count_vector_hands(self, monkeypatch):
+        monkeypatch.setattr(Player, 'hand_size', 5)
+        monkeypatch.setattr(CountVectorPlayer, 'hand', property(lambda self: 1 / 0))
+        results = []
+        for players in ([Player(), Player()], 2):
+            np.random.seed(0)
+            random.seed(0)
+            game = DeckBasedDivideTheDollar(Deck({0.25: 16, 0.50: 28, 0.75: 16}), players,
+                                            num_games_to_play=20)
+            game.play_games(save_output=False)
+            results.append((game.q_learning.state_action_reward_sum,
+                            [player.wins for player in game.players]))
+
+        assert all(isinstance(player, CountVectorPlayer) for player in game.players)
+        np.testing.assert_array_equal(results[0][0], results[1][0])
+        assert results[0][1] == results[1][1]
+
+    @pytest.mark.parametrize('batch_size, shuffle_batch_size', [(None, None), (None, 4), (3, None)])
+    def test_resume_is_exact(self, monkeypatch, tmp_path, batch_size, shuffle_batch_size):
+        monkeypatch.setattr(Player, 'hand_size', 5)
+        path = str(tmp_path / 'checkpoint.npz')
+        games = []
+        for _ in range(2):
+            deck = Deck({0.25: 16, 0.50: 28, 0.75: 16}, shuffle_batch_size)
+            games.append(DeckBasedDivideTheDollar(deck, 2, num_games_to_play=20,
+                                                  batch_size=batch_size, checkpoint_interval=6,
+                                                  checkpoint_path=path))
+        uninterrupted, resumed = games
+        np.random.seed(0)
+        random.seed(0)
+        uninterrupted.play_games(save_output=False)
+
+        resumed.resume()
+        assert resumed.episodes_played == 18
+        resumed.play_games(save_output=False)
+        np.testing.assert_array_equal(resumed.q_learning.state_action_reward_sum,
+                                      uninterrupted.q_learning.state_action_reward_sum)
+        assert [player.wins for player in resumed.players] == \
+            [player.wins for player in uninterrupted.players]
+
+    @pytest.mark.parametrize('batch_size', [None, 3])
+    def test_checkpoint_resume(self, divide_the_dollar, tmp_path, batch_size):
+        game = divide_the_dollar
+        game.batch_size = batch_size
+        game.checkpoint_interval = 6
+        game.checkpoint_path = str(tmp_path / 'checkpoint.npz')
+        game.play_games()
+
+        resumed = DeckBasedDivideTheDollar(game.deck, [Player(), Player()], num_games_to_play=20,
+                                           checkpoint_path=game.checkpoint_path)
+        resumed.resume()
+        assert resumed.episodes_played == 18
+        assert np.sum(resumed.q_learning.state_action_count) == 18 * game.num_rounds
+        assert resumed.players[0].policy is resumed.q_learning.optimal_policy
+
+        resumed.play_games()
+        assert resumed.episodes_played == 20
+        assert np.sum(resumed.q_learning.state_action_count) == 20 * game.num_rounds
+
+        resumed.resume(warm_start=True)
+        assert resumed.episodes_played == 0
+
+
+def test_train_policy():
+    config = {'cards': [0.25, 0.5, 0.75], 'num_of_unique_cards': [4, 6, 4], 'hand_size': 3,
+              'num_games_to_play': 20, 'batch_size': 10, 'seed': 0}
+    hand_size = Player.hand_size
+    result = train_policy(config)
+    assert Player.hand_size == hand_size
+    assert sum(result['wins']) <= 20
+    np.testing.assert_array_equal(result['policy'], train_policy(config)['policy'])
+
+
+def test_true_state_index():
+    assert true_state_index(1) == [0, 1]
+    assert true_state_index(2) == [0, 1, -1, 2, -1, -1, -1, 3,
+                                   4, 5, -1, 6, -1, -1, -1, 7,
+                                   8, 9, -1, 10, -1, -1, -1, 11]
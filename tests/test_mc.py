@@ -1,7 +1,9 @@
+import random
+
 import pytest
 
 import numpy as np
-from deck_divide_dollar.q_learning import MonteCarloLearning
+from deck_divide_dollar.q_learning import MonteCarloLearning, TrajectoryBuffer
 
 
 class TestMonteCarloLearning(object):
@@ -53,6 +55,32 @@ class TestMonteCarloLearning(object):
         agent.update(state_index, new_action_index, 10)
         assert agent.optimal_policy[state_index] == new_action_index
 
+    @pytest.mark.parametrize('num_states', [5, 100])  # bincount and pair-by-pair updates
+    def test_update_batch(self, num_states):
+        num_actions = 3
+        batch_agent = MonteCarloLearning(num_states, num_actions)
+        agent = MonteCarloLearning(num_states, num_actions)
+        agent.optimal_policy[:] = batch_agent.optimal_policy
+
+        state_indices = np.random.randint(num_states - 1, size=(4, 6))
+        action_indices = np.random.randint(num_actions, size=(4, 6))
+        rewards = np.array([[1], [-1], [0], [1]])
+        batch_agent.update_batch(state_indices, action_indices, rewards)
+        for state_index, action_index, reward in zip(
+                state_indices.ravel(), action_indices.ravel(), np.repeat(rewards, 6)):
+            agent.update(state_index, action_index, reward)
+
+        assert np.array_equal(batch_agent.state_action_count, agent.state_action_count)
+        assert np.array_equal(batch_agent.state_action_reward_sum, agent.state_action_reward_sum)
+        assert np.allclose(batch_agent.Q, agent.Q)
+        assert np.array_equal(batch_agent.optimal_policy, agent.optimal_policy)
+
+        with pytest.raises(AssertionError):
+            batch_agent.update_batch([num_states], [0], 1)
+
+        with pytest.raises(AssertionError):
+            batch_agent.update_batch([0], [num_actions], 1)
+
     def test_record_state_seen(self):
         agent = MonteCarloLearning(3, 4)
         states = [[0, 1, 2], [1, 2, 1]]
@@ -74,3 +102,97 @@ class TestMonteCarloLearning(object):
         agent.record_state_seen(states[2])
         agent.clear_states_seen()
         assert len(agent.states_seen) == 0
+
+    def test_merge(self):
+        state_indices = np.array([0, 2, 2, 3, 0, 2])
+        action_indices = np.array([1, 0, 2, 2, 1, 0])
+        rewards = np.array([1, -1, 1, 0, -1, 1])
+        agent = MonteCarloLearning(5, 3)
+        agent.update_batch(state_indices, action_indices, rewards)
+
+        merged = MonteCarloLearning(5, 3)
+        merged.optimal_policy[:] = agent.optimal_policy
+        for shard in (slice(0, 2), slice(2, 6)):
+            worker = MonteCarloLearning(5, 3)
+            worker.update_batch(state_indices[shard], action_indices[shard], rewards[shard])
+            merged.merge(worker.state_action_count, worker.state_action_reward_sum)
+
+        assert np.array_equal(merged.state_action_count, agent.state_action_count)
+        assert np.array_equal(merged.state_action_reward_sum, agent.state_action_reward_sum)
+        assert np.allclose(merged.Q, agent.Q)
+        assert np.array_equal(merged.optimal_policy, agent.optimal_policy)
+
+    def test_save_load_checkpoint(self, tmp_path):
+        path = str(tmp_path / 'checkpoint.npz')
+        agent = MonteCarloLearning(4, 3)
+        agent.update_batch([0, 1, 1, 3], [2, 0, 1, 2], [1, -1, 1, 0])
+        agent.save_checkpoint(path, 1234)
+        numpy_draws = np.random.random_sample(5)
+        python_draws = [random.random() for _ in range(5)]
+
+        loaded = MonteCarloLearning(4, 3)
+        optimal_policy = loaded.optimal_policy
+        assert loaded.load_checkpoint(path) == 1234
+        assert loaded.optimal_policy is optimal_policy
+        assert np.array_equal(loaded.Q, agent.Q)
+        assert np.array_equal(loaded.optimal_policy, agent.optimal_policy)
+        assert np.array_equal(loaded.state_action_count, agent.state_action_count)
+        assert np.array_equal(loaded.state_action_reward_sum, agent.state_action_reward_sum)
+        assert np.array_equal(np.random.random_sample(5), numpy_draws)
+        assert [random.random() for _ in range(5)] == python_draws
+
+        with pytest.raises(AssertionError):
+            MonteCarloLearning(5, 3).load_checkpoint(path)
+
+    def test_update_trajectory(self):
+        agent = MonteCarloLearning(4, 3, episode_length=3)
+        agent.update_trajectory(1)
+        assert np.sum(agent.state_action_count) == 0
+
+        agent.record_step(1, 2)
+        agent.record_step(3, 0)
+        agent.update_trajectory(-1)
+        assert agent.state_action_count[1, 2] == 1
+        assert agent.state_action_count[3, 0] == 1
+        assert agent.state_action_reward_sum[1, 2] == -1
+        assert np.sum(agent.state_action_count) == 2
+
+
+class TestTrajectoryBuffer(object):
+    def test_init(self):
+        trajectory = TrajectoryBuffer(5, num_episodes=3)
+        assert trajectory.state_indices.shape == (3, 5)
+        assert trajectory.action_indices.shape == (3, 5)
+        assert list(trajectory.lengths) == [0, 0, 0]
+
+        with pytest.raises(AssertionError):
+            TrajectoryBuffer(0)
+
+    def test_record(self):
+        trajectory = TrajectoryBuffer(2)
+        steps = [(4, 1), (7, 0), (2, 2)]
+        for state_index, action_index in steps:
+            trajectory.record(state_index, action_index)
+
+        assert list(trajectory.states()) == [4, 7, 2]
+        assert list(trajectory.actions()) == [1, 0, 2]
+        assert trajectory.states().base is not None
+
+        state_indices = trajectory.state_indices
+        trajectory.clear()
+        assert len(trajectory.states()) == 0
+        trajectory.record(5, 1)
+        assert trajectory.state_indices is state_indices
+        assert list(trajectory.states()) == [5]
+
+    def test_record_batch(self):
+        trajectory = TrajectoryBuffer(2, num_episodes=4)
+        trajectory.record_batch(0, [1, 2, 3], [0, 1, 2])
+        trajectory.record_batch(1, [4, 5, 6], [2, 1, 0])
+        states, actions = trajectory.episodes(3, 2)
+        assert states.tolist() == [[1, 4], [2, 5], [3, 6]]
+        assert actions.tolist() == [[0, 2], [1, 1], [2, 0]]
+        assert list(trajectory.lengths) == [2, 2, 2, 0]
+
+        with pytest.raises(AssertionError):
+            trajectory.record_batch(0, [0] * 5, [0] * 5)
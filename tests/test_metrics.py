@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+from deck_divide_dollar.binary_decision_automata.metrics import (MetricsWriter, combine_metrics,
+                                                                 read_metrics)
+
+st = pytest.importorskip('scipy.stats')
+
+
+class TestMetricsWriter(object):
+    def test_statistics_match_per_generation(self, tmp_path):
+        path = str(tmp_path / 'metrics.npz')
+        writer = MetricsWriter(path, ['wins', 'score'], 4, 6)
+        rng = np.random.RandomState(0)
+        fitness = rng.rand(3, 2, 6)
+        for generation in range(3):
+            writer.record(generation, wins=fitness[generation, 0], score=fitness[generation, 1])
+        writer.flush()
+
+        statistics = read_metrics(path)
+        assert list(statistics['recorded'][0]) == [True, True, True, False]
+        for column, metric in enumerate(['wins', 'score']):
+            for generation in range(3):
+                fit = fitness[generation, column]
+                mean = np.mean(fit)
+                ci = st.t.interval(0.95, len(fit) - 1, loc=mean, scale=st.sem(fit))[1]
+                assert statistics[metric]['mean'][0, generation] == pytest.approx(mean)
+                assert statistics[metric]['ci'][0, generation] == pytest.approx(ci)
+                assert statistics[metric]['std'][0, generation] == pytest.approx(np.std(fit))
+                assert statistics[metric]['best'][0, generation] == pytest.approx(np.max(fit))
+            assert np.isnan(statistics[metric]['mean'][0, 3])
+
+    def test_flush_every_and_combine(self, tmp_path):
+        paths = [str(tmp_path / ('metrics-%i.npz' % run)) for run in range(2)]
+        for run, path in enumerate(paths):
+            writer = MetricsWriter(path, ['wins'], 4, 2, [run], flush_every=2)
+            writer.record(0, run, wins=[run, 1.0])
+            writer.record(1, run, wins=[run, 2.0])
+            assert read_metrics(path)['recorded'][0].sum() == 2
+
+        combine_metrics(paths, str(tmp_path / 'metrics.npz'))
+        experiment = read_metrics(str(tmp_path / 'metrics.npz'))
+        assert list(experiment['runs']) == [0, 1]
+        np.testing.assert_allclose(experiment['wins']['best'][:, :2], [[1.0, 2.0], [1.0, 2.0]])
+        np.testing.assert_allclose(experiment['wins']['mean'][:, :2], [[0.5, 1.0], [1.0, 1.5]])
+
+    def test_flush_keeps_earlier_statistics(self, tmp_path):
+        path = str(tmp_path / 'metrics.npz')
+        writer = MetricsWriter(path, ['wins'], 3, 2)
+        writer.record(0, wins=[0.0, 1.0])
+        writer.flush()
+        writer.record(2, wins=[2.0, 4.0])
+        writer.flush()
+        statistics = read_metrics(path)
+        assert list(statistics['recorded'][0]) == [True, False, True]
+        np.testing.assert_allclose(statistics['wins']['mean'][0], [0.5, np.nan, 3.0])
+        np.testing.assert_allclose(statistics['wins']['best'][0], [1.0, np.nan, 4.0])
+
+    def test_every_metric_must_be_recorded(self, tmp_path):
+        writer = MetricsWriter(str(tmp_path / 'metrics.npz'), ['wins', 'score'], 2, 2)
+        with pytest.raises(AssertionError):
+            writer.record(0, wins=[0.0, 1.0])
@@ -0,0 +1,94 @@
+import pytest
+
+import numpy as np
+from deck_divide_dollar.game import Deck, Player
+from deck_divide_dollar.main import DeckBasedDivideTheDollar
+from deck_divide_dollar import parallel
+from deck_divide_dollar.parallel import play_games_parallel
+
+
+@pytest.fixture
+def divide_the_dollar(monkeypatch):
+    monkeypatch.setattr(Player, 'hand_size', 5)
+    monkeypatch.setattr(DeckBasedDivideTheDollar, 'save_learning', lambda self: None)
+    deck = Deck({0.25: 16, 0.50: 28, 0.75: 16})
+    return DeckBasedDivideTheDollar(deck, [Player(), Player()], num_games_to_play=30,
+                                    batch_size=4)
+
+
+@pytest.mark.parametrize('num_workers', [1, 3])
+def test_play_games_parallel(divide_the_dollar, num_workers):
+    game = divide_the_dollar
+    play_games_parallel(game, num_workers=num_workers, sync_interval=12, seed=0)
+
+    assert game.episodes_played == 30
+    assert np.sum(game.q_learning.state_action_count) == 30 * game.num_rounds
+    assert game.players[0].wins + game.players[1].wins <= 30
+    assert game.players[0].policy is game.q_learning.optimal_policy
+
+    q_learning = game.q_learning
+    visited = q_learning.state_action_count > 0
+    Q = q_learning.state_action_reward_sum[visited] / q_learning.state_action_count[visited]
+    assert np.allclose(q_learning.Q[visited], Q)
+
+
+def test_play_games_parallel_seed(divide_the_dollar):
+    counts = []
+    for run in range(2):
+        game = DeckBasedDivideTheDollar(divide_the_dollar.deck, [Player(), Player()],
+                                        num_games_to_play=30, batch_size=4)
+        game.q_learning.optimal_policy[:] = 0
+        play_games_parallel(game, num_workers=2, sync_interval=10, seed=7)
+        counts.append(game.q_learning.state_action_count)
+    assert np.array_equal(counts[0], counts[1])
+
+
+def test_resume_uses_new_shard_seeds(monkeypatch, tmp_path, divide_the_dollar):
+    seeds = []
+
+    class InProcessPool(object):
+        def __init__(self, num_workers):
+            pass
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc_info):
+            return False
+
+        def map(self, function, shards):
+            seeds.append([shard[-1] for shard in shards])
+            return [function(shard) for shard in shards]
+
+    monkeypatch.setattr(parallel.multiprocessing, 'Pool', InProcessPool)
+    path = str(tmp_path / 'checkpoint.npz')
+    games = [DeckBasedDivideTheDollar(divide_the_dollar.deck, [Player(), Player()],
+                                      num_games_to_play=num_games, batch_size=4,
+                                      checkpoint_interval=10, checkpoint_path=path)
+             for num_games in (20, 30)]
+    play_games_parallel(games[0], num_workers=2, sync_interval=10, seed=7)
+    first_segment = [seed for round_seeds in seeds for seed in round_seeds]
+    del seeds[:]
+
+    games[1].resume()
+    assert games[1].episodes_played == 20
+    play_games_parallel(games[1], num_workers=2, sync_interval=10, seed=7)
+    assert len(seeds) == 1
+    assert not set(seeds[0]) & set(first_segment)
+
+
+def test_shards_keep_deck_options(monkeypatch, divide_the_dollar):
+    decks = []
+
+    class RecordingDeck(Deck):
+        def __init__(self, cards, shuffle_batch_size=None):
+            super(RecordingDeck, self).__init__(cards, shuffle_batch_size)
+            decks.append(self)
+
+    monkeypatch.setattr(parallel, 'Deck', RecordingDeck)
+    game = divide_the_dollar
+    count, reward_sum, wins = parallel._play_shard(
+        (game.deck.cards, 8, 5, 1.0, None, 3, game.q_learning.state_action_count,
+         game.q_learning.state_action_reward_sum, game.q_learning.optimal_policy, None, True, 0))
+    assert [deck.shuffle_batch_size for deck in decks] == [8]
+    assert np.sum(count) == 3 * game.num_rounds
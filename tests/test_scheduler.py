@@ -0,0 +1,22 @@
+import pytest
+
+from deck_divide_dollar.scheduler import run_jobs
+
+
+def square(job):
+    return job * job
+
+
+class TestRunJobs(object):
+    @pytest.mark.parametrize('num_workers', [1, 2])
+    def test_run_jobs(self, num_workers):
+        finished = []
+        results = run_jobs(square, range(5), num_workers,
+                           callback=lambda job, result: finished.append(job))
+        assert results == {job: job * job for job in range(5)}
+        assert sorted(finished) == list(range(5))
+
+    def test_skips_done_jobs(self):
+        results = run_jobs(square, range(5), 2, is_done=lambda job: job % 2 == 0)
+        assert results == {1: 1, 3: 9}
+        assert run_jobs(square, range(5), 2, is_done=lambda job: True) == {}
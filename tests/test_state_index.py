@@ -0,0 +1,50 @@
+import pytest
+
+import numpy as np
+from deck_divide_dollar.state_index import StateIndex
+
+
+def enumerated_state_index(unique_cards):
+    """True state index of every permutation, by enumeration."""
+    index, states = 0, []
+    for card_showing in range(unique_cards + 1):
+        for smallest in range(unique_cards):
+            for median in range(unique_cards):
+                for largest in range(unique_cards):
+                    if smallest <= median <= largest:
+                        states.append(index)
+                        index += 1
+                    else:
+                        states.append(-1)
+    return states
+
+
+class TestStateIndex(object):
+    def test_init(self):
+        state_index = StateIndex(3)
+        assert state_index.num_hand_states == 10
+        assert state_index.num_states == 40
+        assert state_index.dims == (4, 3, 3, 3)
+
+        with pytest.raises(AssertionError):
+            StateIndex(0)
+
+    @pytest.mark.parametrize('unique_cards', [1, 2, 3, 5, 8])
+    def test_lookup(self, unique_cards):
+        state_index = StateIndex(unique_cards)
+        assert list(state_index.lookup) == enumerated_state_index(unique_cards)
+
+    @pytest.mark.parametrize('unique_cards', [1, 3, 6])
+    def test_rank(self, unique_cards):
+        state_index = StateIndex(unique_cards)
+        expected = enumerated_state_index(unique_cards)
+        for game_state in np.ndindex(*state_index.dims):
+            flat_index = int(np.ravel_multi_index(game_state, dims=state_index.dims))
+            assert state_index.flat_index(game_state) == flat_index
+            if expected[flat_index] >= 0:
+                assert state_index.rank(game_state) == expected[flat_index]
+
+    def test_rank_arrays(self):
+        state_index = StateIndex(3)
+        game_states = np.array([[3, 0, 1, 2], [0, 0, 0, 0], [2, 1, 1, 2], [3, 2, 2, 2]]).T
+        assert list(state_index.rank(game_states)) == [34, 0, 27, 39]
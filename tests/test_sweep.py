@@ -0,0 +1,78 @@
+import os
+
+import pytest
+
+from deck_divide_dollar.sweep import ResultCache, code_version, config_key, grid, run_sweep
+
+CALLS = []
+
+
+def product(config):
+    CALLS.append(config)
+    return config['a'] * config.get('b', 5)
+
+
+class TestGrid(object):
+    def test_grid(self):
+        configs = grid({'hand_size': 5}, a=[1, 2], b=[3, 4])
+        assert configs == [{'hand_size': 5, 'a': 1, 'b': 3}, {'hand_size': 5, 'a': 1, 'b': 4},
+                           {'hand_size': 5, 'a': 2, 'b': 3}, {'hand_size': 5, 'a': 2, 'b': 4}]
+        assert grid() == [{}]
+
+    def test_config_key(self):
+        key = config_key(product, {'a': 1, 'b': 2}, 'v1')
+        assert key == config_key(product, {'b': 2, 'a': 1}, 'v1')
+        assert key != config_key(product, {'a': 1, 'b': 2}, 'v2')
+        assert key != config_key(product, {'a': 1, 'b': 3}, 'v1')
+        assert key != config_key(grid, {'a': 1, 'b': 2}, 'v1')
+
+    def test_code_version(self, tmp_path):
+        (tmp_path / 'module.py').write_text('x = 1\n')
+        version = code_version(str(tmp_path))
+        assert code_version(str(tmp_path)) == version
+        (tmp_path / 'module.py').write_text('x = 2\n')
+        assert code_version(str(tmp_path)) != version
+
+
+class TestRunSweep(object):
+    @pytest.mark.parametrize('num_workers', [1, 2])
+    def test_results_in_order(self, tmp_path, num_workers):
+        cache = ResultCache(str(tmp_path / 'cache'))
+        configs = grid(a=[1, 2, 3], b=[10, 20])
+        finished = []
+        results = run_sweep(product, configs, cache, num_workers, version='v1',
+                            callback=lambda config, result: finished.append(config))
+        assert results == [config['a'] * config['b'] for config in configs]
+        assert len(cache) == len(configs) == len(finished)
+        key = config_key(product, configs[0], 'v1')
+        assert cache.get(key) == (configs[0], 10)
+
+    def test_only_new_configs_run(self, tmp_path):
+        cache = ResultCache(str(tmp_path))
+        del CALLS[:]
+        run_sweep(product, grid(a=[1, 2], b=[10]), cache, 1, version='v1')
+        assert run_sweep(product, grid(a=[1, 2, 3], b=[10]), cache, 1, version='v1') == \
+            [10, 20, 30]
+        assert CALLS == [{'a': 1, 'b': 10}, {'a': 2, 'b': 10}, {'a': 3, 'b': 10}]
+        run_sweep(product, grid(a=[1], b=[10]), cache, 1, version='v2')
+        assert len(CALLS) == 4
+        assert not [name for name in os.listdir(str(tmp_path)) if name.endswith('.tmp')]
+
+    def test_extended_grid_with_code_version(self, tmp_path):
+        cache = ResultCache(str(tmp_path))
+        del CALLS[:]
+        run_sweep(product, grid(a=[1, 2], b=[10]), cache, 1)
+        finished = []
+        results = run_sweep(product, grid(a=[1, 2, 3], b=[10]), cache, 1,
+                            callback=lambda config, result: finished.append(config))
+        assert results == [10, 20, 30]
+        assert finished == [{'a': 3, 'b': 10}]
+        assert len(CALLS) == 3
+
+    def test_resolve(self, tmp_path):
+        cache = ResultCache(str(tmp_path))
+        del CALLS[:]
+        results = run_sweep(product, [{'a': 2}, {'a': 2, 'b': 5}], cache, 1, version='v1',
+                            resolve=lambda config: dict({'b': 5}, **config))
+        assert results == [10, 10]
+        assert CALLS == [{'a': 2}]
@@ -0,0 +1,110 @@
+import random
+
+import pytest
+
+import numpy as np
+from deck_divide_dollar.batch import BatchDivideTheDollar
+from deck_divide_dollar.binary_decision_automata import bda
+from deck_divide_dollar.game import Deck
+from deck_divide_dollar.tournament import BDAAgent, FixedAgent, TableAgent, Tournament
+
+ACTIONS = ['small_spoil', 'median', 'large_max']
+
+
+@pytest.fixture
+def tournament():
+    return Tournament(Deck({0.25: 16, 0.50: 28, 0.75: 16}), 5, ACTIONS)
+
+
+def constant_bda(action):
+    """Automaton that always takes action."""
+    automaton = bda.BDA(2)
+    for state in automaton.states:
+        state.actions = [action, action]
+    return automaton
+
+
+class TestTournament(object):
+    def test_agent(self, tournament):
+        assert isinstance(tournament.agent('median'), FixedAgent)
+        assert tournament.agent('large_max').action == 2
+        assert isinstance(tournament.agent(1), FixedAgent)
+        assert isinstance(tournament.agent(np.zeros(10, dtype=int)), TableAgent)
+        assert isinstance(tournament.agent(bda.BDA(3)), BDAAgent)
+        agent = FixedAgent(0)
+        assert tournament.agent(agent) is agent
+
+    def test_play_match_matches_batch_engine(self, monkeypatch, tournament):
+        np.random.seed(0)
+        num_states = tournament.engine.state_index.num_states
+        policies = [np.random.randint(len(ACTIONS), size=num_states) for _ in range(2)]
+        decks = tournament.deck.shuffled_decks(200)
+        difference = tournament.play_match(policies, decks)
+
+        engine = BatchDivideTheDollar(tournament.deck, 5, tournament.num_rounds, ACTIONS,
+                                      tournament.engine.state_index)
+        monkeypatch.setattr(engine.deck, 'shuffled_decks', lambda num_decks: decks)
+        engine.play_batch(policies, len(decks), explore_rounds=0)
+        assert np.allclose(difference, engine.total_scores[:, 0] - engine.total_scores[:, 1])
+
+    def test_agent_types_agree(self, tournament):
+        decks = tournament.deck.shuffled_decks(100)
+        num_states = tournament.engine.state_index.num_states
+        for action in range(len(ACTIONS)):
+            expected = tournament.play_match([action, 'small_spoil'], decks)
+            for agent in (np.full(num_states, action), constant_bda(action)):
+                assert np.array_equal(tournament.play_match([agent, 'small_spoil'], decks),
+                                      expected)
+
+    def test_bda_agent_matches_scalar_run(self, tournament):
+        random.seed(1)
+        automaton = bda.BDA(4)
+        automaton.randomize()
+        agent = BDAAgent(automaton)
+        observation = {'card_showing_value': np.array([0.0, 0.5, 0.75]),
+                       'smallest': np.array([0, 1, 0]), 'median': np.array([1, 1, 2]),
+                       'largest': np.array([2, 2, 2]), 'deal_fraction': np.array([1.0, 0.5, 0.0]),
+                       'second': np.array([0, 1, 1])}
+        agent.initial_state(3)
+        memory = np.array([0, 1, 3])
+        actions, memory_after = agent.act(observation, memory.copy())
+        for game in range(3):
+            automaton.current_state = memory[game]
+            sim_state = [observation[key][game] for key in
+                         ('card_showing_value', 'smallest', 'median', 'largest',
+                          'deal_fraction', 'second')]
+            assert automaton.run(sim_state) == actions[game]
+            assert automaton.current_state == memory_after[game]
+
+    def test_play(self, tournament):
+        np.random.seed(2)
+        random.seed(2)
+        automaton = bda.BDA(4)
+        automaton.randomize()
+        agents = ['small_spoil', 'median', 'large_max', automaton]
+        result = tournament.play(agents, 200)
+
+        assert result['num_games'] == 400
+        assert result['win_rate'].shape == (4, 4)
+        assert np.allclose(result['win_rate'], result['loss_rate'].T)
+        assert np.allclose(result['draw_rate'], result['draw_rate'].T)
+        assert np.allclose(result['score_difference'], -result['score_difference'].T)
+        assert np.allclose(np.diag(result['win_rate']), 0.0)
+        off_diagonal = ~np.eye(4, dtype=bool)
+        assert np.allclose((result['win_rate'] + result['draw_rate']
+                            + result['loss_rate'])[off_diagonal], 1.0)
+        assert np.all(result['win_rate_ci'] >= 0)
+        assert np.all(result['overall_win_rate_ci'] > 0)
+        assert result['overall_win_rate'] == pytest.approx(
+            result['win_rate'].sum(axis=1) / 3)
+        assert result['overall_score_difference'] == pytest.approx(
+            result['score_difference'].sum(axis=1) / 3)
+
+    def test_seats_swapped_on_same_decks(self, tournament):
+        decks = tournament.deck.shuffled_decks(50)
+        result = tournament.play(['median', 'median'], 50, decks=decks)
+        assert result['win_rate'][0, 1] == pytest.approx(result['loss_rate'][0, 1])
+        assert result['score_difference'][0, 1] == pytest.approx(0.0)
+
+        result = tournament.play(['median', 'large_max'], 50, swap_seats=False, decks=decks)
+        assert result['num_games'] == 50